@@ -0,0 +1,193 @@
+"""
+Refresh the active hosts of a large synthetic SOLR cluster from an
+in-memory zookeeper, cold and then with the version-keyed cluster state
+cache warm: when nothing changed, and when a few collections did.
+
+Every call to zookeeper is counted and answers after a simulated round
+trip of `LATENCY` seconds. Asynchronous calls are answered that long after
+they were sent, so calls sent together share one round trip, the way
+kazoo pipelines them on its connection.
+
+    pip install -e . && python benchmarks/bench_cluster_state.py
+"""
+import collections
+import json
+import time
+import timeit
+
+from wukong.zookeeper import Zookeeper
+
+COLLECTIONS = 2000
+SHARDS = 4
+REPLICAS = 3
+NODES = 50
+CHANGED = 20
+REPEAT = 5
+# Seconds per round trip to zookeeper
+LATENCY = 0.0005
+
+Stat = collections.namedtuple('Stat', ['version', 'cversion'])
+
+
+def node(index):
+    return 'solr%02d:8983_solr' % (index % NODES)
+
+
+def make_state(collection, version):
+    shards = {}
+    for shard in range(SHARDS):
+        replicas = {}
+        for replica in range(REPLICAS):
+            index = hash((collection, shard, replica, version))
+            replicas['core_node%s' % replica] = {
+                'core': '%s_shard%s_replica_n%s' % (collection, shard, replica),
+                'base_url': 'http://%s/solr' % node(index).split('_')[0],
+                'node_name': node(index),
+                'state': 'active',
+                'type': 'NRT',
+                'leader': 'true' if replica == 0 else 'false',
+            }
+        shards['shard%s' % shard] = {
+            'range': None,
+            'state': 'active',
+            'replicas': replicas,
+        }
+    return json.dumps({collection: {
+        'shards': shards,
+        'router': {'name': 'compositeId'},
+        'replicationFactor': str(REPLICAS),
+    }}).encode('utf-8')
+
+
+class AsyncResult(object):
+
+    def __init__(self, value):
+        self.value = value
+        self.ready = time.time() + LATENCY
+
+    def get(self):
+        wait = self.ready - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        return self.value
+
+
+class FakeKazoo(object):
+    """
+    The read calls of a KazooClient over a dict of znodes
+    """
+    def __init__(self):
+        self.calls = collections.Counter()
+        self.bytes_read = 0
+        self.data = {}
+        self.children = {
+            '/collections': ['tenant%s' % i for i in range(COLLECTIONS)],
+            '/live_nodes': [node(i) for i in range(NODES)],
+        }
+        for collection in self.children['/collections']:
+            self.set_state(collection, 0)
+
+    def set_state(self, collection, version):
+        path = '/collections/%s/state.json' % collection
+        self.data[path] = (make_state(collection, version), version)
+
+    def exists(self, path):
+        return self.exists_async(path).get()
+
+    def exists_async(self, path):
+        self.calls['exists'] += 1
+        return AsyncResult(self._stat(path))
+
+    def _stat(self, path):
+        if path in self.data:
+            return Stat(self.data[path][1], 0)
+        if path in self.children:
+            return Stat(0, 0)
+        return None
+
+    def get(self, path):
+        return self.get_async(path).get()
+
+    def get_async(self, path):
+        self.calls['get'] += 1
+        data = self.data[path][0]
+        self.bytes_read += len(data)
+        return AsyncResult((data, Stat(self.data[path][1], 0)))
+
+    def get_children(self, path):
+        self.calls['get_children'] += 1
+        return AsyncResult(self.children[path]).get()
+
+
+class SequentialKazoo(FakeKazoo):
+    """
+    Answers every call before the next one can be sent, as when reading
+    the znodes one after the other
+    """
+    def exists_async(self, path):
+        result = super(SequentialKazoo, self).exists_async(path)
+        result.get()
+        return result
+
+    def get_async(self, path):
+        result = super(SequentialKazoo, self).get_async(path)
+        result.get()
+        return result
+
+
+def refresh(zookeeper, kazoo):
+    kazoo.calls.clear()
+    kazoo.bytes_read = 0
+    hosts = zookeeper.get_active_hosts()
+    assert hosts
+    return dict(kazoo.calls), kazoo.bytes_read
+
+
+def main():
+    kazoo = FakeKazoo()
+    print('%s collections, %.1f MB of state.json, %.1f ms per round trip' % (
+        COLLECTIONS,
+        sum(len(data) for data, _ in kazoo.data.values()) / 1e6,
+        LATENCY * 1000
+    ))
+
+    def cold(client=kazoo):
+        zookeeper = Zookeeper('localzook:2181')
+        zookeeper._client = client
+        return zookeeper
+
+    sequential = SequentialKazoo()
+    print('cold, one read at a time: %.1f ms' % (
+        min(timeit.repeat(lambda: cold(sequential).get_active_hosts(), number=1, repeat=REPEAT)) * 1000
+    ))
+
+    zookeeper = cold()
+    calls, bytes_read = refresh(zookeeper, kazoo)
+    print('cold: %s, %.1f MB read, %.1f ms' % (
+        calls, bytes_read / 1e6,
+        min(timeit.repeat(lambda: cold().get_active_hosts(), number=1, repeat=REPEAT)) * 1000
+    ))
+
+    calls, bytes_read = refresh(zookeeper, kazoo)
+    print('unchanged: %s, %.1f MB read, %.1f ms' % (
+        calls, bytes_read / 1e6,
+        min(timeit.repeat(zookeeper.get_active_hosts, number=1, repeat=REPEAT)) * 1000
+    ))
+
+    versions = iter(range(1, 1000000))
+
+    def change():
+        version = next(versions)
+        for collection in kazoo.children['/collections'][:CHANGED]:
+            kazoo.set_state(collection, version)
+
+    change()
+    calls, bytes_read = refresh(zookeeper, kazoo)
+    print('%s changed: %s, %.2f MB read, %.1f ms' % (
+        CHANGED, calls, bytes_read / 1e6,
+        min(timeit.repeat(zookeeper.get_active_hosts, setup=change, number=1, repeat=REPEAT)) * 1000
+    ))
+
+
+if __name__ == '__main__':
+    main()
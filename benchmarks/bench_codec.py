@@ -0,0 +1,70 @@
+"""
+Compare parsing a 10k document SOLR select response the way wukong used to
+(`json.loads(response.text)`) with `wukong.codec`, and encoding the same
+documents for an update.
+
+    pip install -e . && python benchmarks/bench_codec.py
+"""
+import datetime as dt
+import json
+import timeit
+
+from wukong import codec
+
+DOCS = 10000
+REPEAT = 5
+
+
+def make_docs():
+    return [
+        {
+            'id': 'doc-%s' % i,
+            'name': 'Test Name %s' % i,
+            'city': 'Test City',
+            'age': i % 90,
+            'score': i / 7.0,
+            'tags': ['tag%s' % (i % 10), 'tag%s' % (i % 13)],
+            'created': dt.datetime(2020, 1, 1) + dt.timedelta(seconds=i),
+        }
+        for i in range(DOCS)
+    ]
+
+
+def main():
+    docs = make_docs()
+    body = json.dumps(
+        {'response': {'numFound': DOCS, 'start': 0, 'docs': docs}},
+        default=lambda obj: obj.isoformat()
+    ).encode('utf-8')
+
+    def old_loads():
+        # requests decodes .text from .content after guessing the charset
+        json.loads(body.decode('utf-8'))
+
+    def new_loads():
+        codec.loads(body)
+
+    def old_dumps():
+        json.dumps(
+            docs,
+            default=lambda obj: obj.isoformat() if isinstance(
+                obj, dt.datetime) else None
+        )
+
+    def new_dumps():
+        codec.dumps(docs)
+
+    print('codec: %s, response size: %.1f MB' % (codec.name, len(body) / 1e6))
+    for label, old, new in [
+        ('loads', old_loads, new_loads),
+        ('dumps', old_dumps, new_dumps),
+    ]:
+        old_time = min(timeit.repeat(old, number=1, repeat=REPEAT))
+        new_time = min(timeit.repeat(new, number=1, repeat=REPEAT))
+        print('%s: json %.1f ms, wukong.codec %.1f ms (%.1fx)' % (
+            label, old_time * 1000, new_time * 1000, old_time / new_time
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Compare the JSON and javabin wire formats on a large, numeric and date
+heavy SOLR select response: the size on the wire, decoding the response
+and encoding the documents for an update.
+
+The javabin response is built the way SOLR writes it, with `DATE`, `LONG`
+and `FLOAT` values and field names written once.
+
+    pip install -e . && python benchmarks/bench_javabin.py
+"""
+import datetime as dt
+import json
+import struct
+import timeit
+
+from wukong import codec, javabin
+
+DOCS = 10000
+REPEAT = 5
+
+FIELDS = ['id', 'created', 'updated', 'views', 'rating', 'score', 'tags']
+
+
+def make_docs():
+    start = dt.datetime(2020, 1, 1)
+    return [
+        {
+            'id': 'doc-%s' % i,
+            'created': start + dt.timedelta(seconds=i),
+            'updated': start + dt.timedelta(minutes=i),
+            'views': i * 1000003,
+            'rating': (i % 50) / 10.0,
+            'score': 1.0 / (i + 1),
+            'tags': ['tag%s' % (i % 10), 'tag%s' % (i % 13)],
+        }
+        for i in range(DOCS)
+    ]
+
+
+def _iso(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def json_response(docs):
+    return codec.dumps({
+        'response': {
+            'numFound': len(docs),
+            'start': 0,
+            'maxScore': 1.0,
+            'docs': [
+                dict(doc, created=_iso(doc['created']), updated=_iso(doc['updated']))
+                for doc in docs
+            ],
+        }
+    })
+
+
+def javabin_response(docs):
+    encoder = javabin._Encoder()
+    buffer = encoder.buffer
+    encoder.write_tag(javabin.NAMED_LST, 1)
+    encoder.write_extern_string('response')
+    buffer.append(javabin.SOLRDOCLST)
+    # numFound, start and maxScore
+    encoder.write_tag(javabin.ARR, 3)
+    encoder.write_val(len(docs))
+    encoder.write_val(0)
+    buffer.append(javabin.FLOAT)
+    buffer.extend(struct.pack('>f', 1.0))
+    encoder.write_tag(javabin.ARR, len(docs))
+    for doc in docs:
+        buffer.append(javabin.SOLRDOC)
+        encoder.write_tag(javabin.ORDERED_MAP, len(FIELDS))
+        for name in FIELDS:
+            encoder.write_extern_string(name)
+            value = doc[name]
+            if isinstance(value, int):
+                buffer.append(javabin.LONG)
+                buffer.extend(struct.pack('>q', value))
+            elif name == 'score':
+                buffer.append(javabin.FLOAT)
+                buffer.extend(struct.pack('>f', value))
+            else:
+                encoder.write_val(value)
+    return bytes(buffer)
+
+
+def best(func):
+    return min(timeit.repeat(func, number=1, repeat=REPEAT))
+
+
+def main():
+    docs = make_docs()
+    json_body = json_response(docs)
+    javabin_body = javabin_response(docs)
+
+    assert len(javabin.loads(javabin_body)['response']['docs']) == DOCS
+
+    print('json codec: %s' % codec.name)
+    print('response size: json %.2f MB, javabin %.2f MB' % (
+        len(json_body) / 1e6, len(javabin_body) / 1e6
+    ))
+    update_json = codec.dumps(docs)
+    update_javabin = javabin.dumps_update(docs)
+    print('update size: json %.2f MB, javabin %.2f MB' % (
+        len(update_json) / 1e6, len(update_javabin) / 1e6
+    ))
+
+    for label, stdlib_func, json_func, javabin_func in [
+        ('decode select', lambda: json.loads(json_body.decode('utf-8')),
+         lambda: codec.loads(json_body), lambda: javabin.loads(javabin_body)),
+        ('encode update', lambda: codec._stdlib_dumps(docs),
+         lambda: codec.dumps(docs), lambda: javabin.dumps_update(docs)),
+    ]:
+        print('%s: stdlib json %.1f ms, wukong.codec %.1f ms, javabin %.1f ms' % (
+            label,
+            best(stdlib_func) * 1000,
+            best(json_func) * 1000,
+            best(javabin_func) * 1000
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -30,8 +30,12 @@ setup(
         "kazoo",
         "six>=1.6.1"
     ],
+    extras_require={
+        "async": ["aiohttp"],
+        "fast": ["orjson"],
+    },
     tests_require=read('test-requirements.txt'),
-    packages=find_packages(exclude=['tests']),
+    packages=find_packages(exclude=['tests', 'benchmarks']),
     classifiers=[
         "Topic :: Software Development :: Libraries :: Python Modules",
         "License :: OSI Approved :: MIT License",
@@ -0,0 +1,351 @@
+import asyncio
+import mock
+import json
+from wukong.aio import AsyncSolrRequest, AsyncSolrAPI
+from wukong.breaker import CircuitBreakerRegistry
+from wukong.errors import SolrError
+from wukong import codec
+from wukong.models import SolrDoc
+from wukong.query import SolrQueryManager
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+class FakeResponse(object):
+    def __init__(self, status, data):
+        self.status = status
+        self.reason = 'Test Reason'
+        self.data = data
+
+    async def read(self):
+        return json.dumps(self.data).encode('utf-8')
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+class FakeSession(object):
+    closed = False
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        response = self.responses(url)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def close(self):
+        self.closed = True
+
+
+def run(coroutine):
+    return asyncio.new_event_loop().run_until_complete(coroutine)
+
+
+class TestAsyncSolrRequest(unittest.TestCase):
+
+    def test_request(self):
+        client = AsyncSolrRequest(["http://localsolr:8080/solr/"])
+        client.client = FakeSession(
+            lambda url: FakeResponse(200, {'fake_data': 'fake_value'})
+        )
+
+        response = run(client.get('fake_path', {'fake_params': 'fake_value'}))
+
+        self.assertEqual(response, {'fake_data': 'fake_value'})
+        method, url, kwargs = client.client.calls[0]
+        self.assertEqual(method, 'GET')
+        self.assertEqual(url, 'http://localsolr:8080/solr/fake_path')
+        self.assertEqual(kwargs['params'], {
+            'fake_params': 'fake_value',
+            'wt': 'json',
+            'omitHeader': 'true',
+            'json.nl': 'map'
+        })
+
+    def test_request__failover(self):
+        import aiohttp
+
+        client = AsyncSolrRequest(
+            ["http://localsolr:7070/solr/", "http://localsolr:8080/solr/"]
+        )
+
+        def responses(url):
+            if url.startswith('http://localsolr:7070'):
+                return aiohttp.ClientConnectionError('Server down!')
+            return FakeResponse(200, {'fake_data': 'fake_value'})
+
+        client.client = FakeSession(responses)
+        for _ in range(5):
+            response = run(client.post('fake_path', body='{}'))
+            self.assertEqual(response, {'fake_data': 'fake_value'})
+
+    def test_request__all_servers_down(self):
+        client = AsyncSolrRequest(
+            ["http://localsolr:7070/solr/", "http://localsolr:8080/solr/"]
+        )
+        client.client = FakeSession(lambda url: FakeResponse(500, {}))
+
+        with self.assertRaises(SolrError) as cm:
+            run(client.get('fake_path'))
+
+        self.assertEqual(len(client.client.calls), 2)
+        self.assertEqual(str(cm.exception), "Unable to fetch from any SOLR nodes")
+
+    def test_request__client_error_fails_fast(self):
+        client = AsyncSolrRequest(
+            ["http://localsolr:7070/solr/", "http://localsolr:8080/solr/"]
+        )
+        client.client = FakeSession(
+            lambda url: FakeResponse(400, {'error': {'msg': 'bad query'}})
+        )
+
+        with self.assertRaises(SolrError) as cm:
+            run(client.get('fake_path'))
+
+        self.assertEqual(len(client.client.calls), 1)
+        self.assertEqual(cm.exception.status_code, 400)
+        self.assertEqual(str(cm.exception), "SOLR returned status 400: bad query")
+
+    def test_probing_host_last_resort(self):
+        import aiohttp
+
+        hosts = ["http://localsolr:7070/solr/", "http://localsolr:8080/solr/"]
+        client = AsyncSolrRequest(
+            hosts,
+            circuit_breakers=CircuitBreakerRegistry(failure_threshold=1)
+        )
+        client.circuit_breakers.record_failure(hosts[0])
+        client.circuit_breakers.get(hosts[0])._opened_at -= 31
+        # Another request holds the probe
+        client.circuit_breakers.record_attempt(hosts[0])
+        client.client = FakeSession(
+            lambda url: aiohttp.ClientConnectionError('Server down!')
+        )
+
+        with mock.patch.object(client, '_get_hosts', return_value=list(hosts)):
+            with self.assertRaises(SolrError):
+                run(client.request('fake_path', None, 'GET', is_retry=True))
+
+        self.assertEqual(
+            [url for _, url, _ in client.client.calls],
+            [hosts[1] + 'fake_path', hosts[0] + 'fake_path']
+        )
+
+    def test_cancelled_request_is_finished(self):
+        client = AsyncSolrRequest(["http://localsolr:8080/solr/"])
+
+        class SlowResponse(FakeResponse):
+            async def read(self):
+                await asyncio.sleep(1)
+
+        client.client = FakeSession(lambda url: SlowResponse(200, {}))
+
+        async def main():
+            for _ in range(3):
+                with self.assertRaises(asyncio.TimeoutError):
+                    await asyncio.wait_for(client.get('fake_path'), 0.01)
+
+        run(main())
+        stats = client.host_selector._get_stats("http://localsolr:8080/solr/")
+        self.assertEqual(stats.in_flight, 0)
+        self.assertEqual(stats.failures, 3)
+
+    def test_session_per_event_loop(self):
+        client = AsyncSolrRequest(["http://localsolr:8080/solr/"], pool_maxsize=4)
+
+        async def get_client():
+            return client._get_client()
+
+        first_loop = asyncio.new_event_loop()
+        first = first_loop.run_until_complete(get_client())
+        self.assertEqual(first.connector.limit, 4)
+        self.assertIs(first_loop.run_until_complete(get_client()), first)
+        first_loop.close()
+
+        # e.g. a second `asyncio.run`
+        loop = asyncio.new_event_loop()
+        second = loop.run_until_complete(get_client())
+        self.assertIsNot(second, first)
+        loop.run_until_complete(client.close())
+        self.assertTrue(second.closed)
+        self.assertIsNone(client.client)
+        loop.close()
+
+    def test_session_per_thread_rejected(self):
+        with self.assertRaises(SolrError):
+            AsyncSolrRequest(["http://localsolr:8080/solr/"], session_per_thread=True)
+
+    def test_post_to_host_rejected(self):
+        client = AsyncSolrRequest(["http://localsolr:8080/solr/"])
+        with self.assertRaises(SolrError):
+            run(client.post_to_host("http://localsolr:8080/solr/", 'update'))
+
+
+class TestAsyncSolrAPI(unittest.TestCase):
+
+    api = AsyncSolrAPI("localsolr:8080", "test_collection")
+
+    def test_select(self):
+        async def post(*args, **kwargs):
+            return {"response": {"numFound": 3, "docs": [{"pk": "Test PK"}]}}
+
+        with mock.patch('wukong.aio.AsyncSolrRequest.post') as mock_post:
+            mock_post.side_effect = post
+            result = run(self.api.select({"q": "*:*"}, extra="extra_value"))
+
+        mock_post.assert_called_once_with(
+            'test_collection/select',
+            body=codec.dumps({'params': {"q": "*:*", "extra": "extra_value"}}),
+            headers=None
+        )
+        self.assertEqual(result, {'docs': [{"pk": "Test PK"}], 'total': 3})
+
+    def test_update(self):
+        async def post(*args, **kwargs):
+            return {}
+
+        with mock.patch('wukong.aio.AsyncSolrRequest.post') as mock_post:
+            mock_post.side_effect = post
+            docs = [{"pk": "Test PK 1"}]
+            run(self.api.update(docs, commit=True))
+
+        mock_post.assert_called_once_with(
+            'test_collection/update/json',
+            params={"commit": "true"},
+            body=codec.dumps(docs),
+            headers=None
+        )
+
+    def test_route_updates_rejected(self):
+        with self.assertRaises(SolrError):
+            AsyncSolrAPI("localsolr:8080", "test_collection", route_updates=True)
+
+    def test_get_schema(self):
+        async def get(*args, **kwargs):
+            return {"schema": {"uniqueKey": "pk"}}
+
+        with mock.patch('wukong.aio.AsyncSolrRequest.get') as mock_get:
+            mock_get.side_effect = get
+            schema = run(self.api.get_schema())
+
+        mock_get.assert_called_once_with('test_collection/schema')
+        self.assertEqual(schema, {"uniqueKey": "pk"})
+
+    def test_get_unique_key(self):
+        async def get(*args, **kwargs):
+            return {"schema": {"uniqueKey": "pk"}}
+
+        api = AsyncSolrAPI("localsolr:8080", "test_collection")
+        with mock.patch('wukong.aio.AsyncSolrRequest.get') as mock_get:
+            mock_get.side_effect = get
+            self.assertEqual(run(api._get_unique_key()), "pk")
+            self.assertEqual(run(api._get_unique_key()), "pk")
+
+        self.assertEqual(mock_get.call_count, 1)
+
+    def test_is_alive(self):
+        state = {
+            "test_collection": {"shards": {"shard1": {"replicas": {
+                "core_node1": {"state": "active"},
+                "core_node2": {"state": "down"}
+            }}}}
+        }
+
+        async def get(*args, **kwargs):
+            return {"znode": {"data": json.dumps(state)}}
+
+        with mock.patch('wukong.aio.AsyncSolrRequest.get') as mock_get:
+            mock_get.side_effect = get
+            self.assertFalse(run(self.api.is_alive()))
+            state["test_collection"]["shards"]["shard1"]["replicas"]["core_node2"]["state"] = "active"
+            self.assertTrue(run(self.api.is_alive()))
+
+        mock_get.assert_called_with(
+            'zookeeper',
+            {'detail': 'true', 'path': '/clusterstate.json'}
+        )
+
+    def test_is_alive__server_down(self):
+        async def get(*args, **kwargs):
+            raise SolrError("Unable to fetch from any SOLR nodes")
+
+        with mock.patch('wukong.aio.AsyncSolrRequest.get') as mock_get:
+            mock_get.side_effect = get
+            self.assertFalse(run(self.api.is_alive()))
+
+
+class FakeSolrDoc(SolrDoc):
+    collection_name = "fake_collection"
+    solr_hosts = "fake_host"
+
+
+class TestAsyncQuery(unittest.TestCase):
+
+    def _select(self, docs):
+        async def select(*args, **kwargs):
+            return {
+                'docs': docs,
+                'facets': {'facet_fields': {}},
+                'groups': {'name': {}}
+            }
+        return select
+
+    def test_aall_and_aget(self):
+        docs = [{"id": 1, "name": "Test Name 1"}, {"id": 2, "name": "Test Name 2"}]
+        with mock.patch('wukong.aio.AsyncSolrAPI.select') as mock_select:
+            mock_select.side_effect = self._select(docs)
+            with mock.patch('wukong.api.SolrAPI.get_schema') as mock_schema:
+                mock_schema.return_value = {
+                    "uniqueKey": "id",
+                    "fields": [
+                        {"name": "id", "type": "int"},
+                        {"name": "name", "type": "string"}
+                    ]
+                }
+
+                qm = SolrQueryManager(FakeSolrDoc)
+                result = run(qm.aall())
+                self.assertEqual(result[1].name, "Test Name 2")
+
+                doc = run(qm.aget(id__eq=1))
+                self.assertEqual(doc.id, 1)
+                self.assertEqual(mock_select.call_args[0][0]['rows'], 1)
+
+                self.assertEqual(run(qm.afacets()), {'facet_fields': {}})
+                self.assertEqual(run(qm.agroups()), {'name': {}})
+                self.assertEqual(run(qm.araw())['docs'], docs)
+
+    def test_aclose(self):
+        class ClosedSolrDoc(SolrDoc):
+            collection_name = "fake_collection"
+            solr_hosts = "fake_host"
+
+        # Nothing to close yet
+        run(ClosedSolrDoc.aclose())
+
+        async def close():
+            pass
+
+        with mock.patch('wukong.aio.AsyncSolrAPI.close') as mock_close:
+            mock_close.side_effect = close
+            ClosedSolrDoc.async_solr
+            run(ClosedSolrDoc.aclose())
+
+        self.assertEqual(mock_close.call_count, 1)
+
+    def test_aone_with_none_returned(self):
+        with mock.patch('wukong.aio.AsyncSolrAPI.select') as mock_select:
+            mock_select.side_effect = self._select([])
+            qm = SolrQueryManager(FakeSolrDoc)
+            self.assertIsNone(run(qm.aone()))
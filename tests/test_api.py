@@ -1,6 +1,9 @@
 import mock
 from wukong.api import SolrAPI
 from wukong.errors import *
+from wukong import codec, javabin
+from wukong.routing import ShardRouter
+import gzip
 import json
 
 try:
@@ -27,6 +30,7 @@ class TestSolrAPI(unittest.TestCase):
                ["http://localsolr:8080/solr/"]
 
         assert api.solr_collection == "test_collection"
+        assert api.client.collection == "test_collection"
 
     def test_api_constructor__node_list(self):
         api = SolrAPI(
@@ -101,10 +105,266 @@ class TestSolrAPI(unittest.TestCase):
 
             mock_method.assert_called_once_with(
                 'test_collection/update/json',
-                body=json.dumps(docs),
+                body=codec.dumps(docs),
                 params={"commit": "true"}
             )
 
+    def test_api_update__compressed(self):
+        api = SolrAPI(
+            "localsolr:7070,localsolr:8080",
+            "test_collection",
+            compress_threshold=100
+        )
+        docs = [{"pk": "Test PK %s" % i} for i in range(100)]
+
+        with mock.patch('wukong.request.SolrRequest.post') as mock_method:
+            mock_method.return_value = {}
+            api.update(docs)
+
+        args, kwargs = mock_method.call_args
+        self.assertEqual(kwargs['headers'], {'Content-Encoding': 'gzip'})
+        self.assertEqual(
+            json.loads(gzip.decompress(b''.join(kwargs['body']))),
+            docs
+        )
+
+    def test_api_update__javabin(self):
+        api = SolrAPI(
+            "localsolr:7070,localsolr:8080",
+            "test_collection",
+            wire_format='javabin'
+        )
+        docs = [{"pk": "Test PK 1"}, {"pk": "Test PK 2"}]
+
+        with mock.patch('wukong.request.SolrRequest.post') as mock_method:
+            mock_method.return_value = {}
+            api.update(docs)
+
+        mock_method.assert_called_once_with(
+            'test_collection/update',
+            params={},
+            body=javabin.dumps_update(docs),
+            headers={'content-type': 'application/javabin'}
+        )
+
+    def test_api_select__javabin(self):
+        api = SolrAPI(
+            "localsolr:7070,localsolr:8080",
+            "test_collection",
+            wire_format='javabin'
+        )
+
+        with mock.patch('wukong.request.SolrRequest.post') as mock_method:
+            mock_method.return_value = {}
+            api.select({"q": "*:*"})
+
+        mock_method.assert_called_once_with(
+            'test_collection/select',
+            body=codec.dumps({'params': {"q": "*:*"}}),
+            params={'wt': 'javabin'}
+        )
+
+    def test_api_constructor__unsupported_wire_format(self):
+        with self.assertRaises(ValueError):
+            SolrAPI("localsolr:7070", "test_collection", wire_format='xml')
+
+    def test_api_select__compressed_below_threshold(self):
+        api = SolrAPI(
+            "localsolr:7070,localsolr:8080",
+            "test_collection",
+            compress_threshold=1024
+        )
+
+        with mock.patch('wukong.request.SolrRequest.post') as mock_method:
+            mock_method.return_value = {}
+            api.select({"q": "*:*"})
+
+        mock_method.assert_called_once_with(
+            'test_collection/select',
+            body=codec.dumps({'params': {"q": "*:*"}}),
+            headers={}
+        )
+
+    def test_api_select__deadline(self):
+        with mock.patch('wukong.request.SolrRequest.post') as mock_method:
+            mock_method.return_value = {}
+            self.api.select({"q": "*:*"}, deadline=2)
+
+        mock_method.assert_called_once_with(
+            'test_collection/select',
+            body=codec.dumps({'params': {"q": "*:*"}}),
+            deadline=2
+        )
+
+    def test_api_select__stream(self):
+        with mock.patch('wukong.request.SolrRequest.post') as mock_method:
+            self.api.select({"q": "*:*"}, stream=True)
+
+        mock_method.assert_called_once_with(
+            'test_collection/select',
+            body=codec.dumps({'params': {"q": "*:*"}}),
+            stream=True
+        )
+
+    def _routing_api(self):
+        api = SolrAPI(
+            "localsolr:7070,localsolr:8080",
+            "test_collection",
+            route_updates=True
+        )
+        api._unique_key = 'id'
+        return api
+
+    def _router(self, shard1_leader='http://127.0.0.1:8080/solr/shard1'):
+        router = ShardRouter({'shards': {}})
+        router.ranges = [
+            ((-0x80000000, -1), 'shard1'),
+            ((0, 0x7fffffff), 'shard2'),
+        ]
+        router.leaders = {
+            'shard1': shard1_leader,
+            'shard2': 'http://127.0.0.1:9090/solr/shard2',
+        }
+        return router
+
+    def test_api_update__routed(self):
+        api = self._routing_api()
+        router = self._router()
+        docs = [{"id": str(i)} for i in range(20)]
+
+        with mock.patch('wukong.request.SolrRequest.get_shard_router') as mock_router:
+            mock_router.return_value = router
+            with mock.patch('wukong.request.SolrRequest.post_to_host') as mock_post_to_host:
+                mock_post_to_host.return_value = {}
+                with mock.patch('wukong.request.SolrRequest.post') as mock_post:
+                    mock_post.return_value = {}
+                    api.update(docs, commit=True)
+
+        sent = {}
+        for args, kwargs in mock_post_to_host.call_args_list:
+            self.assertEqual(args[1], 'update/json')
+            sent[args[0]] = codec.loads(kwargs['body'])
+
+        batches = router.partition(docs, 'id')
+        self.assertEqual(sent, {
+            'http://127.0.0.1:8080/solr/shard1': batches['shard1'],
+            'http://127.0.0.1:9090/solr/shard2': batches['shard2'],
+        })
+        # A single commit for the whole collection
+        mock_post.assert_called_once_with(
+            'test_collection/update/json',
+            params={'commit': 'true'}
+        )
+
+    def test_api_update__routed_leader_changed(self):
+        api = self._routing_api()
+        old_router = self._router()
+        new_router = self._router('http://127.0.0.1:7070/solr/shard1')
+        docs = [{"id": "foo"}]
+        self.assertEqual(old_router.get_shard("foo"), 'shard1')
+
+        def post_to_host(host, path, **kwargs):
+            if host == 'http://127.0.0.1:8080/solr/shard1':
+                return None
+            return {'host': host}
+
+        with mock.patch('wukong.request.SolrRequest.get_shard_router') as mock_router:
+            mock_router.side_effect = lambda refresh=False: new_router if refresh else old_router
+            with mock.patch('wukong.request.SolrRequest.post_to_host') as mock_post_to_host:
+                mock_post_to_host.side_effect = post_to_host
+                response = api.update(docs)
+
+        self.assertEqual(response, [{'host': 'http://127.0.0.1:7070/solr/shard1'}])
+        mock_router.assert_called_with(refresh=True)
+
+    def test_api_update__routed_leader_core_gone(self):
+        api = self._routing_api()
+        old_router = self._router()
+        new_router = self._router('http://127.0.0.1:7070/solr/shard1')
+        docs = [{"id": "foo"}]
+
+        def post_to_host(host, path, **kwargs):
+            if host == 'http://127.0.0.1:8080/solr/shard1':
+                # e.g. the parent core of a split shard
+                raise SolrError('SOLR returned status 404: Not Found', status_code=404)
+            return {'host': host}
+
+        with mock.patch('wukong.request.SolrRequest.get_shard_router') as mock_router:
+            mock_router.side_effect = lambda refresh=False: new_router if refresh else old_router
+            with mock.patch('wukong.request.SolrRequest.post_to_host') as mock_post_to_host:
+                mock_post_to_host.side_effect = post_to_host
+                response = api.update(docs)
+
+        self.assertEqual(response, [{'host': 'http://127.0.0.1:7070/solr/shard1'}])
+        mock_router.assert_called_with(refresh=True)
+
+    def test_api_update__routed_leader_error(self):
+        api = self._routing_api()
+        router = self._router()
+
+        with mock.patch('wukong.request.SolrRequest.get_shard_router') as mock_router:
+            mock_router.return_value = router
+            with mock.patch('wukong.request.SolrRequest.post_to_host') as mock_post_to_host:
+                mock_post_to_host.side_effect = SolrError('bad doc', status_code=400)
+                with self.assertRaises(SolrError):
+                    api.update([{"id": "foo"}])
+
+    def test_api_update__routed_falls_back(self):
+        api = self._routing_api()
+        router = self._router()
+        docs = [{"id": "foo"}]
+
+        with mock.patch('wukong.request.SolrRequest.get_shard_router') as mock_router:
+            mock_router.return_value = router
+            with mock.patch('wukong.request.SolrRequest.post_to_host') as mock_post_to_host:
+                mock_post_to_host.return_value = None
+                with mock.patch('wukong.request.SolrRequest.post') as mock_post:
+                    mock_post.return_value = {}
+                    api.update(docs)
+
+        mock_post.assert_called_once_with(
+            'test_collection/update/json',
+            body=codec.dumps(docs),
+            headers=None
+        )
+
+    def test_api_update__routed_deadline(self):
+        api = self._routing_api()
+        router = self._router()
+        docs = [{"id": "foo"}]
+
+        with mock.patch('wukong.request.SolrRequest.get_shard_router') as mock_router:
+            mock_router.return_value = router
+            with mock.patch('wukong.request.SolrRequest.post_to_host') as mock_post_to_host:
+                mock_post_to_host.return_value = None
+                with mock.patch('wukong.request.SolrRequest.post') as mock_post:
+                    mock_post.return_value = {}
+                    api.update(docs, deadline=2)
+
+        # Every attempt gets what is left of the deadline
+        deadlines = [kwargs['deadline'] for _, kwargs in mock_post_to_host.call_args_list]
+        deadlines.append(mock_post.call_args[1]['deadline'])
+        self.assertEqual(len(deadlines), 2)
+        for deadline in deadlines:
+            self.assertTrue(0 < deadline <= 2)
+        self.assertTrue(deadlines[1] <= deadlines[0])
+
+    def test_api_update__not_routed_without_router(self):
+        api = self._routing_api()
+        docs = [{"id": "foo"}]
+
+        with mock.patch('wukong.request.SolrRequest.get_shard_router') as mock_router:
+            mock_router.return_value = None
+            with mock.patch('wukong.request.SolrRequest.post') as mock_post:
+                mock_post.return_value = {}
+                api.update(docs)
+
+        mock_post.assert_called_once_with(
+            'test_collection/update/json',
+            params={},
+            body=codec.dumps(docs)
+        )
+
     def test_api_update__no_docs(self):
         with mock.patch('wukong.request.SolrRequest.post') as mock_method:
 
@@ -138,7 +398,7 @@ class TestSolrAPI(unittest.TestCase):
             result = self.api.select(query_dict, extra="extra_value")
             mock_method.assert_called_once_with(
                 'test_collection/select',
-                body=json.dumps({'params': {
+                body=codec.dumps({'params': {
                     "q":"test_field:test_value",
                     "rows":10,
                     "extra": "extra_value"
@@ -173,7 +433,7 @@ class TestSolrAPI(unittest.TestCase):
             result = self.api.select(query_dict, groups=True, extra="extra_value")
             mock_method.assert_called_once_with(
                 'test_collection/select',
-                body=json.dumps({'params': {
+                body=codec.dumps({'params': {
                     "q":"test_field:test_value",
                     "rows":10,
                     "group": "on",
@@ -221,7 +481,7 @@ class TestSolrAPI(unittest.TestCase):
             result = self.api.select(query_dict, groups=True, facets=True)
             mock_method.assert_called_once_with(
                 'test_collection/select',
-                body=json.dumps({'params': {
+                body=codec.dumps({'params': {
                     "q":"test_field:test_value",
                     "rows":10,
                     "group": "on",
@@ -241,7 +501,7 @@ class TestSolrAPI(unittest.TestCase):
 
             mock_method.assert_called_once_with(
                 'test_collection/update/json',
-                body=json.dumps({
+                body=codec.dumps({
                     "delete":{
                         "query": "pk:1"
                     }
@@ -301,7 +561,7 @@ class TestSolrAPI(unittest.TestCase):
 
             mock_method.assert_called_once_with(
                 'test_collection/schema/fields',
-                body=json.dumps(fields)
+                body=codec.dumps(fields)
             )
 
     def test_api_add_schema_fields__no_docs(self):
@@ -347,7 +607,7 @@ class TestSolrAPI(unittest.TestCase):
         with mock.patch('wukong.request.SolrRequest.get') as mock_get:
             mock_get.return_value = {
                 "znode": {
-                    "data": json.dumps({
+                    "data": codec.dumps({
                         "test_collection": {
                             "shards":{
                                 "test_collection_shard1":{
@@ -385,7 +645,7 @@ class TestSolrAPI(unittest.TestCase):
         with mock.patch('wukong.request.SolrRequest.get') as mock_get:
             mock_get.return_value = {
                 "znode": {
-                    "data": json.dumps({
+                    "data": codec.dumps({
                         "test_collection": {
                             "shards":{
                                 "test_collection_shard1":{
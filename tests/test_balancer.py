@@ -0,0 +1,64 @@
+from wukong.balancer import (
+    HostSelector, RandomSelector, PowerOfTwoSelector, LeastOutstandingSelector
+)
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+HOSTS = ["http://localsolr:7070/solr/", "http://localsolr:8080/solr/"]
+
+
+class TestHostSelector(unittest.TestCase):
+
+    def test_order_not_implemented(self):
+        with self.assertRaises(NotImplementedError):
+            HostSelector().order(HOSTS)
+
+    def test_ewma_latency(self):
+        selector = RandomSelector(decay=0.5)
+        selector.start(HOSTS[0])
+        self.assertEqual(selector.scores()[HOSTS[0]]['in_flight'], 1)
+
+        selector.finish(HOSTS[0], 1.0)
+        selector.start(HOSTS[0])
+        selector.finish(HOSTS[0], 3.0)
+
+        scores = selector.scores()[HOSTS[0]]
+        self.assertEqual(scores['latency'], 2.0)
+        self.assertEqual(scores['in_flight'], 0)
+        self.assertEqual(scores['requests'], 2)
+        self.assertEqual(scores['score'], 2.0)
+
+    def test_failure_penalty(self):
+        selector = RandomSelector(failure_penalty=10)
+        selector.start(HOSTS[0])
+        selector.finish(HOSTS[0], 0.01, success=False)
+
+        scores = selector.scores()[HOSTS[0]]
+        self.assertEqual(scores['latency'], 10)
+        self.assertEqual(scores['failures'], 1)
+
+    def test_random_selector(self):
+        self.assertEqual(sorted(RandomSelector().order(HOSTS)), sorted(HOSTS))
+
+    def test_power_of_two_selector(self):
+        selector = PowerOfTwoSelector()
+        selector.start(HOSTS[0])
+        selector.finish(HOSTS[0], 2.0)
+        selector.start(HOSTS[1])
+        selector.finish(HOSTS[1], 0.1)
+
+        for _ in range(10):
+            self.assertEqual(selector.order(HOSTS), [HOSTS[1], HOSTS[0]])
+
+        self.assertEqual(selector.order(HOSTS[:1]), HOSTS[:1])
+
+    def test_least_outstanding_selector(self):
+        selector = LeastOutstandingSelector()
+        selector.start(HOSTS[0])
+
+        for _ in range(10):
+            self.assertEqual(selector.order(HOSTS), [HOSTS[1], HOSTS[0]])
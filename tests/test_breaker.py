@@ -0,0 +1,85 @@
+import mock
+from wukong.breaker import CircuitBreaker, CircuitBreakerRegistry
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+HOSTS = ["http://localsolr:7070/solr/", "http://localsolr:8080/solr/"]
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=30)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+
+    def test_success_resets_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=30)
+        with mock.patch('wukong.breaker.time.time') as mock_time:
+            mock_time.return_value = 100
+            breaker.record_failure()
+            self.assertFalse(breaker.allow_request())
+
+            mock_time.return_value = 131
+            self.assertTrue(breaker.allow_request())
+            self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+            # Only one probe at a time
+            self.assertFalse(breaker.allow_request())
+
+            # A failed probe re-opens the breaker
+            breaker.record_failure()
+            self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+            self.assertFalse(breaker.allow_request())
+
+            mock_time.return_value = 162
+            self.assertTrue(breaker.allow_request())
+            breaker.record_success()
+            self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+
+class TestCircuitBreakerRegistry(unittest.TestCase):
+
+    def test_quarantined_hosts_go_last(self):
+        registry = CircuitBreakerRegistry(failure_threshold=1)
+        registry.record_failure(HOSTS[0])
+
+        self.assertEqual(registry.order(HOSTS), [HOSTS[1], HOSTS[0]])
+        self.assertEqual(registry.order(HOSTS[:1]), HOSTS[:1])
+        self.assertEqual(registry.states()[HOSTS[0]], CircuitBreaker.OPEN)
+
+    def test_order_does_not_claim_the_probe(self):
+        registry = CircuitBreakerRegistry(failure_threshold=1, recovery_timeout=30)
+        with mock.patch('wukong.breaker.time.time') as mock_time:
+            mock_time.return_value = 100
+            registry.record_failure(HOSTS[0])
+
+            mock_time.return_value = 131
+            # Only the other host is sent a request
+            self.assertEqual(registry.order(HOSTS[::-1]), HOSTS[::-1])
+            registry.record_attempt(HOSTS[1])
+            registry.record_success(HOSTS[1])
+
+            # The quarantined host can still be probed
+            self.assertEqual(registry.order(HOSTS), HOSTS)
+            self.assertTrue(registry.record_attempt(HOSTS[0]))
+            self.assertEqual(registry.states()[HOSTS[0]], CircuitBreaker.HALF_OPEN)
+            # A concurrent request is not let through while the probe is out
+            self.assertFalse(registry.record_attempt(HOSTS[0]))
+            # and only by one request at a time
+            self.assertEqual(registry.order(HOSTS), HOSTS[::-1])
+            registry.record_success(HOSTS[0])
+            self.assertEqual(registry.states()[HOSTS[0]], CircuitBreaker.CLOSED)
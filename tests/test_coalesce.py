@@ -0,0 +1,199 @@
+import asyncio
+import mock
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from wukong.api import SolrAPI
+from wukong.coalesce import SingleFlight, AsyncSingleFlight
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+THREADS = 8
+
+
+def run_concurrently(func, count=THREADS):
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        futures = [executor.submit(func) for _ in range(count)]
+        return [future.result() for future in futures]
+
+
+class BlockingCall(object):
+    """
+    Holds every call until `waiters` callers are waiting on it
+    """
+    def __init__(self, single_flight, waiters, result=None, error=None):
+        self.single_flight = single_flight
+        self.waiters = waiters
+        self.result = result
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        for _ in range(1000):
+            calls = list(self.single_flight._calls.values())
+            if calls and calls[0].waiters >= self.waiters:
+                break
+            threading.Event().wait(0.001)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_concurrent_calls_are_shared(self):
+        single_flight = SingleFlight()
+        call = BlockingCall(single_flight, THREADS - 1, result={'docs': [1]})
+
+        results = run_concurrently(lambda: single_flight.do('key', call))
+
+        self.assertEqual(call.calls, 1)
+        self.assertEqual(results, [{'docs': [1]}] * THREADS)
+        # Every caller can change its own copy
+        self.assertEqual(len(set(id(result) for result in results)), THREADS)
+        self.assertEqual(single_flight._calls, {})
+
+    def test_errors_are_shared(self):
+        single_flight = SingleFlight()
+        call = BlockingCall(single_flight, THREADS - 1, error=ValueError('down'))
+
+        def do():
+            with self.assertRaises(ValueError):
+                single_flight.do('key', call)
+
+        run_concurrently(do)
+        self.assertEqual(call.calls, 1)
+
+    def test_sequential_calls_are_not_shared(self):
+        single_flight = SingleFlight()
+        result = {'docs': []}
+        func = mock.Mock(return_value=result)
+
+        self.assertIs(single_flight.do('key', func), result)
+        self.assertIs(single_flight.do('key', func), result)
+        self.assertEqual(func.call_count, 2)
+
+
+class TestAsyncSingleFlight(unittest.TestCase):
+
+    def test_concurrent_calls_are_shared(self):
+        single_flight = AsyncSingleFlight()
+        calls = []
+
+        async def func():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {'docs': [1]}
+
+        async def main():
+            return await asyncio.gather(*[
+                single_flight.do('key', func) for _ in range(THREADS)
+            ])
+
+        results = asyncio.new_event_loop().run_until_complete(main())
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'docs': [1]}] * THREADS)
+        self.assertEqual(len(set(id(result) for result in results)), THREADS)
+
+    def test_errors_are_shared(self):
+        single_flight = AsyncSingleFlight()
+
+        async def func():
+            await asyncio.sleep(0.01)
+            raise ValueError('down')
+
+        async def main():
+            return await asyncio.gather(*[
+                single_flight.do('key', func) for _ in range(THREADS)
+            ], return_exceptions=True)
+
+        results = asyncio.new_event_loop().run_until_complete(main())
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+    def test_first_caller_cancelled(self):
+        single_flight = AsyncSingleFlight()
+        calls = []
+
+        async def func():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            return {'docs': [1]}
+
+        async def main():
+            first = asyncio.ensure_future(single_flight.do('key', func))
+            await asyncio.sleep(0)
+            others = asyncio.gather(*[
+                single_flight.do('key', func) for _ in range(3)
+            ])
+            await asyncio.sleep(0.005)
+            # e.g. the client of an aiohttp handler disconnected
+            first.cancel()
+            results = await others
+            self.assertTrue(first.cancelled())
+            return results
+
+        results = asyncio.new_event_loop().run_until_complete(main())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'docs': [1]}] * 3)
+
+    def test_every_caller_cancelled(self):
+        single_flight = AsyncSingleFlight()
+        finished = []
+
+        async def func():
+            await asyncio.sleep(0.02)
+            finished.append(1)
+
+        async def main():
+            callers = [
+                asyncio.ensure_future(single_flight.do('key', func))
+                for _ in range(2)
+            ]
+            await asyncio.sleep(0.005)
+            for caller in callers:
+                caller.cancel()
+            await asyncio.sleep(0.03)
+
+        asyncio.new_event_loop().run_until_complete(main())
+        # Nobody is left to use it, the call is cancelled
+        self.assertEqual(finished, [])
+        self.assertEqual(single_flight._calls, {})
+
+
+class TestCoalescedSelect(unittest.TestCase):
+
+    def test_select(self):
+        api = SolrAPI(
+            "localsolr:7070,localsolr:8080",
+            "test_collection",
+            coalesce_selects=True
+        )
+        response = {'response': {'numFound': 1, 'docs': [{'id': 1}]}}
+
+        with mock.patch('wukong.request.SolrRequest.post') as mock_post:
+            mock_post.side_effect = BlockingCall(
+                api._single_flight, THREADS - 1, result=response
+            )
+            results = run_concurrently(lambda: api.select({'q': '*:*'}))
+
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(results, [{'docs': [{'id': 1}], 'total': 1}] * THREADS)
+
+    def test_different_queries_are_not_shared(self):
+        api = SolrAPI(
+            "localsolr:7070,localsolr:8080",
+            "test_collection",
+            coalesce_selects=True
+        )
+
+        with mock.patch('wukong.request.SolrRequest.post') as mock_post:
+            mock_post.return_value = {}
+            api.select({'q': 'a:1'})
+            api.select({'q': 'a:2'})
+
+        self.assertEqual(mock_post.call_count, 2)
@@ -0,0 +1,100 @@
+import datetime as dt
+import decimal
+import json
+import mock
+import sys
+import types
+import uuid
+from wukong import codec
+
+try:
+    from importlib import reload
+except ImportError:
+    from imp import reload
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+class TestCodec(unittest.TestCase):
+
+    def test_loads(self):
+        self.assertEqual(codec.loads(b'{"a": [1, "\\u00e9"]}'), {'a': [1, u'é']})
+        self.assertEqual(codec.loads('{"a": 1}'), {'a': 1})
+
+    def test_loads__error(self):
+        with self.assertRaises(ValueError):
+            codec.loads(b'Malformed Response')
+
+    def test_dumps(self):
+        data = {
+            'created': dt.datetime(2020, 1, 2, 3, 4, 5),
+            'day': dt.date(2020, 1, 2),
+            'price': decimal.Decimal('1.5'),
+            'uuid': uuid.UUID('12345678123456781234567812345678'),
+            'tags': set(['a']),
+            'unknown': object(),
+        }
+
+        self.assertEqual(json.loads(codec.dumps(data)), {
+            'created': '2020-01-02T03:04:05',
+            'day': '2020-01-02',
+            'price': 1.5,
+            'uuid': '12345678-1234-5678-1234-567812345678',
+            'tags': ['a'],
+            'unknown': None,
+        })
+
+    def test_dumps__non_str_keys(self):
+        self.assertEqual(json.loads(codec.dumps({1: 'a', 2.5: 'b'})), {'1': 'a', '2.5': 'b'})
+
+    def _reload(self, modules):
+        """
+        Load the codec again with only the given JSON libraries installed
+        """
+        self.addCleanup(reload, codec)
+        with mock.patch.dict(sys.modules, modules):
+            reload(codec)
+
+    def test_orjson_backend(self):
+        try:
+            import orjson
+        except ImportError:
+            self.skipTest('orjson is not installed')
+
+        self._reload({'orjson': orjson, 'ujson': None})
+
+        self.assertEqual(codec.name, 'orjson')
+        self.assertEqual(codec.loads(codec.dumps({1: dt.date(2020, 1, 2)})), {'1': '2020-01-02'})
+
+    def test_ujson_backend(self):
+        ujson = types.ModuleType('ujson')
+        ujson.loads = mock.Mock(side_effect=json.loads)
+        self._reload({'orjson': None, 'ujson': ujson})
+
+        self.assertEqual(codec.name, 'ujson')
+        self.assertEqual(codec.loads('{"a": 1}'), {'a': 1})
+        ujson.loads.assert_called_once_with('{"a": 1}')
+        self.assertEqual(codec.dumps({1: dt.date(2020, 1, 2)}), b'{"1":"2020-01-02"}')
+
+    def test_stdlib_backend(self):
+        self._reload({'orjson': None, 'ujson': None})
+
+        self.assertEqual(codec.name, 'json')
+        self.assertEqual(codec.loads(b'{"a": [1, "\\u00e9"]}'), {'a': [1, u'é']})
+        self.assertEqual(codec.dumps({1: dt.date(2020, 1, 2)}), b'{"1":"2020-01-02"}')
+
+    def test_stdlib_fallback(self):
+        data = {'created': dt.datetime(2020, 1, 2, 3, 4, 5), 'name': u'é'}
+
+        self.assertEqual(codec._stdlib_loads(codec._stdlib_dumps(data)), {
+            'created': '2020-01-02T03:04:05',
+            'name': u'é',
+        })
+
+    def test_iterencode(self):
+        data = [{'created': dt.datetime(2020, 1, 2)}]
+
+        self.assertEqual(json.loads(''.join(codec.iterencode(data))), [{'created': '2020-01-02T00:00:00'}])
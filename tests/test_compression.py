@@ -0,0 +1,46 @@
+import gzip
+import json
+from wukong import compression
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+class TestCompression(unittest.TestCase):
+
+    docs = [{"pk": "Test PK %s" % i, "test_field": "Test Value"} for i in range(1000)]
+
+    def _chunk_factory(self):
+        return json.JSONEncoder().iterencode(self.docs)
+
+    def test_compress_stream__below_threshold(self):
+        body, headers = compression.compress_stream(self._chunk_factory, 10 ** 7)
+
+        self.assertEqual(body, json.dumps(self.docs).encode('utf-8'))
+        self.assertEqual(headers, {})
+
+    def test_compress_stream__above_threshold(self):
+        body, headers = compression.compress_stream(self._chunk_factory, 1024)
+
+        self.assertEqual(headers, {'Content-Encoding': 'gzip'})
+        compressed = b''.join(body)
+        self.assertEqual(json.loads(gzip.decompress(compressed)), self.docs)
+        # The body can be sent again, e.g. to another host
+        self.assertEqual(b''.join(body), compressed)
+
+    def test_rechunk(self):
+        chunks = list(compression._rechunk(['a' * 10] * 10, chunk_size=25))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [30, 30, 30, 10])
+
+    def test_compress(self):
+        body, headers = compression.compress('{"params": {}}', 1024)
+        self.assertEqual(body, b'{"params": {}}')
+        self.assertEqual(headers, {})
+
+        data = json.dumps({'params': {'q': 'x' * 2048}})
+        body, headers = compression.compress(data, 1024)
+        self.assertEqual(gzip.decompress(body).decode('utf-8'), data)
+        self.assertEqual(headers, {'Content-Encoding': 'gzip'})
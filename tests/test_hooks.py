@@ -0,0 +1,149 @@
+import mock
+from requests.exceptions import ConnectionError
+from wukong.hooks import RequestHooks, _get_qtime
+from wukong.request import SolrRequest
+from wukong.errors import SolrError
+from wukong.retry import RetryPolicy
+import json
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+HOSTS = ["http://localsolr:7070/solr/", "http://localsolr:8080/solr/"]
+
+
+class Response(object):
+    headers = {}
+
+    @property
+    def content(self):
+        return self.text.encode('utf-8')
+
+
+class RecordingHooks(RequestHooks):
+    def __init__(self):
+        self.events = []
+
+    def before_request(self, event):
+        self.events.append(('before_request', event.host, event.status))
+
+    def after_response(self, event):
+        self.events.append(('after_response', event.host, event.status))
+
+    def on_failover(self, event):
+        self.events.append(('on_failover', event.host, event.status))
+
+    def on_retry(self, event):
+        self.events.append(('on_retry', event.attempt))
+
+    def on_zookeeper_refresh(self, event):
+        self.events.append(('on_zookeeper_refresh', event.hosts, event.success))
+
+
+class TestHooks(unittest.TestCase):
+
+    def test_get_qtime(self):
+        self.assertEqual(
+            _get_qtime(b'{"responseHeader":{"status":0,"QTime":12},"response":{}}'),
+            12
+        )
+        self.assertIsNone(_get_qtime(b'{"response":{}}'))
+        self.assertIsNone(_get_qtime(b''))
+
+    def test_request_events(self):
+        hooks = RecordingHooks()
+        client = SolrRequest(
+            ["http://localsolr:8080/solr/"],
+            hooks=[hooks],
+            omit_header=False
+        )
+        after = []
+        hooks.after_response = after.append
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            fake_response = Response()
+            fake_response.status_code = 200
+            fake_response.text = json.dumps({
+                'responseHeader': {'status': 0, 'QTime': 7},
+                'response': {'numFound': 0, 'docs': []}
+            })
+            mock_request.return_value = fake_response
+
+            client.post('collection/select', body='{"params":{}}')
+
+        self.assertEqual(mock_request.call_args[1]['params']['omitHeader'], 'false')
+        self.assertEqual(hooks.events, [
+            ('before_request', "http://localsolr:8080/solr/", None),
+        ])
+
+        event, = after
+        self.assertEqual(event.host, "http://localsolr:8080/solr/")
+        self.assertEqual(event.path, 'collection/select')
+        self.assertEqual(event.method, 'POST')
+        self.assertEqual(event.body_size, len('{"params":{}}'))
+        self.assertEqual(event.response_size, len(fake_response.text))
+        self.assertEqual(event.status, 200)
+        self.assertEqual(event.qtime, 7)
+        self.assertIsNotNone(event.elapsed)
+
+    def test_failover_events(self):
+        hooks = RecordingHooks()
+        client = SolrRequest(
+            HOSTS,
+            hooks=[hooks],
+            retry_policy=RetryPolicy(backoff_base=0)
+        )
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            mock_request.side_effect = ConnectionError("Server down!")
+            with self.assertRaises(SolrError):
+                client.get('fake_path')
+
+        first, second = [event[1] for event in hooks.events if event[0] == 'before_request']
+        self.assertEqual(hooks.events, [
+            ('before_request', first, None),
+            ('after_response', first, None),
+            ('on_failover', first, None),
+            ('before_request', second, None),
+            ('after_response', second, None),
+        ])
+
+    def test_retry_and_zookeeper_events(self):
+        hooks = RecordingHooks()
+        with mock.patch('wukong.zookeeper.Zookeeper.get_active_hosts') as mock_hosts:
+            mock_hosts.return_value = ["http://localsolr:8080/solr/"]
+            client = SolrRequest(
+                ["http://localsolr:8080/solr/"],
+                zookeeper_hosts=["http://localzook:2181"],
+                hooks=[hooks],
+                retry_policy=RetryPolicy(backoff_base=0)
+            )
+
+            with mock.patch('requests.sessions.Session.request') as mock_request:
+                mock_request.side_effect = ConnectionError("Server down!")
+                with self.assertRaises(SolrError):
+                    client.get('fake_path')
+
+        refreshes = [event for event in hooks.events if event[0] == 'on_zookeeper_refresh']
+        self.assertEqual(refreshes, [
+            ('on_zookeeper_refresh', ["http://localsolr:8080/solr/"], True),
+        ] * 2)
+        self.assertIn(('on_retry', 1), hooks.events)
+
+    def test_failing_hook_is_ignored(self):
+        class FailingHooks(RequestHooks):
+            def before_request(self, event):
+                raise ValueError('broken hook')
+
+        client = SolrRequest(["http://localsolr:8080/solr/"], hooks=[FailingHooks()])
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            fake_response = Response()
+            fake_response.status_code = 200
+            fake_response.text = json.dumps({'fake_data': 'fake_value'})
+            mock_request.return_value = fake_response
+
+            self.assertEqual(client.get('fake_path'), {'fake_data': 'fake_value'})
@@ -0,0 +1,111 @@
+import datetime as dt
+import struct
+from wukong import javabin
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+def string(text):
+    data = text.encode('utf-8')
+    return bytes([javabin.STR | len(data)]) + data
+
+
+def extern(text):
+    return bytes([javabin.EXTERN_STRING]) + string(text)
+
+
+def ref(index):
+    return bytes([javabin.EXTERN_STRING | index])
+
+
+def date(value):
+    millis = (value - dt.datetime(1970, 1, 1)) // dt.timedelta(milliseconds=1)
+    return bytes([javabin.DATE]) + struct.pack('>q', millis)
+
+
+def float32(value):
+    return bytes([javabin.FLOAT]) + struct.pack('>f', value)
+
+
+# A select response as SOLR writes it
+SELECT_RESPONSE = b''.join([
+    bytes([javabin.VERSION, javabin.NAMED_LST | 2]),
+    extern('responseHeader'),
+    bytes([javabin.ORDERED_MAP | 2]),
+    extern('status'), bytes([javabin.SINT]),
+    extern('QTime'), bytes([javabin.SINT | 3]),
+    extern('response'),
+    bytes([javabin.SOLRDOCLST, javabin.ARR | 3, javabin.SLONG | 2, javabin.SLONG]),
+    float32(1.1),
+    bytes([javabin.ARR | 2]),
+    bytes([javabin.SOLRDOC, javabin.ORDERED_MAP | 3]),
+    extern('id'), string('doc-1'),
+    extern('created'), date(dt.datetime(2020, 1, 2, 3, 4, 5)),
+    extern('score'), float32(1.1),
+    bytes([javabin.SOLRDOC, javabin.ORDERED_MAP | 3]),
+    ref(5), string('doc-2'),
+    ref(6), date(dt.datetime(2020, 1, 2, 3, 4, 5, 120000)),
+    ref(7), float32(0.5),
+])
+
+
+class TestJavabin(unittest.TestCase):
+
+    def test_loads_select_response(self):
+        self.assertEqual(javabin.loads(SELECT_RESPONSE), {
+            'responseHeader': {'status': 0, 'QTime': 3},
+            'response': {
+                'numFound': 2,
+                'start': 0,
+                'maxScore': 1.1,
+                'docs': [
+                    {'id': 'doc-1', 'created': '2020-01-02T03:04:05Z', 'score': 1.1},
+                    {'id': 'doc-2', 'created': '2020-01-02T03:04:05.120Z', 'score': 0.5},
+                ]
+            }
+        })
+
+    def test_round_trip(self):
+        values = [
+            None, True, False, 0, 14, 15, 300, -5, 2 ** 31, 2 ** 40, -2 ** 40,
+            2 ** 60, 1.5, u'café', 'x' * 100, b'\x00\x01',
+            [1, [2, 'a']], {'a': {'b': [1.25]}, 'c': None},
+        ]
+        for value in values:
+            self.assertEqual(javabin.loads(javabin.dumps(value)), value)
+
+    def test_dumps_extra_types(self):
+        self.assertEqual(
+            javabin.loads(javabin.dumps({
+                'created': dt.datetime(2020, 1, 2, 3, 4, 5),
+                'day': dt.date(2020, 1, 2),
+                'tags': set(['a']),
+                'unknown': object(),
+            })),
+            {
+                'created': '2020-01-02T03:04:05Z',
+                'day': '2020-01-02T00:00:00Z',
+                'tags': ['a'],
+                'unknown': None,
+            }
+        )
+
+    def test_dumps_update(self):
+        docs = [
+            {'id': 'doc-%s' % i, 'count': i, 'tags': ['a', 'b']}
+            for i in range(3)
+        ]
+        docs[0]['_childDocuments_'] = [{'id': 'child-1'}]
+        body = javabin.dumps_update(docs)
+
+        self.assertEqual(javabin.loads(body), {'params': {}, 'docs': docs})
+        # Field names are only written once
+        self.assertEqual(body.count(b'count'), 1)
+
+    def test_loads__errors(self):
+        for data in [b'', b'\x01\x00', b'\x02\x14', b'\x02\x06\x00']:
+            with self.assertRaises(ValueError):
+                javabin.loads(data)
@@ -0,0 +1,192 @@
+import mock
+from wukong.metrics import MetricsRegistry, MetricsHooks
+from wukong.hooks import RequestEvent, ZookeeperRefreshEvent
+from wukong.models import SolrDoc
+from wukong.request import SolrRequest
+import json
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+class Response(object):
+    headers = {}
+
+    @property
+    def content(self):
+        return self.text.encode('utf-8')
+
+
+class MetricsDoc(SolrDoc):
+    solr_hosts = "http://localsolr:8080/solr/"
+    collection_name = "metrics_collection"
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def test_counter(self):
+        metrics = MetricsRegistry()
+        counter = metrics.counter('requests_total', 'Requests', ('host',))
+        counter.inc(host='a')
+        counter.inc(2, host='a')
+        counter.inc(host='b')
+
+        self.assertIs(metrics.counter('requests_total'), counter)
+        self.assertEqual(counter.get(host='a'), 3)
+        self.assertEqual(counter.get(host='c'), 0)
+        with self.assertRaises(ValueError):
+            counter.inc(port=80)
+        with self.assertRaises(ValueError):
+            metrics.histogram('requests_total')
+
+    def test_histogram(self):
+        metrics = MetricsRegistry()
+        histogram = metrics.histogram('duration_seconds', buckets=(0.1, 1.0))
+        histogram.observe(0.05)
+        histogram.observe(0.1)
+        histogram.observe(3)
+
+        value = histogram.get()
+        self.assertEqual(
+            list(value['buckets'].items()),
+            [(0.1, 2), (1.0, 2), (float('inf'), 3)]
+        )
+        self.assertEqual(value['count'], 3)
+        self.assertAlmostEqual(value['sum'], 3.15)
+
+    def test_to_prometheus(self):
+        metrics = MetricsRegistry()
+        metrics.counter('requests_total', 'Requests', ('status',)).inc(status=200)
+        metrics.histogram(
+            'duration_seconds', 'Duration', buckets=(0.5,)
+        ).observe(0.25)
+
+        self.assertEqual(metrics.to_prometheus(), '\n'.join([
+            '# HELP requests_total Requests',
+            '# TYPE requests_total counter',
+            'requests_total{status="200"} 1',
+            '# HELP duration_seconds Duration',
+            '# TYPE duration_seconds histogram',
+            'duration_seconds_bucket{le="0.5"} 1',
+            'duration_seconds_bucket{le="+Inf"} 1',
+            'duration_seconds_sum 0.25',
+            'duration_seconds_count 1',
+        ]) + '\n')
+
+    def test_to_dict_and_clear(self):
+        metrics = MetricsRegistry()
+        metrics.counter('requests_total', 'Requests', ('status',)).inc(status=200)
+
+        self.assertEqual(metrics.to_dict(), {
+            'requests_total': {
+                'type': 'counter',
+                'help': 'Requests',
+                'samples': [{'labels': {'status': '200'}, 'value': 1}],
+            }
+        })
+
+        metrics.clear()
+        self.assertEqual(metrics.to_dict()['requests_total']['samples'], [])
+
+
+class TestMetricsHooks(unittest.TestCase):
+
+    def test_hooks(self):
+        metrics = MetricsRegistry()
+        hooks = MetricsHooks(metrics, 'collection')
+
+        event = RequestEvent('http://localsolr:8080/solr/', 'collection/select', 'POST', body_size=10)
+        event.operation = 'select'
+        event.status = 200
+        event.elapsed = 0.02
+        event.response_size = 100
+        event.qtime = 5
+        hooks.after_response(event)
+        hooks.on_failover(event)
+        hooks.on_retry(RequestEvent(None, 'collection/select', 'POST', attempt=1))
+        hooks.on_zookeeper_refresh(ZookeeperRefreshEvent([], watch=True))
+
+        labels = {
+            'collection': 'collection',
+            'host': 'http://localsolr:8080/solr/',
+            'operation': 'select',
+        }
+        self.assertEqual(hooks.requests.get(status=200, **labels), 1)
+        self.assertEqual(hooks.duration.get(**labels)['count'], 1)
+        self.assertEqual(hooks.bytes_sent.get(**labels), 10)
+        self.assertEqual(hooks.bytes_received.get(**labels), 100)
+        self.assertAlmostEqual(
+            hooks.qtime.get(collection='collection', operation='select')['sum'],
+            0.005
+        )
+        self.assertEqual(
+            hooks.failovers.get(collection='collection', host=labels['host']),
+            1
+        )
+        self.assertEqual(hooks.retries.get(collection='collection'), 1)
+        self.assertEqual(
+            hooks.zookeeper_refreshes.get(
+                collection='collection', source='watch', result='success'
+            ),
+            1
+        )
+
+    def test_request_metrics(self):
+        metrics = MetricsRegistry()
+        client = SolrRequest(
+            ["http://localsolr:8080/solr/"],
+            metrics=metrics,
+            collection='collection'
+        )
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            fake_response = Response()
+            fake_response.status_code = 200
+            fake_response.text = json.dumps({'response': {'docs': []}})
+            mock_request.return_value = fake_response
+
+            client.post('collection/select', body='{}')
+            client.post('collection/update', params={'commit': 'true'})
+
+        requests = metrics.get('wukong_requests_total')
+        for operation in ('select', 'commit'):
+            self.assertEqual(requests.get(
+                collection='collection',
+                host="http://localsolr:8080/solr/",
+                operation=operation,
+                status=200
+            ), 1)
+
+
+class TestModelMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = MetricsRegistry()
+        MetricsDoc.metrics = self.metrics
+
+    def tearDown(self):
+        MetricsDoc.metrics = None
+
+    @mock.patch('wukong.api.SolrAPI.get_schema', mock.Mock(return_value={
+        'uniqueKey': 'id',
+        'fields': [{'name': 'id', 'type': 'int'}]
+    }))
+    def test_docs_hydrated(self):
+        MetricsDoc.from_json_docs([{'id': 1}, {'id': 2}])
+        self.assertEqual(
+            self.metrics.get('wukong_docs_hydrated_total').get(
+                collection='metrics_collection'
+            ),
+            2
+        )
+
+    def test_docs_indexed(self):
+        MetricsDoc._record_indexed(3)
+        self.assertEqual(
+            self.metrics.get('wukong_docs_indexed_total').get(
+                collection='metrics_collection'
+            ),
+            3
+        )
@@ -0,0 +1,111 @@
+import mock
+import os
+import threading
+from wukong import pool
+from wukong.request import SolrRequest
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+class TestPool(unittest.TestCase):
+
+    def tearDown(self):
+        pool.clear()
+
+    def test_get_session__shared_by_host_set(self):
+        session = pool.get_session(["http://localsolr:7070/solr/", "http://localsolr:8080/solr/"])
+
+        self.assertIs(
+            session,
+            pool.get_session(["http://localsolr:8080/solr/", "http://localsolr:7070/solr/"])
+        )
+        self.assertIsNot(session, pool.get_session(["http://localsolr:8080/solr/"]))
+        self.assertIsNot(
+            session,
+            pool.get_session(
+                ["http://localsolr:7070/solr/", "http://localsolr:8080/solr/"],
+                pool_maxsize=50
+            )
+        )
+
+    def test_get_session__pool_settings(self):
+        session = pool.get_session("localsolr:7070,localsolr:8080", pool_maxsize=50, pool_block=True)
+        adapter = session.get_adapter('http://localsolr:7070/solr/')
+
+        self.assertEqual(adapter._pool_maxsize, 50)
+        self.assertTrue(adapter._pool_block)
+
+    def test_solr_requests_share_session(self):
+        first = SolrRequest(["http://localsolr:7070/solr/"])
+        second = SolrRequest(["http://localsolr:7070/solr/"])
+
+        self.assertIs(first.client, second.client)
+
+    def test_clear(self):
+        session = pool.get_session(["http://localsolr:7070/solr/"])
+        pool.clear()
+
+        self.assertIsNot(session, pool.get_session(["http://localsolr:7070/solr/"]))
+
+    def test_get_thread_session(self):
+        hosts = ["http://localsolr:7070/solr/"]
+        session = pool.get_thread_session(hosts)
+        sessions = []
+        thread = threading.Thread(
+            target=lambda: sessions.append(pool.get_thread_session(hosts))
+        )
+        thread.start()
+        thread.join()
+
+        self.assertIs(session, pool.get_thread_session(hosts))
+        self.assertIsNot(session, sessions[0])
+        self.assertIsNot(session, pool.get_session(hosts))
+        # One connection pool for every thread
+        self.assertIs(
+            session.get_adapter('http://localsolr:7070/solr/'),
+            pool.get_session(hosts).get_adapter('http://localsolr:7070/solr/')
+        )
+        self.assertIs(
+            sessions[0].get_adapter('http://localsolr:7070/solr/'),
+            session.get_adapter('http://localsolr:7070/solr/')
+        )
+
+    def test_solr_request_session_per_thread(self):
+        client = SolrRequest(["http://localsolr:7070/solr/"], session_per_thread=True)
+
+        self.assertIs(
+            client.client,
+            pool.get_thread_session(["http://localsolr:7070/solr/"])
+        )
+
+    def test_after_fork(self):
+        session = pool.get_session(["http://localsolr:7070/solr/"])
+
+        with mock.patch('wukong.pool._pid', -1):
+            forked = pool.get_session(["http://localsolr:7070/solr/"])
+
+        self.assertIsNot(session, forked)
+        self.assertIsNot(
+            session.get_adapter('http://localsolr:7070/solr/'),
+            forked.get_adapter('http://localsolr:7070/solr/')
+        )
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'fork is not available')
+    def test_fork(self):
+        session = pool.get_session(["http://localsolr:7070/solr/"])
+        read_end, write_end = os.pipe()
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                forked = pool.get_session(["http://localsolr:7070/solr/"])
+                os.write(write_end, b'1' if forked is not session else b'0')
+            finally:
+                os._exit(0)
+
+        os.waitpid(pid, 0)
+        self.assertEqual(os.read(read_end, 1), b'1')
+        self.assertIs(session, pool.get_session(["http://localsolr:7070/solr/"]))
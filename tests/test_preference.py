@@ -0,0 +1,76 @@
+from wukong.preference import ReadPreference
+from wukong.zookeeper import Replica
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+def make_replica(host, type='NRT', leader=False):
+    return Replica(
+        base_url=host,
+        core='core',
+        shard='shard1',
+        type=type,
+        leader=leader,
+        node_name=None
+    )
+
+
+LEADER = 'http://127.0.0.1:7070/solr'
+PULL = 'http://127.0.0.1:8080/solr'
+TLOG = 'http://127.0.0.1:9090/solr'
+NRT = 'http://127.0.0.1:6060/solr'
+
+REPLICAS = {
+    LEADER: [make_replica(LEADER, leader=True)],
+    PULL: [make_replica(PULL, 'PULL')],
+    TLOG: [make_replica(TLOG, 'TLOG')],
+    NRT: [make_replica(NRT)],
+}
+
+
+class TestReadPreference(unittest.TestCase):
+
+    def test_parse(self):
+        preference = ReadPreference.parse('replica.type:PULL, replica.leader:false')
+        self.assertEqual(
+            preference.rules,
+            [('replica.type', 'PULL'), ('replica.leader', 'false')]
+        )
+        self.assertEqual(
+            preference.shards_preference,
+            'replica.type:PULL,replica.leader:false'
+        )
+
+    def test_unsupported_rule(self):
+        with self.assertRaises(ValueError):
+            ReadPreference('replica.location:local')
+
+    def test_order_by_type(self):
+        preference = ReadPreference('replica.type:PULL', 'replica.type:TLOG')
+        hosts = preference.order([LEADER, NRT, TLOG, PULL], REPLICAS)
+        self.assertEqual(hosts[:2], [PULL, TLOG])
+        # Ties keep the order they came in
+        self.assertEqual(hosts[2:], [LEADER, NRT])
+
+    def test_order_avoid_leaders(self):
+        preference = ReadPreference('replica.leader:false')
+        hosts = preference.order([LEADER, NRT, TLOG, PULL], REPLICAS)
+        self.assertEqual(hosts, [NRT, TLOG, PULL, LEADER])
+
+    def test_order_host_with_several_replicas(self):
+        # A host leading any shard is not a non-leader
+        replicas = dict(REPLICAS)
+        replicas[NRT] = [make_replica(NRT), make_replica(NRT, leader=True)]
+        preference = ReadPreference('replica.leader:false')
+        self.assertEqual(preference.order([NRT, PULL], replicas), [PULL, NRT])
+
+    def test_order_unknown_hosts_last(self):
+        preference = ReadPreference('replica.leader:false')
+        unknown = 'http://127.0.0.1:5050/solr'
+        self.assertEqual(
+            preference.order([unknown, LEADER, PULL], REPLICAS),
+            [PULL, unknown, LEADER]
+        )
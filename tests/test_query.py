@@ -423,6 +423,15 @@ class TestQuery(unittest.TestCase):
                 self.assertEqual(str(schema_error), "Select fetch failed")
 
 
+    def test_query_stream(self):
+        with mock.patch('wukong.api.SolrAPI.select') as mock_select:
+            qm = SolrQueryManager(FakeSolrDoc)
+
+            result = qm.stream()
+
+            mock_select.assert_called_once_with(qm.query, stream=True)
+            assert result.doc_class is FakeSolrDoc
+
     def test_query_fetch_one_with_one_returned(self):
         with mock.patch('wukong.api.SolrAPI.select') as mock_select:
             mock_select.return_value = {
@@ -2,7 +2,13 @@ import mock
 from requests.exceptions import ConnectionError, ReadTimeout
 from wukong.request import SolrRequest
 from wukong.errors import *
+from wukong.balancer import RandomSelector, LeastOutstandingSelector
+from wukong.breaker import CircuitBreakerRegistry
+from wukong.retry import RetryPolicy, RetryBudget
+from wukong import javabin
 import json
+import threading
+import time
 
 try:
     import unittest2 as unittest
@@ -10,7 +16,9 @@ except ImportError:
     import unittest
 
 class Response(object):
-    pass
+    @property
+    def content(self):
+        return self.text.encode('utf-8')
 
 class TestSolrRequest(unittest.TestCase):
 
@@ -136,12 +144,24 @@ class TestSolrRequest(unittest.TestCase):
             timeout=15
         )
 
+    def test_request_request__javabin(self):
+        client = SolrRequest(["http://localsolr:8080/solr/"])
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            mock_request.return_value = mock.Mock(
+                status_code=200,
+                content=javabin.dumps({'response': {'numFound': 0, 'docs': []}})
+            )
+            response = client.post('fake_path/select', params={'wt': 'javabin'})
+
+        self.assertEqual(mock_request.call_args[1]['params']['wt'], 'javabin')
+        self.assertEqual(response, {'response': {'numFound': 0, 'docs': []}})
 
     def test_request_request__status_code(self):
 
         with mock.patch('requests.sessions.Session.request') as mock_request:
             fake_response =  Response()
-            fake_response.status_code = 400
+            fake_response.status_code = 503
             fake_response.reason = "Test Error"
             mock_request.return_value = fake_response
             with self.assertRaises(SolrError) as cm:
@@ -181,6 +201,73 @@ class TestSolrRequest(unittest.TestCase):
             solr_error = cm.exception
             self.assertEqual(str(solr_error), "Unable to fetch from any SOLR nodes" )
 
+    def test_request_request__client_error_fails_fast(self):
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            fake_response = Response()
+            fake_response.status_code = 400
+            fake_response.reason = "Bad Request"
+            fake_response.text = json.dumps(
+                {'error': {'msg': "undefined field foo", 'code': 400}}
+            )
+            mock_request.return_value = fake_response
+            with self.assertRaises(SolrError) as cm:
+                self.client.request('fake_path', None, 'GET')
+
+            mock_request.assert_called_once()
+
+        self.assertEqual(cm.exception.status_code, 400)
+        self.assertEqual(
+            str(cm.exception),
+            "SOLR returned status 400: undefined field foo"
+        )
+
+    def test_request_request__unlisted_server_error_retried(self):
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            fake_response = Response()
+            fake_response.status_code = 507
+            fake_response.reason = "Insufficient Storage"
+            mock_request.return_value = fake_response
+            with self.assertRaises(SolrError) as cm:
+                self.client.request('fake_path', None, 'GET')
+
+        # Tried on every host
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertEqual(str(cm.exception), "Unable to fetch from any SOLR nodes")
+
+    def test_request_request__max_attempts(self):
+        client = SolrRequest(
+            ["http://localsolr:7070/solr/", "http://localsolr:8080/solr/", "http://localsolr:9090/solr/"],
+            retry_policy=RetryPolicy(max_attempts=2, backoff_base=0)
+        )
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            mock_request.side_effect = ConnectionError("Server down!")
+            with self.assertRaises(SolrError):
+                client.request('fake_path', None, 'GET')
+
+        self.assertEqual(mock_request.call_count, 2)
+
+    def test_request_request__retry_budget_exhausted(self):
+        budget = RetryBudget(ratio=0, min_retries_per_second=0, max_tokens=1)
+        client = SolrRequest(
+            ["http://localsolr:7070/solr/", "http://localsolr:8080/solr/", "http://localsolr:9090/solr/"],
+            retry_policy=RetryPolicy(backoff_base=0, budget=budget)
+        )
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            mock_request.side_effect = ConnectionError("Server down!")
+            with self.assertRaises(SolrError):
+                client.request('fake_path', None, 'GET')
+            # The first attempt, and the one retry left in the budget
+            self.assertEqual(mock_request.call_count, 2)
+
+            mock_request.reset_mock()
+            with self.assertRaises(SolrError):
+                client.request('fake_path', None, 'GET')
+            self.assertEqual(mock_request.call_count, 1)
+
     def test_request_request__malformed_response(self):
         client = SolrRequest(["http://localsolr:8080/solr/"])
 
@@ -298,3 +385,392 @@ class TestSolrRequest(unittest.TestCase):
 
             solr_error = cm.exception
             self.assertEqual(str(solr_error), "Unable to fetch from any SOLR nodes" )
+
+    def test_request_request__host_selector(self):
+        selector = RandomSelector()
+        client = SolrRequest(["http://localsolr:8080/solr/"], host_selector=selector)
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            fake_response = Response()
+            fake_response.status_code = 200
+            fake_response.text = json.dumps({'fake_data': 'fake_value'})
+            mock_request.return_value = fake_response
+            client.request('fake_path', None, 'GET')
+
+        scores = selector.scores()["http://localsolr:8080/solr/"]
+        self.assertEqual(scores['requests'], 1)
+        self.assertEqual(scores['failures'], 0)
+        self.assertEqual(scores['in_flight'], 0)
+
+    def test_request_request__quarantined_host_skipped(self):
+        breakers = CircuitBreakerRegistry(failure_threshold=1)
+        client = SolrRequest(
+            ["http://localsolr:7070/solr/", "http://localsolr:8080/solr/"],
+            circuit_breakers=breakers
+        )
+        breakers.record_failure("http://localsolr:7070/solr/")
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            fake_response = Response()
+            fake_response.status_code = 200
+            fake_response.text = json.dumps({'fake_data': 'fake_value'})
+            mock_request.return_value = fake_response
+            for _ in range(5):
+                client.request('fake_path', None, 'GET')
+
+        for call in mock_request.call_args_list:
+            self.assertEqual(call[0][1], 'http://localsolr:8080/solr/fake_path')
+
+    def test_request_request__half_open_probe_not_shared(self):
+        hosts = ["http://localsolr:7070/solr/", "http://localsolr:8080/solr/"]
+        breakers = CircuitBreakerRegistry(failure_threshold=1, recovery_timeout=30)
+        client = SolrRequest(hosts, circuit_breakers=breakers)
+        breakers.record_failure(hosts[0])
+        # The quarantine is over, the next request to the host is its probe
+        breakers.get(hosts[0])._opened_at -= 31
+        probing = threading.Event()
+        release = threading.Event()
+        urls = []
+
+        def request(method, url, **kwargs):
+            urls.append(url)
+            if url.startswith(hosts[0]):
+                probing.set()
+                release.wait(5)
+            fake_response = Response()
+            fake_response.status_code = 200
+            fake_response.text = json.dumps({'url': url})
+            return fake_response
+
+        # Both requests have ordered their hosts before either one is sent
+        with mock.patch.object(client, '_get_hosts', return_value=list(hosts)):
+            with mock.patch('requests.sessions.Session.request') as mock_request:
+                mock_request.side_effect = request
+                probe = threading.Thread(
+                    target=client.request,
+                    args=('fake_path', None, 'GET')
+                )
+                probe.start()
+                self.assertTrue(probing.wait(5))
+
+                response = client.request('fake_path', None, 'GET')
+                release.set()
+                probe.join()
+
+        self.assertEqual(response['url'], hosts[1] + 'fake_path')
+        self.assertEqual(urls, [hosts[0] + 'fake_path', hosts[1] + 'fake_path'])
+        self.assertEqual(breakers.states()[hosts[0]], 'closed')
+
+    def test_request_request__probing_host_last_resort(self):
+        hosts = ["http://localsolr:7070/solr/", "http://localsolr:8080/solr/"]
+        breakers = CircuitBreakerRegistry(failure_threshold=1, recovery_timeout=30)
+        client = SolrRequest(hosts, circuit_breakers=breakers)
+        breakers.record_failure(hosts[0])
+        breakers.get(hosts[0])._opened_at -= 31
+        # Another request holds the probe
+        self.assertTrue(breakers.record_attempt(hosts[0]))
+
+        with mock.patch.object(client, '_get_hosts', return_value=list(hosts)):
+            with mock.patch('requests.sessions.Session.request') as mock_request:
+                mock_request.side_effect = ConnectionError("Server down!")
+                with self.assertRaises(SolrError):
+                    client.request('fake_path', None, 'GET', is_retry=True)
+
+        self.assertEqual(
+            [call[0][1] for call in mock_request.call_args_list],
+            [hosts[1] + 'fake_path', hosts[0] + 'fake_path']
+        )
+
+    def test_request_request__failures_open_breaker(self):
+        breakers = CircuitBreakerRegistry(failure_threshold=1)
+        client = SolrRequest(["http://localsolr:8080/solr/"], circuit_breakers=breakers)
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            mock_request.side_effect = ConnectionError("Server down!")
+            with self.assertRaises(SolrError):
+                client.request('fake_path', None, 'GET')
+
+        self.assertEqual(breakers.states(), {"http://localsolr:8080/solr/": 'open'})
+
+    def _hedging_client(self, hedge_delay=0.01):
+        return SolrRequest(
+            ["http://localsolr:7070/solr/", "http://localsolr:8080/solr/"],
+            host_selector=LeastOutstandingSelector(),
+            hedge_delay=hedge_delay
+        )
+
+    def test_request_request__hedged_read(self):
+        client = self._hedging_client()
+        release = threading.Event()
+        urls = []
+
+        def request(method, url, **kwargs):
+            urls.append(url)
+            fake_response = Response()
+            fake_response.status_code = 200
+            fake_response.text = json.dumps({'url': url})
+            if len(urls) == 1:
+                # The first host is stuck
+                release.wait(5)
+            return fake_response
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            mock_request.side_effect = request
+            response = client.request('collection/select', None, 'POST')
+            release.set()
+
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertEqual(response['url'], urls[1])
+
+    def test_request_request__hedged_read_fast_primary(self):
+        client = self._hedging_client(hedge_delay=5)
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            fake_response = Response()
+            fake_response.status_code = 200
+            fake_response.text = json.dumps({'fake_data': 'fake_value'})
+            mock_request.return_value = fake_response
+            client.request('collection/select', None, 'POST')
+
+        mock_request.assert_called_once()
+
+    def test_request_request__writes_never_hedged(self):
+        client = self._hedging_client()
+
+        with mock.patch('wukong.request.SolrRequest._send_hedged') as mock_hedged:
+            with mock.patch('requests.sessions.Session.request') as mock_request:
+                fake_response = Response()
+                fake_response.status_code = 200
+                fake_response.text = json.dumps({'fake_data': 'fake_value'})
+                mock_request.return_value = fake_response
+                client.request('collection/update/json', None, 'POST')
+
+        self.assertFalse(mock_hedged.called)
+        mock_request.assert_called_once()
+
+    def test_request_request__hedged_reads_not_capped(self):
+        client = self._hedging_client(hedge_delay=5)
+        readers = 40
+        # Every read must be in flight at once to get through
+        barrier = threading.Barrier(readers, timeout=5)
+
+        def request(method, url, **kwargs):
+            barrier.wait()
+            fake_response = Response()
+            fake_response.status_code = 200
+            fake_response.text = json.dumps({})
+            return fake_response
+
+        errors = []
+
+        def read():
+            try:
+                client.request('collection/select', None, 'POST')
+            except Exception as e:
+                errors.append(e)
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            mock_request.side_effect = request
+            threads = [threading.Thread(target=read) for _ in range(readers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(mock_request.call_count, readers)
+
+    def _slow_primary(self, urls, threads):
+        def request(method, url, **kwargs):
+            urls.append(url)
+            threads.append(threading.current_thread())
+            if len(urls) == 1:
+                time.sleep(0.1)
+            fake_response = Response()
+            fake_response.status_code = 200
+            fake_response.text = json.dumps({'url': url})
+            return fake_response
+        return request
+
+    def test_request_request__hedges_within_retry_budget(self):
+        client = SolrRequest(
+            ["http://localsolr:7070/solr/", "http://localsolr:8080/solr/"],
+            hedge_delay=0.01,
+            retry_policy=RetryPolicy(
+                budget=RetryBudget(min_retries_per_second=0, max_tokens=0)
+            )
+        )
+        urls = []
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            mock_request.side_effect = self._slow_primary(urls, [])
+            response = client.request('collection/select', None, 'POST')
+
+        # The budget is empty, the slow primary is waited for
+        self.assertEqual(mock_request.call_count, 1)
+        self.assertEqual(response['url'], urls[0])
+
+    def test_request_request__hedging_pool_busy(self):
+        with mock.patch('wukong.request.HEDGE_WORKERS', 0):
+            client = self._hedging_client()
+        urls = []
+        threads = []
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            mock_request.side_effect = self._slow_primary(urls, threads)
+            response = client.request('collection/select', None, 'POST')
+
+        # Sent from the calling thread, without hedging
+        self.assertEqual(mock_request.call_count, 1)
+        self.assertEqual(response['url'], urls[0])
+        self.assertEqual(threads, [threading.current_thread()])
+
+    def test_hedge_delay_validated(self):
+        for hedge_delay in ('pxx', 'p0', 'p101', '95', -1):
+            with self.assertRaises(ValueError):
+                self._hedging_client(hedge_delay=hedge_delay)
+
+        for hedge_delay in ('p95', 'p99.9', 'p100', 0, 0.25):
+            self.assertEqual(
+                self._hedging_client(hedge_delay=hedge_delay).hedge_delay,
+                hedge_delay
+            )
+
+    def test_hedge_delay_only_from_reads(self):
+        client = self._hedging_client(hedge_delay='p95')
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            fake_response = Response()
+            fake_response.status_code = 200
+            fake_response.text = json.dumps({})
+            mock_request.return_value = fake_response
+            client.request('collection/update/json', None, 'POST')
+            self.assertEqual(len(client._latencies), 0)
+            client.request('collection/select', None, 'POST')
+            self.assertEqual(len(client._latencies), 1)
+
+    def test_hedge_delay_percentile(self):
+        client = self._hedging_client(hedge_delay='p95')
+        self.assertIsNone(client._get_hedge_delay('collection/select', 'POST'))
+
+        client._latencies.extend(i / 100.0 for i in range(100))
+        self.assertEqual(client._get_hedge_delay('collection/select', 'POST'), 0.95)
+        self.assertIsNone(client._get_hedge_delay('collection/update/json', 'POST'))
+
+    def test_request_request__stream(self):
+        client = SolrRequest(["http://localsolr:8080/solr/"])
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            fake_response = Response()
+            fake_response.status_code = 200
+            mock_request.return_value = fake_response
+            response = client.post('fake_path', body='{}', stream=True)
+
+        self.assertIs(response, fake_response)
+        self.assertTrue(mock_request.call_args[1]['stream'])
+
+    def test_post_to_host__deadline(self):
+        client = SolrRequest(["http://localsolr:8080/solr/"], timeout=(3, 120))
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            fake_response = Response()
+            fake_response.status_code = 200
+            fake_response.text = json.dumps({})
+            mock_request.return_value = fake_response
+
+            client.post_to_host('http://localsolr:8080/solr/core', 'update', deadline=2)
+            connect, read = mock_request.call_args[1]['timeout']
+            self.assertTrue(connect <= 2 and read <= 2)
+
+            # Past the deadline the host is not even tried
+            self.assertIsNone(client.post_to_host(
+                'http://localsolr:8080/solr/core', 'update', deadline=0
+            ))
+            self.assertEqual(mock_request.call_count, 1)
+
+    def test_request_request__stream_failed_responses_closed(self):
+        client = SolrRequest(["http://localsolr:7070/solr/", "http://localsolr:8080/solr/"])
+
+        def make_response(status_code):
+            response = mock.Mock(status_code=status_code, reason='Error', headers={})
+            response.content = b'{}'
+            return response
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            failed, ok = make_response(503), make_response(200)
+            mock_request.side_effect = [failed, ok]
+            self.assertIs(client.post('fake_path', body='{}', stream=True), ok)
+            failed.close.assert_called_once_with()
+            self.assertFalse(ok.close.called)
+
+            refused = make_response(400)
+            mock_request.side_effect = [refused]
+            with self.assertRaises(SolrError):
+                client.post('fake_path', body='{}', stream=True)
+            refused.close.assert_called_once_with()
+
+    def test_request_request__timeout_profiles(self):
+        client = SolrRequest(
+            ["http://localsolr:8080/solr/"],
+            timeouts={'select': (1, 3), 'update': (3, 120), 'commit': 60}
+        )
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            fake_response = Response()
+            fake_response.status_code = 200
+            fake_response.text = json.dumps({})
+            mock_request.return_value = fake_response
+
+            client.post('collection/select', body='{}')
+            self.assertEqual(mock_request.call_args[1]['timeout'], (1, 3))
+
+            client.post('collection/update/json', body='[]')
+            self.assertEqual(mock_request.call_args[1]['timeout'], (3, 120))
+
+            client.post('collection/update/json', params={'commit': 'true'})
+            self.assertEqual(mock_request.call_args[1]['timeout'], 60)
+
+            # Anything else keeps the default
+            client.get('collection/schema')
+            self.assertEqual(mock_request.call_args[1]['timeout'], 15)
+
+    def test_request_request__deadline(self):
+        client = SolrRequest(
+            ["http://localsolr:7070/solr/", "http://localsolr:8080/solr/", "http://localsolr:9090/solr/"],
+            timeout=(1, 5),
+            retry_policy=RetryPolicy(backoff_base=0)
+        )
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            def request(*args, **kwargs):
+                time.sleep(0.1)
+                raise ConnectionError("Server down!")
+
+            mock_request.side_effect = request
+            with self.assertRaises(SolrDeadlineExceededError) as cm:
+                client.post('collection/select', body='{}', deadline=0.15)
+
+        self.assertEqual(cm.exception.deadline, 0.15)
+        self.assertEqual(mock_request.call_count, 2)
+
+        first, second = mock_request.call_args_list
+        connect, read = first[1]['timeout']
+        self.assertTrue(read <= 0.15)
+        self.assertTrue(second[1]['timeout'][1] < read)
+        # Selects tell SOLR how long it has left
+        self.assertTrue(0 < second[1]['params']['timeAllowed'] < first[1]['params']['timeAllowed'] <= 150)
+
+    def test_request_request__default_deadline(self):
+        client = SolrRequest(["http://localsolr:8080/solr/"], deadline=10)
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            fake_response = Response()
+            fake_response.status_code = 200
+            fake_response.text = json.dumps({})
+            mock_request.return_value = fake_response
+
+            client.post('collection/update/json', body='[]')
+
+        self.assertTrue(mock_request.call_args[1]['timeout'] <= 10)
+        # timeAllowed only applies to searches
+        self.assertNotIn('timeAllowed', mock_request.call_args[1]['params'])
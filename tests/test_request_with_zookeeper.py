@@ -11,7 +11,9 @@ except ImportError:
     import unittest
 
 class Response(object):
-    pass
+    @property
+    def content(self):
+        return self.text.encode('utf-8')
 
 class TestSolrZookRequest(unittest.TestCase):
 
@@ -227,3 +229,216 @@ class TestSolrZookRequest(unittest.TestCase):
                 )
                 assert client.master_hosts == get_active_hosts()
                 assert client.current_hosts == client.master_hosts
+
+    def test_zookeeper_watch(self):
+        with mock.patch('wukong.zookeeper.Zookeeper.watch') as mock_watch:
+            mock_watch.return_value = True
+            with mock.patch('wukong.zookeeper.Zookeeper.get_active_hosts') as mock_zookeeper:
+                client = SolrRequest(["http://localsolr:7070/solr/"],
+                                     zookeeper_hosts=["http://localzook:2181"],
+                                     zookeeper_watch=True)
+
+                self.assertTrue(client.watching)
+                listener = mock_watch.call_args[0][0]
+                listener({'test_collection': set(["http://localsolr:8080/solr/"])})
+                self.assertEqual(client.current_hosts, ["http://localsolr:8080/solr/"])
+
+                with mock.patch('requests.sessions.Session.request') as mock_request:
+                    fake_response = Response()
+                    fake_response.status_code = 200
+                    fake_response.text = json.dumps({'fake_data': 'fake_value'})
+                    mock_request.return_value = fake_response
+
+                    client._last_request = time.time() - (client.refresh_frequency * 1000 + 3000)
+                    client.request('fake_path', {}, 'GET')
+
+                # The request path never goes to zookeeper while watching
+                self.assertFalse(mock_zookeeper.called)
+
+    def test_after_fork(self):
+        with mock.patch('wukong.zookeeper.Zookeeper.watch') as mock_watch, \
+                mock.patch('wukong.zookeeper.Zookeeper.stop_watching') as mock_stop:
+            mock_watch.return_value = True
+            client = SolrRequest(["http://localsolr:7070/solr/"],
+                                 zookeeper_hosts=["http://localzook:2181"],
+                                 zookeeper_watch=True)
+            mock_watch.call_args[0][0]({'test_collection': set(["http://localsolr:8080/solr/"])})
+            zookeeper = client.zookeeper
+            session = client.client
+
+            # As seen from a forked child
+            client._pid = -1
+            with mock.patch('wukong.pool._pid', -1), \
+                    mock.patch('wukong.zookeeper._pid', -1):
+                forked_session = client.client
+
+            self.assertIsNot(forked_session, session)
+            self.assertIsNot(client.zookeeper, zookeeper)
+            # The parent's zookeeper session is left alone, the child watches on its own
+            self.assertFalse(mock_stop.called)
+            self.assertEqual(mock_watch.call_count, 2)
+            self.assertTrue(client.watching)
+            self.assertEqual(client.current_hosts, ["http://localsolr:8080/solr/"])
+
+    def test_refresh_for_collection(self):
+        with mock.patch('wukong.zookeeper.Zookeeper.get_active_hosts') as mock_zookeeper:
+            mock_zookeeper.return_value = ["http://localsolr:7070/solr/"]
+            client = SolrRequest(["http://localsolr:7070/solr/","http://localsolr:8080/solr/"],
+                                 zookeeper_hosts=["http://localzook:2181"],
+                                 collection='users')
+
+            mock_zookeeper.assert_called_once_with(collection_name='users')
+            self.assertEqual(client.current_hosts, ["http://localsolr:7070/solr/"])
+
+    def test_live_nodes_change(self):
+        with mock.patch('wukong.zookeeper.Zookeeper.get_active_hosts') as mock_zookeeper, \
+                mock.patch('wukong.zookeeper.Zookeeper.watch_live_nodes') as mock_live_nodes:
+            mock_zookeeper.return_value = ["http://localsolr:7070/solr/",
+                                           "http://localsolr:8080/solr/"]
+            mock_live_nodes.return_value = True
+            client = SolrRequest(["http://localsolr:7070/solr/"],
+                                 zookeeper_hosts=["http://localzook:2181"],
+                                 collection='users')
+            client.attempt_zookeeper_refresh()
+
+            # Watched once, after the first successful refresh
+            mock_live_nodes.assert_called_once_with(client._on_live_nodes_change)
+
+            client._on_live_nodes_change(set(['localsolr:8080_solr']))
+            self.assertEqual(client.current_hosts, ["http://localsolr:8080/solr/"])
+            self.assertFalse(client._should_refresh(False))
+
+            # A node joining is picked up by the next request
+            client._on_live_nodes_change(set(['localsolr:8080_solr', 'localsolr:9090_solr']))
+            self.assertEqual(client.current_hosts, ["http://localsolr:8080/solr/"])
+            self.assertTrue(client._should_refresh(False))
+
+            client.attempt_zookeeper_refresh()
+            self.assertFalse(client._should_refresh(False))
+            self.assertEqual(len(client.current_hosts), 2)
+
+    def test_zookeeper_watch_for_collection(self):
+        with mock.patch('wukong.zookeeper.Zookeeper.watch') as mock_watch:
+            mock_watch.return_value = True
+            client = SolrRequest(["http://localsolr:7070/solr/"],
+                                 zookeeper_hosts=["http://localzook:2181"],
+                                 zookeeper_watch=True,
+                                 collection='users')
+
+            listener = mock_watch.call_args[0][0]
+            listener({
+                'users': set(["http://localsolr:8080/solr/"]),
+                'orders': set(["http://localsolr:9090/solr/"]),
+            })
+            self.assertEqual(client.current_hosts, ["http://localsolr:8080/solr/"])
+
+    def test_get_shard_router(self):
+        state = {
+            'router': {'name': 'compositeId'},
+            'shards': {
+                'shard1': {
+                    'range': '80000000-7fffffff',
+                    'state': 'active',
+                    'replicas': {
+                        'core_node1': {
+                            'state': 'active',
+                            'leader': 'true',
+                            'core': 'users_shard1_replica1',
+                            'base_url': 'http://localsolr:8080/solr',
+                        }
+                    }
+                }
+            }
+        }
+        with mock.patch('wukong.zookeeper.Zookeeper.get_active_hosts') as mock_hosts:
+            mock_hosts.return_value = ["http://localsolr:8080/solr/"]
+            client = SolrRequest(["http://localsolr:7070/solr/"],
+                                 zookeeper_hosts=["http://localzook:2181"],
+                                 collection='users')
+
+        with mock.patch('wukong.zookeeper.Zookeeper.get_collection_state') as mock_state:
+            mock_state.return_value = state
+            router = client.get_shard_router()
+            self.assertIs(client.get_shard_router(), router)
+            mock_state.assert_called_once_with('users')
+
+            self.assertEqual(
+                router.get_leader('shard1'),
+                'http://localsolr:8080/solr/users_shard1_replica1'
+            )
+
+            client.get_shard_router(refresh=True)
+            self.assertEqual(mock_state.call_count, 2)
+
+    def test_get_shard_router__without_collection(self):
+        self.assertIsNone(self.client.get_shard_router())
+
+    def test_read_preference(self):
+        from wukong.zookeeper import Replica
+
+        def replica(host, type, leader=False):
+            return Replica(host, 'core', 'shard1', type, leader, None)
+
+        with mock.patch('wukong.zookeeper.Zookeeper.get_active_replicas') as mock_replicas:
+            mock_replicas.return_value = [
+                replica("http://localsolr:7070/solr", 'NRT', leader=True),
+                replica("http://localsolr:8080/solr", 'PULL'),
+            ]
+            client = SolrRequest(["http://localsolr:9090/solr/"],
+                                 zookeeper_hosts=["http://localzook:2181"],
+                                 collection='users',
+                                 read_preference='replica.type:PULL')
+
+        mock_replicas.assert_called_once_with(collection_name='users')
+        self.assertEqual(
+            sorted(client.current_hosts),
+            ["http://localsolr:7070/solr", "http://localsolr:8080/solr"]
+        )
+
+        for _ in range(10):
+            self.assertEqual(
+                client._get_hosts(read=True),
+                ["http://localsolr:8080/solr", "http://localsolr:7070/solr"]
+            )
+
+        with mock.patch('requests.sessions.Session.request') as mock_request:
+            fake_response = Response()
+            fake_response.status_code = 200
+            fake_response.text = json.dumps({'fake_data': 'fake_value'})
+            mock_request.return_value = fake_response
+
+            client.post('users/select', body='{}')
+            self.assertEqual(mock_request.call_args[0][1], 'http://localsolr:8080/solr/users/select')
+            self.assertEqual(
+                mock_request.call_args[1]['params']['shards.preference'],
+                'replica.type:PULL'
+            )
+
+            # Writes ignore the preference
+            client.post('users/update/json', body='[]')
+            self.assertNotIn('shards.preference', mock_request.call_args[1]['params'])
+
+    def test_read_preference_with_watch(self):
+        from wukong.zookeeper import Replica
+
+        with mock.patch('wukong.zookeeper.Zookeeper.watch') as mock_watch:
+            mock_watch.return_value = True
+            client = SolrRequest(["http://localsolr:7070/solr/"],
+                                 zookeeper_hosts=["http://localzook:2181"],
+                                 zookeeper_watch=True,
+                                 collection='users',
+                                 read_preference='replica.leader:false')
+
+        client.zookeeper.replica_table = {
+            'users': set([
+                Replica("http://localsolr:8080/solr", 'core', 'shard1', 'NRT', True, None),
+                Replica("http://localsolr:9090/solr", 'core', 'shard1', 'NRT', False, None),
+            ])
+        }
+        listener = mock_watch.call_args[0][0]
+        listener({'users': set(["http://localsolr:8080/solr", "http://localsolr:9090/solr"])})
+
+        self.assertEqual(
+            client._get_hosts(read=True),
+            ["http://localsolr:9090/solr", "http://localsolr:8080/solr"]
+        )
@@ -0,0 +1,86 @@
+import mock
+from wukong.retry import RetryBudget, RetryPolicy, default_budget
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+class TestRetryBudget(unittest.TestCase):
+
+    def test_withdraw_until_empty(self):
+        budget = RetryBudget(ratio=0, min_retries_per_second=0, max_tokens=2)
+        self.assertTrue(budget.withdraw())
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+    def test_requests_earn_retries(self):
+        budget = RetryBudget(ratio=0.5, min_retries_per_second=0, max_tokens=1)
+        self.assertTrue(budget.withdraw())
+        budget.deposit()
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+
+    def test_refills_over_time(self):
+        with mock.patch('wukong.retry.time.time') as mock_time:
+            mock_time.return_value = 1000
+            budget = RetryBudget(ratio=0, min_retries_per_second=2, max_tokens=4)
+            for _ in range(4):
+                budget.withdraw()
+            self.assertFalse(budget.withdraw())
+
+            mock_time.return_value = 1001
+            self.assertEqual(budget.tokens, 2)
+
+            mock_time.return_value = 1100
+            self.assertEqual(budget.tokens, 4)
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_default_budget(self):
+        self.assertIs(RetryPolicy().budget, default_budget)
+
+    def test_is_retryable(self):
+        policy = RetryPolicy()
+        self.assertTrue(policy.is_retryable(500))
+        self.assertTrue(policy.is_retryable(503))
+        self.assertFalse(policy.is_retryable(400))
+        self.assertFalse(policy.is_retryable(404))
+        # Any server-side failure
+        self.assertTrue(policy.is_retryable(501))
+        self.assertTrue(policy.is_retryable(507))
+
+    def test_is_retryable__given_statuses(self):
+        policy = RetryPolicy(retryable_statuses=frozenset([503, 429]))
+        self.assertTrue(policy.is_retryable(429))
+        self.assertTrue(policy.is_retryable(503))
+        self.assertFalse(policy.is_retryable(500))
+
+    def test_backoff_is_capped_and_jittered(self):
+        policy = RetryPolicy(backoff_base=0.1, backoff_max=0.3)
+        with mock.patch('wukong.retry.random.uniform') as mock_uniform:
+            mock_uniform.side_effect = lambda low, high: high
+            self.assertEqual(policy.backoff(1), 0.1)
+            self.assertEqual(policy.backoff(2), 0.2)
+            self.assertEqual(policy.backoff(5), 0.3)
+
+        for _ in range(20):
+            self.assertTrue(0 <= policy.backoff(3) <= 0.3)
+
+    def test_retry_delay(self):
+        budget = RetryBudget(ratio=0, min_retries_per_second=0, max_tokens=1)
+        policy = RetryPolicy(max_attempts=3, backoff_base=0, budget=budget)
+
+        # The first attempt is never a retry
+        self.assertEqual(policy.retry_delay(0), 0)
+        self.assertEqual(policy.retry_delay(1), 0)
+        # Out of budget
+        self.assertIsNone(policy.retry_delay(2))
+
+    def test_retry_delay_max_attempts(self):
+        policy = RetryPolicy(max_attempts=2, budget=RetryBudget())
+        self.assertIsNotNone(policy.retry_delay(1))
+        self.assertIsNone(policy.retry_delay(2))
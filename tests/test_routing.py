@@ -0,0 +1,174 @@
+from wukong.routing import (
+    ShardRouter, composite_id_hash, murmurhash3_32
+)
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+def make_state(shards, router='compositeId'):
+    return {
+        'router': {'name': router},
+        'shards': shards,
+    }
+
+
+def make_shard(hash_range, leader_port, state='active'):
+    return {
+        'range': hash_range,
+        'state': state,
+        'replicas': {
+            'core_node1': {
+                'state': 'active',
+                'core': 'test_shard_%s_replica1' % leader_port,
+                'base_url': 'http://127.0.0.1:%s/solr' % leader_port,
+                'leader': 'true',
+            },
+            'core_node2': {
+                'state': 'active',
+                'core': 'test_shard_%s_replica2' % leader_port,
+                'base_url': 'http://127.0.0.2:%s/solr' % leader_port,
+            },
+        }
+    }
+
+
+class TestHashing(unittest.TestCase):
+
+    def test_murmurhash3_32(self):
+        # Reference values of MurmurHash3_x86_32
+        self.assertEqual(murmurhash3_32(''), 0)
+        self.assertEqual(murmurhash3_32('foo'), -156908512)
+        self.assertEqual(murmurhash3_32('foo', 42), -1322301282)
+        self.assertEqual(murmurhash3_32('hello world'), 1586663183)
+
+    def test_composite_id_hash__plain_id(self):
+        self.assertEqual(composite_id_hash('foo'), murmurhash3_32('foo'))
+        self.assertEqual(composite_id_hash(42), murmurhash3_32('42'))
+
+    def test_composite_id_hash__shard_key(self):
+        doc_hash = composite_id_hash('tenant!doc')
+        self.assertEqual(
+            doc_hash & 0xffff0000,
+            murmurhash3_32('tenant') & 0xffff0000
+        )
+        self.assertEqual(
+            doc_hash & 0x0000ffff,
+            murmurhash3_32('doc') & 0x0000ffff
+        )
+
+    def test_composite_id_hash__shard_key_bits(self):
+        doc_hash = composite_id_hash('tenant/4!doc')
+        self.assertEqual(
+            doc_hash & 0xf0000000,
+            murmurhash3_32('tenant') & 0xf0000000
+        )
+        self.assertEqual(
+            doc_hash & 0x0fffffff,
+            murmurhash3_32('doc') & 0x0fffffff
+        )
+
+    def test_composite_id_hash__three_levels(self):
+        doc_hash = composite_id_hash('a!b!c')
+        self.assertEqual(doc_hash & 0xff000000, murmurhash3_32('a') & 0xff000000)
+        self.assertEqual(doc_hash & 0x00ff0000, murmurhash3_32('b') & 0x00ff0000)
+        self.assertEqual(doc_hash & 0x0000ffff, murmurhash3_32('c') & 0x0000ffff)
+
+    def test_composite_id_hash__key_parser(self):
+        # murmurhash3_32('a') is 0x3c2569b2, 'b' 0x95de7e03, 'c' 0xe132d65f,
+        # 'c!d' 0xfc937073 and 'tenant' 0x821fdf68, combined with the masks
+        # of SOLR's KeyParser
+        hashes = {
+            # Two parts, the empty id contributes the low 16 bits
+            'a!': 0x3c250000,
+            'a!!': 0x3c250000,
+            # Three parts, the last one empty
+            'a!b!': 0x3cde0000,
+            'a!!b': 0x3c007e03,
+            # Further separators belong to the last part
+            'a!b!c!d': 0x3cde7073,
+            # `/bits` on the second shard key
+            'a!b/4!c': 0x3cd2d65f,
+            # `/bits` of the first shard key capped to 8 in three parts
+            'a/12!b!c': 0x3cded65f,
+            'a/4!b!c': 0x35d2d65f,
+            # Bits that are not a number count as -1, which Java's shift
+            # turns into a 31 bits mask
+            'tenant/x!doc': 0x821fdf69,
+        }
+        for doc_id, doc_hash in hashes.items():
+            self.assertEqual(
+                composite_id_hash(doc_id) & 0xffffffff,
+                doc_hash,
+                doc_id
+            )
+
+    def test_composite_id_hash__same_shard_key_same_range(self):
+        self.assertEqual(
+            composite_id_hash('tenant!1') & 0xffff0000,
+            composite_id_hash('tenant!2') & 0xffff0000
+        )
+
+
+class TestShardRouter(unittest.TestCase):
+
+    state = make_state({
+        'shard1': make_shard('80000000-ffffffff', 8080),
+        'shard2': make_shard('0-7fffffff', 9090),
+    })
+
+    def test_from_state__implicit_router(self):
+        self.assertIsNone(ShardRouter.from_state(make_state({}, 'implicit')))
+        self.assertIsNone(ShardRouter.from_state(None))
+
+    def test_get_shard(self):
+        router = ShardRouter.from_state(self.state)
+        for doc_id in ['foo', 'bar', 'tenant!doc', 1234]:
+            expected = 'shard1' if composite_id_hash(doc_id) < 0 else 'shard2'
+            self.assertEqual(router.get_shard(doc_id), expected)
+
+    def test_get_leader(self):
+        router = ShardRouter.from_state(self.state)
+        self.assertEqual(
+            router.get_leader('shard1'),
+            'http://127.0.0.1:8080/solr/test_shard_8080_replica1'
+        )
+        self.assertIsNone(router.get_leader('shard3'))
+
+    def test_partition(self):
+        router = ShardRouter.from_state(self.state)
+        docs = [{'id': str(i)} for i in range(50)] + [{'name': 'no id'}]
+        batches = router.partition(docs, 'id')
+
+        self.assertEqual(batches[None], [{'name': 'no id'}])
+        self.assertEqual(sum(len(batch) for batch in batches.values()), 51)
+        for shard in ('shard1', 'shard2'):
+            for doc in batches[shard]:
+                self.assertEqual(router.get_shard(doc['id']), shard)
+
+    def test_partition__router_field(self):
+        state = dict(self.state, router={'name': 'compositeId', 'field': 'tenant'})
+        router = ShardRouter.from_state(state)
+        batches = router.partition([{'id': '1', 'tenant': 'foo'}], 'id')
+        self.assertEqual(list(batches), [router.get_shard('foo')])
+
+    def test_split_shard(self):
+        # shard1 is being split: its sub-shards are not active yet, so the
+        # parent keeps receiving the writes
+        state = make_state({
+            'shard1': make_shard('80000000-ffffffff', 8080),
+            'shard1_0': make_shard('80000000-bfffffff', 7070, 'construction'),
+            'shard1_1': make_shard('c0000000-ffffffff', 6060, 'construction'),
+            'shard2': make_shard('0-7fffffff', 9090),
+        })
+        router = ShardRouter.from_state(state)
+        self.assertEqual(router.get_shard('foo'), 'shard1')
+
+        # Once the split is done, the parent is inactive
+        state['shards']['shard1']['state'] = 'inactive'
+        state['shards']['shard1_0']['state'] = 'active'
+        state['shards']['shard1_1']['state'] = 'active'
+        router = ShardRouter.from_state(state)
+        self.assertIn(router.get_shard('foo'), ('shard1_0', 'shard1_1'))
@@ -0,0 +1,108 @@
+import json
+from wukong.streaming import SolrStreamingResult
+from wukong.errors import SolrError
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+class FakeResponse(object):
+    def __init__(self, body, chunk_size=7):
+        self.body = body.encode('utf-8')
+        self.chunk_size = chunk_size
+        self.closed = False
+
+    def iter_content(self, chunk_size=None):
+        for i in range(0, len(self.body), self.chunk_size):
+            yield self.body[i:i + self.chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeDoc(object):
+    def __init__(self, **fields):
+        self.fields = fields
+
+
+DOCS = [
+    {"id": i, "name": u"Test Name é %s" % i, "tags": ["a]", "{b"]}
+    for i in range(50)
+]
+
+RESPONSE = {
+    "response": {"numFound": 1234, "start": 10, "maxScore": 1.5, "docs": DOCS},
+    "facet_counts": {"facet_fields": {"city": {"Test City": 3}}},
+    "stats": {"stats_fields": {}},
+}
+
+
+class TestSolrStreamingResult(unittest.TestCase):
+
+    def test_stream_docs(self):
+        for chunk_size in (1, 3, 7, 64, 100000):
+            response = FakeResponse(json.dumps(RESPONSE, indent=1), chunk_size)
+            result = SolrStreamingResult(response)
+
+            self.assertEqual(result.total, 1234)
+            self.assertEqual(result.start, 10)
+            self.assertEqual(result.max_score, 1.5)
+            self.assertEqual(list(result), DOCS)
+            self.assertEqual(result.facets, RESPONSE['facet_counts'])
+            self.assertEqual(result.stats, RESPONSE['stats'])
+            self.assertEqual(result.metadata['response']['docs'], [])
+            self.assertTrue(response.closed)
+
+    def test_stream_doc_class(self):
+        result = SolrStreamingResult(FakeResponse(json.dumps(RESPONSE)), doc_class=FakeDoc)
+
+        docs = list(result.docs)
+        self.assertEqual(docs[3].fields, DOCS[3])
+
+    def test_metadata_before_docs_read(self):
+        result = SolrStreamingResult(FakeResponse(json.dumps(RESPONSE)))
+
+        with self.assertRaises(SolrError):
+            result.facets
+
+    def test_empty_docs(self):
+        data = {"response": {"numFound": 0, "start": 0, "docs": []}}
+        result = SolrStreamingResult(FakeResponse(json.dumps(data)))
+
+        self.assertEqual(list(result), [])
+        self.assertEqual(result.total, 0)
+        self.assertIsNone(result.facets)
+
+    def test_no_doc_list(self):
+        data = {"grouped": {"city": {"groups": []}}}
+        result = SolrStreamingResult(FakeResponse(json.dumps(data)))
+
+        self.assertEqual(list(result), [])
+        self.assertIsNone(result.total)
+        self.assertEqual(result.groups, data['grouped'])
+
+    def test_truncated_response(self):
+        body = json.dumps(RESPONSE)[:200]
+        result = SolrStreamingResult(FakeResponse(body))
+
+        with self.assertRaises(SolrError):
+            list(result)
+
+    def test_stopped_early(self):
+        response = FakeResponse(json.dumps(RESPONSE))
+        result = SolrStreamingResult(response)
+
+        for doc in result:
+            break
+
+        self.assertEqual(doc, DOCS[0])
+        self.assertTrue(response.closed)
+
+    def test_context_manager(self):
+        response = FakeResponse(json.dumps(RESPONSE))
+        with SolrStreamingResult(response) as result:
+            self.assertEqual(result.total, 1234)
+
+        self.assertTrue(response.closed)
@@ -0,0 +1,121 @@
+import json
+import mock
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wukong.models import SolrDoc
+
+try:
+    import unittest2 as unittest
+except ImportError:
+    import unittest
+
+
+THREADS = 16
+QUERIES = 25
+
+OLD_HOSTS = ["http://localsolr:7070/solr/", "http://localsolr:8080/solr/"]
+NEW_HOSTS = ["http://localsolr:9090/solr/"]
+
+SCHEMA = {
+    'uniqueKey': 'id',
+    'fields': [{'name': 'id', 'type': 'int'}, {'name': 'name', 'type': 'string'}]
+}
+
+
+class Response(object):
+    status_code = 200
+    headers = {}
+    content = json.dumps({
+        'response': {'numFound': 1, 'docs': [{'id': 1, 'name': 'Test Name'}]}
+    }).encode('utf-8')
+
+
+class StressDoc(SolrDoc):
+    solr_hosts = ','.join(OLD_HOSTS)
+    zookeeper_hosts = "localzook:2181"
+    collection_name = "stress"
+
+
+class TestThreadSafety(unittest.TestCase):
+
+    def setUp(self):
+        for name in ('_solr', '_async_solr'):
+            if name in StressDoc.__dict__:
+                delattr(StressDoc, name)
+        self.zookeeper_calls = 0
+        self.counter_lock = threading.Lock()
+        self.hosts = OLD_HOSTS
+        self.requested_hosts = set()
+
+    def get_active_hosts(self, collection_name=None):
+        with self.counter_lock:
+            self.zookeeper_calls += 1
+        # Slow enough for every thread to pile up behind the refresh
+        time.sleep(0.05)
+        return list(self.hosts)
+
+    def send(self, method, url, **kwargs):
+        self.requested_hosts.add(url.rsplit('stress/', 1)[0])
+        return Response()
+
+    def hammer(self, barrier):
+        barrier.wait()
+        results = []
+        for _ in range(QUERIES):
+            docs = StressDoc.documents.filter(name__eq='Test Name').all()
+            results.append([doc.id for doc in docs])
+        return results
+
+    def run_threads(self):
+        barrier = threading.Barrier(THREADS)
+        with ThreadPoolExecutor(max_workers=THREADS) as executor:
+            futures = [executor.submit(self.hammer, barrier) for _ in range(THREADS)]
+            return [future.result() for future in futures]
+
+    @mock.patch('wukong.api.SolrAPI.get_schema', mock.Mock(return_value=SCHEMA))
+    def test_one_model_from_many_threads(self):
+        with mock.patch(
+            'wukong.zookeeper.Zookeeper.get_active_hosts',
+            side_effect=self.get_active_hosts
+        ), mock.patch('requests.sessions.Session.request', side_effect=self.send):
+            # The api of the class is created once, by whichever thread is first
+            results = self.run_threads()
+            self.assertEqual(self.zookeeper_calls, 1)
+            self.assertEqual(results, [[[1]] * QUERIES] * THREADS)
+
+            # The hosts are due a refresh for every thread at once
+            self.hosts = NEW_HOSTS
+            StressDoc.solr.client._last_request = time.time() - 3600
+            self.requested_hosts = set()
+            results = self.run_threads()
+
+        self.assertEqual(self.zookeeper_calls, 2)
+        self.assertEqual(results, [[[1]] * QUERIES] * THREADS)
+        self.assertEqual(StressDoc.solr.client.master_hosts, NEW_HOSTS)
+        self.assertTrue(self.requested_hosts <= set(OLD_HOSTS + NEW_HOSTS))
+
+    @mock.patch('wukong.api.SolrAPI.get_schema', mock.Mock(return_value=SCHEMA))
+    def test_hosts_swapped_while_requests_run(self):
+        with mock.patch(
+            'wukong.zookeeper.Zookeeper.get_active_hosts',
+            side_effect=self.get_active_hosts
+        ), mock.patch('requests.sessions.Session.request', side_effect=self.send):
+            client = StressDoc.solr.client
+            stop = threading.Event()
+
+            def swap_hosts():
+                while not stop.is_set():
+                    client._on_hosts_change({'stress': NEW_HOSTS})
+                    client._on_hosts_change({'stress': OLD_HOSTS})
+
+            swapper = threading.Thread(target=swap_hosts)
+            swapper.start()
+            try:
+                results = self.run_threads()
+            finally:
+                stop.set()
+                swapper.join()
+
+        self.assertEqual(results, [[[1]] * QUERIES] * THREADS)
+        self.assertTrue(self.requested_hosts <= set(OLD_HOSTS + NEW_HOSTS))
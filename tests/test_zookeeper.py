@@ -1,5 +1,10 @@
 from mock import MagicMock, patch
-from wukong.zookeeper import Zookeeper
+from wukong import zookeeper
+from wukong.zookeeper import (
+    Replica, Zookeeper, _build_active_hosts, _get_replicas_from_state,
+    _node_name, get_zookeeper
+)
+from kazoo.exceptions import NoNodeError
 import requests
 import json
 
@@ -9,9 +14,38 @@ except ImportError:
     import unittest
 
 
+class AsyncResult(object):
+    """
+    What kazoo's asynchronous methods return
+    """
+    def __init__(self, func, *args):
+        self.value = self.error = None
+        try:
+            self.value = func(*args)
+        except Exception as e:
+            self.error = e
+
+    def get(self):
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+def _with_async(kazoo):
+    """
+    Answer the asynchronous reads of a mock kazoo client with its
+    synchronous ones
+    """
+    kazoo.exists_async = lambda path: AsyncResult(kazoo.exists, path)
+    kazoo.get_async = lambda path: AsyncResult(kazoo.get, path)
+    return kazoo
+
+
 class TestZookeeper(unittest.TestCase):
 
-    zook_client = Zookeeper("http://localzook01:2181,http://localzook02:2181")
+    def setUp(self):
+        # The session is kept open, so every test needs its own
+        self.zook_client = Zookeeper("http://localzook01:2181,http://localzook02:2181")
 
     @patch('kazoo.client.KazooClient')
     def test_valid_clusterstate_file(self, mock_kazoo):
@@ -23,6 +57,9 @@ class TestZookeeper(unittest.TestCase):
             def start(self, *args, **kwargs):
                 return True
 
+            def exists(self, *args, **kwargs):
+                return MagicMock(version=0, cversion=0)
+
             def get_children(self, *args, **kwargs):
                 return ['test_collection_one']
 
@@ -64,7 +101,7 @@ class TestZookeeper(unittest.TestCase):
             def stop(self):
                 return True
 
-        mock_kazoo.return_value = MockKazoo()
+        mock_kazoo.return_value = _with_async(MockKazoo())
         result = self.zook_client.get_active_hosts()
         self.assertEqual(
             result.sort(),
@@ -81,6 +118,9 @@ class TestZookeeper(unittest.TestCase):
             def start(self, *args, **kwargs):
                 return True
 
+            def exists(self, *args, **kwargs):
+                return MagicMock(version=0, cversion=0)
+
             def get_children(self, *args, **kwargs):
                 return []
 
@@ -90,7 +130,7 @@ class TestZookeeper(unittest.TestCase):
             def stop(self):
                 return True
 
-        mock_kazoo.return_value = MockKazoo()
+        mock_kazoo.return_value = _with_async(MockKazoo())
         result = self.zook_client.get_active_hosts()
         self.assertEqual(result, [])
 
@@ -104,6 +144,9 @@ class TestZookeeper(unittest.TestCase):
             def start(self, *args, **kwargs):
                 raise requests.exceptions.ConnectionError
 
+            def exists(self, *args, **kwargs):
+                return MagicMock(version=0, cversion=0)
+
             def get_children(self, *args, **kwargs):
                 return []
 
@@ -113,7 +156,7 @@ class TestZookeeper(unittest.TestCase):
             def stop(self):
                 return True
 
-        mock_kazoo.return_value = MockKazoo()
+        mock_kazoo.return_value = _with_async(MockKazoo())
         result = self.zook_client.get_active_hosts()
         self.assertEqual(result, [])
 
@@ -126,6 +169,9 @@ class TestZookeeper(unittest.TestCase):
             def start(self, *args, **kwargs):
                 return True
 
+            def exists(self, *args, **kwargs):
+                return MagicMock(version=0, cversion=0)
+
             def get_children(self, *args, **kwargs):
                 return ['test_collection_one']
 
@@ -172,10 +218,673 @@ class TestZookeeper(unittest.TestCase):
             def stop(self):
                 return True
 
-        mock_kazoo.return_value = MockKazoo()
+        mock_kazoo.return_value = _with_async(MockKazoo())
         result = self.zook_client._get_active_hosts()
         print(result)
         self.assertEqual(
             result['test_collection_one'],
             result['my_alias']
         )
+
+    def test_get_replicas_from_state(self):
+        state = {
+            'shards': {
+                'shard1': {
+                    'replicas': {
+                        'core_node1': {
+                            'state': 'active',
+                            'core': 'one_shard1_replica_n1',
+                            'base_url': 'http://127.0.0.1:8080/solr',
+                            'node_name': '127.0.0.1:8080_solr',
+                            'type': 'TLOG',
+                            'leader': 'true',
+                        },
+                        'core_node2': {
+                            'state': 'active',
+                            'core': 'one_shard1_replica_p2',
+                            'base_url': 'http://127.0.0.1:9090/solr',
+                            'node_name': '127.0.0.1:9090_solr',
+                            'type': 'PULL',
+                        },
+                        'core_node3': {
+                            'state': 'down',
+                            'core': 'one_shard1_replica_n3',
+                            'base_url': 'http://127.0.0.1:7070/solr',
+                        },
+                    }
+                }
+            }
+        }
+
+        self.assertEqual(_get_replicas_from_state(state), set([
+            Replica(
+                base_url='http://127.0.0.1:8080/solr',
+                core='one_shard1_replica_n1',
+                shard='shard1',
+                type='TLOG',
+                leader=True,
+                node_name='127.0.0.1:8080_solr'
+            ),
+            Replica(
+                base_url='http://127.0.0.1:9090/solr',
+                core='one_shard1_replica_p2',
+                shard='shard1',
+                type='PULL',
+                leader=False,
+                node_name='127.0.0.1:9090_solr'
+            ),
+        ]))
+
+        # A replica stays active in the state for a while after its node died
+        self.assertEqual(
+            [r.base_url for r in _get_replicas_from_state(state, set(['127.0.0.1:9090_solr']))],
+            ['http://127.0.0.1:9090/solr']
+        )
+
+    def test_node_name(self):
+        self.assertEqual(_node_name('http://127.0.0.1:8983/solr'), '127.0.0.1:8983_solr')
+        self.assertEqual(_node_name('https://solr01:8983/solr/'), 'solr01:8983_solr')
+        self.assertEqual(_node_name('http://solr01:8983'), 'solr01:8983_')
+
+    def test_get_active_replicas(self):
+        state = {
+            'shards': {
+                'shard1': {
+                    'replicas': {
+                        'core_node1': {
+                            'state': 'active',
+                            'base_url': 'http://127.0.0.1:8080/solr',
+                        }
+                    }
+                }
+            }
+        }
+        zook_client = Zookeeper("http://localzook01:2181")
+
+        with patch.object(zook_client, '_get_cluster_state') as mock_state:
+            mock_state.return_value = ({'one': state}, {})
+            replicas = zook_client.get_active_replicas('one')
+
+        self.assertEqual(len(replicas), 1)
+        self.assertEqual(replicas[0].base_url, 'http://127.0.0.1:8080/solr')
+        # Replicas from before SOLR 7 have no type
+        self.assertEqual(replicas[0].type, 'NRT')
+        self.assertFalse(replicas[0].leader)
+
+    def test_get_collection_state(self):
+        state = {'shards': {}, 'router': {'name': 'compositeId'}}
+        zook_client = Zookeeper("http://localzook01:2181")
+
+        with patch.object(zook_client, '_get_cluster_state') as mock_state:
+            mock_state.return_value = (
+                {'one': state},
+                {'collection': {'my_alias': 'one,two'}}
+            )
+            self.assertEqual(zook_client.get_collection_state('one'), state)
+            # Aliases write to their first member
+            self.assertEqual(zook_client.get_collection_state('my_alias'), state)
+            self.assertIsNone(zook_client.get_collection_state('two'))
+
+            mock_state.return_value = None
+            self.assertIsNone(zook_client.get_collection_state('one'))
+
+    def test_build_active_hosts__multi_member_alias(self):
+        def make_state(port):
+            return {
+                'shards': {
+                    'shard1': {
+                        'replicas': {
+                            'core_node1': {
+                                'state': 'active',
+                                'base_url': 'http://127.0.0.1:%s/solr' % port,
+                            }
+                        }
+                    }
+                }
+            }
+
+        result = _build_active_hosts(
+            {'one': make_state(8080), 'two': make_state(9090), 'three': make_state(7070)},
+            {'collection': {'my_alias': 'one,two'}}
+        )
+        self.assertEqual(
+            result['my_alias'],
+            set(['http://127.0.0.1:8080/solr', 'http://127.0.0.1:9090/solr'])
+        )
+
+    @patch('kazoo.client.KazooClient')
+    def test_watch(self, mock_kazoo):
+        def make_state(port):
+            return json.dumps({
+                'test_collection_one': {
+                    'shards': {
+                        'shard1': {
+                            'replicas': {
+                                'core_node1': {
+                                    'state': 'active',
+                                    'base_url': 'http://127.0.0.1:%s/solr' % port,
+                                }
+                            }
+                        }
+                    }
+                }
+            }).encode('utf-8')
+
+        class MockKazoo(object):
+            def __init__(self):
+                self.data_watches = {}
+                self.children_watches = {}
+                self.stopped = False
+
+            def start(self, *args, **kwargs):
+                return True
+
+            def DataWatch(self, path, func):
+                self.data_watches[path] = func
+                if path.endswith('state.json'):
+                    func(make_state(8080), None)
+                else:
+                    func(None, None)
+
+            def ChildrenWatch(self, path, func):
+                self.children_watches[path] = func
+                if path == '/collections':
+                    func(['test_collection_one'])
+                elif path == '/live_nodes':
+                    func(['127.0.0.1:8080_solr', '127.0.0.1:9090_solr'])
+                else:
+                    func([])
+
+            def stop(self):
+                self.stopped = True
+
+            def close(self):
+                pass
+
+        kazoo = MockKazoo()
+        mock_kazoo.return_value = kazoo
+        zook_client = Zookeeper("http://localzook01:2181")
+        updates = []
+
+        self.assertTrue(zook_client.watch(updates.append))
+        self.assertEqual(
+            zook_client.get_active_hosts('test_collection_one'),
+            ['http://127.0.0.1:8080/solr']
+        )
+
+        # A state change is pushed to the listener without polling
+        kazoo.data_watches['/collections/test_collection_one/state.json'](
+            make_state(9090), None
+        )
+        self.assertEqual(
+            updates[-1]['test_collection_one'],
+            set(['http://127.0.0.1:9090/solr'])
+        )
+
+        # Replicas on nodes leaving the cluster are dropped right away
+        kazoo.children_watches['/live_nodes'](['127.0.0.1:8080_solr'])
+        self.assertEqual(updates[-1]['test_collection_one'], set())
+        kazoo.children_watches['/live_nodes'](['127.0.0.1:9090_solr'])
+        self.assertEqual(
+            updates[-1]['test_collection_one'],
+            set(['http://127.0.0.1:9090/solr'])
+        )
+
+        # Deleted collections drop out of the host table
+        kazoo.children_watches['/collections']([])
+        self.assertEqual(zook_client.get_active_hosts(), [])
+
+        zook_client.stop_watching()
+        self.assertFalse(zook_client.watching)
+        # The session outlives the watches
+        self.assertFalse(kazoo.stopped)
+
+        zook_client.close()
+        self.assertTrue(kazoo.stopped)
+
+    @patch('kazoo.client.KazooClient')
+    def test_watch_legacy_cluster_state(self, mock_kazoo):
+        def make_state(collection, port):
+            return {collection: {'shards': {'shard1': {'replicas': {
+                'core_node1': {
+                    'state': 'active',
+                    'base_url': 'http://127.0.0.1:%s/solr' % port,
+                }
+            }}}}}
+
+        znodes = {
+            '/collections/new_collection/state.json': make_state('new_collection', 7070),
+            # The state.json of new_collection wins over clusterstate.json
+            '/clusterstate.json': dict(
+                make_state('old_collection', 8080),
+                **make_state('new_collection', 6060)
+            ),
+        }
+        data_watches = {}
+
+        def data_watch(path, func):
+            data_watches[path] = func
+            data = znodes.get(path)
+            func(json.dumps(data).encode('utf-8') if data else None, None)
+
+        def children_watch(path, func):
+            if path == '/collections':
+                func(['new_collection'])
+            else:
+                func(['127.0.0.1:%s_solr' % port for port in (6060, 7070, 8080, 9090)])
+
+        kazoo = mock_kazoo.return_value
+        kazoo.DataWatch.side_effect = data_watch
+        kazoo.ChildrenWatch.side_effect = children_watch
+        zook_client = Zookeeper("http://localzook01:2181")
+        updates = []
+
+        self.assertTrue(zook_client.watch(updates.append))
+        # Every collection has a state.json, clusterstate.json is not read
+        self.assertNotIn('/clusterstate.json', data_watches)
+
+        # A collection without a state.json is looked up in clusterstate.json
+        data_watches.clear()
+        kazoo.ChildrenWatch.side_effect = lambda path, func: None
+        zook_client._on_collections_change(['new_collection', 'old_collection'])
+        self.assertIn('/clusterstate.json', data_watches)
+        self.assertEqual(zook_client.host_table, {
+            'new_collection': set(['http://127.0.0.1:7070/solr']),
+            'old_collection': set(['http://127.0.0.1:8080/solr']),
+        })
+
+        # Changes to clusterstate.json are pushed to the listener
+        data_watches['/clusterstate.json'](json.dumps(
+            make_state('old_collection', 9090)
+        ).encode('utf-8'), None)
+        self.assertEqual(
+            updates[-1]['old_collection'],
+            set(['http://127.0.0.1:9090/solr'])
+        )
+
+        zook_client.stop_watching()
+        self.assertFalse(data_watches['/clusterstate.json'](None, None))
+
+    @patch('kazoo.client.KazooClient')
+    def test_session_reused(self, mock_kazoo):
+        kazoo = _with_async(mock_kazoo.return_value)
+        kazoo.get_children.return_value = ['test_collection']
+        kazoo.get.side_effect = [
+            (b'{}', None),
+            (b'{}', None),
+            (b'{"test_collection": {}}', None),
+        ] * 2
+        zook_client = Zookeeper("http://localzook01:2181")
+
+        zook_client.get_active_hosts()
+        zook_client.get_active_hosts()
+
+        self.assertEqual(mock_kazoo.call_count, 1)
+        self.assertEqual(kazoo.start.call_count, 1)
+        self.assertFalse(kazoo.stop.called)
+
+        zook_client.close()
+        kazoo.stop.assert_called_once_with()
+        kazoo.close.assert_called_once_with()
+
+        # A closed Zookeeper starts a new session when used again
+        zook_client._get_client()
+        self.assertEqual(mock_kazoo.call_count, 2)
+
+    @patch('kazoo.client.KazooClient')
+    def test_session_retried_after_failed_start(self, mock_kazoo):
+        kazoo = _with_async(mock_kazoo.return_value)
+        kazoo.start.side_effect = [Exception('timed out'), None]
+        zook_client = Zookeeper("http://localzook01:2181")
+
+        self.assertIsNone(zook_client._get_client())
+        self.assertIs(zook_client._get_client(), kazoo)
+
+    @patch('kazoo.client.KazooClient')
+    def test_connection_lost_while_reading(self, mock_kazoo):
+        from kazoo.exceptions import ConnectionLoss
+        mock_kazoo.return_value.get_children.side_effect = ConnectionLoss()
+        zook_client = Zookeeper("http://localzook01:2181")
+
+        self.assertEqual(zook_client.get_active_hosts(), [])
+        # Kazoo reconnects on its own, the session is kept
+        self.assertFalse(mock_kazoo.return_value.stop.called)
+
+    @patch('kazoo.client.KazooClient')
+    def test_get_active_hosts__targeted(self, mock_kazoo):
+        def state(collection, port):
+            return json.dumps({collection: {'shards': {'shard1': {'replicas': {
+                'core_node1': {
+                    'state': 'active',
+                    'base_url': 'http://127.0.0.1:%d/solr' % port,
+                }
+            }}}}}).encode('utf-8')
+
+        znodes = {
+            '/aliases.json': json.dumps(
+                {'collection': {'my_alias': 'one, two'}}
+            ).encode('utf-8'),
+            '/collections/one/state.json': state('one', 8080),
+            '/collections/two/state.json': state('two', 9090),
+        }
+
+        def get(path):
+            if path not in znodes:
+                raise NoNodeError()
+            return znodes[path], None
+
+        kazoo = _with_async(mock_kazoo.return_value)
+        kazoo.get.side_effect = get
+        kazoo.exists.side_effect = lambda path: (
+            None if path.endswith('.json') and path not in znodes
+            else MagicMock(version=1, cversion=1)
+        )
+        kazoo.get_children.return_value = ['127.0.0.1:8080_solr', '127.0.0.1:9090_solr']
+
+        self.assertEqual(
+            self.zook_client.get_active_hosts(collection_name='one'),
+            ['http://127.0.0.1:8080/solr']
+        )
+        self.assertEqual(
+            sorted(self.zook_client.get_active_hosts(collection_name='my_alias')),
+            ['http://127.0.0.1:8080/solr', 'http://127.0.0.1:9090/solr']
+        )
+
+        # Neither every collection nor the legacy cluster state was read
+        self.assertEqual(
+            set(c[0][0] for c in kazoo.get_children.call_args_list),
+            set(['/live_nodes'])
+        )
+        self.assertEqual(
+            [c[0][0] for c in kazoo.get.call_args_list],
+            [
+                '/aliases.json',
+                '/collections/one/state.json',
+                # The rest had not changed since
+                '/collections/two/state.json',
+            ]
+        )
+
+    @patch('kazoo.client.KazooClient')
+    def test_get_active_hosts__legacy_cluster_state(self, mock_kazoo):
+        cluster_state = {
+            name: {'shards': {'shard1': {'replicas': {'core_node1': {
+                'state': 'active',
+                'base_url': 'http://127.0.0.1:%d/solr' % port,
+            }}}}}
+            for name, port in (('one', 8080), ('two', 9090))
+        }
+
+        def get(path):
+            if path == '/clusterstate.json':
+                return json.dumps(cluster_state).encode('utf-8'), None
+            raise NoNodeError()
+
+        kazoo = _with_async(mock_kazoo.return_value)
+        kazoo.get.side_effect = get
+        kazoo.exists.side_effect = lambda path: (
+            None if path.endswith('/state.json') else MagicMock(version=1, cversion=1)
+        )
+        kazoo.get_children.side_effect = lambda path: {
+            '/collections': ['one', 'two'],
+            '/live_nodes': ['127.0.0.1:8080_solr', '127.0.0.1:9090_solr'],
+        }[path]
+
+        # Only read when the collection has no state.json of its own
+        self.assertEqual(
+            self.zook_client.get_active_hosts(collection_name='one'),
+            ['http://127.0.0.1:8080/solr']
+        )
+        self.assertEqual(
+            sorted(self.zook_client.get_active_hosts()),
+            ['http://127.0.0.1:8080/solr', 'http://127.0.0.1:9090/solr']
+        )
+        self.assertEqual(self.zook_client.get_active_hosts(collection_name='three'), [])
+
+    @patch('kazoo.client.KazooClient')
+    def test_watch_live_nodes(self, mock_kazoo):
+        kazoo = _with_async(mock_kazoo.return_value)
+        zook_client = Zookeeper("http://localzook01:2181")
+
+        class Listener(object):
+            def __init__(self):
+                self.live_nodes = []
+
+            def on_change(self, live_nodes):
+                self.live_nodes.append(live_nodes)
+
+        # Not worth opening a session for
+        self.assertFalse(zook_client.watch_live_nodes(Listener().on_change))
+        self.assertFalse(mock_kazoo.called)
+
+        zook_client._get_client()
+        listener = Listener()
+        self.assertTrue(zook_client.watch_live_nodes(listener.on_change))
+        self.assertTrue(zook_client.watch_live_nodes(Listener().on_change))
+        # One watch for every listener
+        kazoo.ChildrenWatch.assert_called_once_with(
+            '/live_nodes',
+            zook_client._on_live_nodes_change
+        )
+
+        zook_client._on_live_nodes_change(['127.0.0.1:8080_solr'])
+        self.assertEqual(listener.live_nodes, [set(['127.0.0.1:8080_solr'])])
+        # Listeners garbage collected are forgotten
+        self.assertEqual(len(zook_client._live_nodes_listeners), 1)
+        # and the watch keeps the live nodes used by lookups current
+        self.assertEqual(zook_client._get_live_nodes(), set(['127.0.0.1:8080_solr']))
+        self.assertFalse(kazoo.get_children.called)
+
+        zook_client.stop_watching()
+        self.assertIs(zook_client._on_live_nodes_change([]), False)
+        self.assertEqual(len(listener.live_nodes), 1)
+
+    @patch('kazoo.client.KazooClient')
+    def test_cluster_state_cache(self, mock_kazoo):
+        def state(collection, port):
+            return json.dumps({collection: {'shards': {'shard1': {'replicas': {
+                'core_node1': {
+                    'state': 'active',
+                    'base_url': 'http://127.0.0.1:%d/solr' % port,
+                }
+            }}}}}).encode('utf-8')
+
+        znodes = {
+            '/collections/one/state.json': [state('one', 8080), 1],
+            '/collections/two/state.json': [state('two', 9090), 1],
+        }
+        collections = {'children': ['one', 'two'], 'cversion': 1}
+
+        def exists(path):
+            if path == '/collections':
+                return MagicMock(cversion=collections['cversion'])
+            if path in znodes:
+                return MagicMock(version=znodes[path][1])
+            return None
+
+        kazoo = _with_async(mock_kazoo.return_value)
+        kazoo.exists.side_effect = exists
+        kazoo.get.side_effect = lambda path: (znodes[path][0], None)
+        kazoo.get_children.side_effect = lambda path: collections['children']
+
+        hosts = sorted(self.zook_client.get_active_hosts())
+        self.assertEqual(hosts, ['http://127.0.0.1:8080/solr', 'http://127.0.0.1:9090/solr'])
+        self.assertEqual(kazoo.get.call_count, 2)
+        self.assertEqual(kazoo.get_children.call_count, 1)
+
+        # Nothing changed: only exists checks
+        self.assertEqual(sorted(self.zook_client.get_active_hosts()), hosts)
+        self.assertEqual(kazoo.get.call_count, 2)
+        self.assertEqual(kazoo.get_children.call_count, 1)
+
+        # Only the collection whose version moved is read again
+        znodes['/collections/two/state.json'] = [state('two', 7070), 2]
+        self.assertEqual(
+            sorted(self.zook_client.get_active_hosts()),
+            ['http://127.0.0.1:7070/solr', 'http://127.0.0.1:8080/solr']
+        )
+        kazoo.get.assert_called_with('/collections/two/state.json')
+        self.assertEqual(kazoo.get.call_count, 3)
+
+        # Deleted collections are forgotten
+        collections.update(children=['one'], cversion=2)
+        del znodes['/collections/two/state.json']
+        self.assertEqual(self.zook_client.get_active_hosts(), ['http://127.0.0.1:8080/solr'])
+        self.assertEqual(kazoo.get_children.call_count, 2)
+        self.assertEqual(
+            list(self.zook_client._data_cache),
+            ['/collections/one/state.json']
+        )
+
+    @patch('kazoo.client.KazooClient')
+    def test_state_reads_sent_at_once(self, mock_kazoo):
+        events = []
+
+        class Result(object):
+            def __init__(self, name, path, value):
+                events.append((name, path))
+                self.path = path
+                self.value = value
+
+            def get(self):
+                events.append(('wait', self.path))
+                return self.value
+
+        def state(collection):
+            return json.dumps({collection: {'shards': {}}}).encode('utf-8')
+
+        kazoo = mock_kazoo.return_value
+        kazoo.get_children.return_value = ['one', 'two', 'three']
+        kazoo.exists_async.side_effect = lambda path: Result(
+            'exists', path, MagicMock(version=1)
+        )
+        kazoo.get_async.side_effect = lambda path: Result(
+            'get', path, (state(path.split('/')[2]), None)
+        )
+        kazoo.exists.side_effect = lambda path: (
+            MagicMock(cversion=1) if path == '/collections' else None
+        )
+
+        with patch('wukong.zookeeper.MAX_PENDING_READS', 2):
+            zook_client = Zookeeper("http://localzook01:2181")
+            self.assertEqual(
+                sorted(zook_client._get_cluster_state()[0]),
+                ['one', 'three', 'two']
+            )
+
+        one, two, three = [
+            '/collections/%s/state.json' % name for name in ('one', 'two', 'three')
+        ]
+        # Every read of a batch is sent before waiting for any of them
+        self.assertEqual(events, [
+            ('exists', one), ('exists', two), ('wait', one), ('wait', two),
+            ('get', one), ('get', two), ('wait', one), ('wait', two),
+            ('exists', three), ('wait', three),
+            ('get', three), ('wait', three),
+        ])
+        self.assertFalse(kazoo.get.called)
+
+    @patch('kazoo.client.KazooClient')
+    def test_watch_publishes_incrementally(self, mock_kazoo):
+        collections = ['collection%s' % i for i in range(300)]
+
+        def state(collection, port):
+            return json.dumps({collection: {'shards': {'shard1': {'replicas': {
+                'core_node1': {
+                    'state': 'active',
+                    'base_url': 'http://127.0.0.1:%d/solr' % port,
+                }
+            }}}}}).encode('utf-8')
+
+        data_watches = {}
+
+        def data_watch(path, func):
+            data_watches[path] = func
+            if path.endswith('/state.json'):
+                func(state(path.split('/')[2], 8080), None)
+            else:
+                func(None, None)
+
+        def children_watch(path, func):
+            if path == '/collections':
+                func(collections)
+            else:
+                func(['127.0.0.1:8080_solr', '127.0.0.1:9090_solr'])
+
+        kazoo = mock_kazoo.return_value
+        kazoo.DataWatch.side_effect = data_watch
+        kazoo.ChildrenWatch.side_effect = children_watch
+        zook_client = Zookeeper("http://localzook01:2181")
+        updates = []
+
+        with patch(
+            'wukong.zookeeper._get_replicas_from_state',
+            wraps=_get_replicas_from_state
+        ) as mock_parse:
+            self.assertTrue(zook_client.watch(updates.append))
+            # Every state parsed once, and published once they all are
+            self.assertEqual(mock_parse.call_count, len(collections))
+            self.assertEqual(len(updates), 1)
+
+            data_watches['/collections/collection7/state.json'](
+                state('collection7', 9090), None
+            )
+            # Only the state which changed is parsed again
+            self.assertEqual(mock_parse.call_count, len(collections) + 1)
+
+        self.assertEqual(
+            updates[-1]['collection7'],
+            set(['http://127.0.0.1:9090/solr'])
+        )
+        self.assertEqual(len(updates), 2)
+
+    @patch('kazoo.client.KazooClient')
+    def test_watch_listeners_weakly_referenced(self, mock_kazoo):
+        kazoo = mock_kazoo.return_value
+        kazoo.ChildrenWatch.side_effect = lambda path, func: func([])
+        zook_client = Zookeeper("http://localzook01:2181")
+
+        class Listener(object):
+            def __init__(self):
+                self.tables = []
+
+            def on_change(self, host_table):
+                self.tables.append(host_table)
+
+        listener = Listener()
+        self.assertTrue(zook_client.watch(listener.on_change))
+        self.assertTrue(zook_client.watch(Listener().on_change))
+
+        zook_client._on_aliases_change(None, None)
+        self.assertEqual(len(listener.tables), 2)
+        # The discarded listener was garbage collected and forgotten
+        self.assertEqual(len(zook_client._listeners), 1)
+
+
+class TestGetZookeeper(unittest.TestCase):
+
+    def tearDown(self):
+        zookeeper.clear()
+
+    def test_shared_per_hosts(self):
+        one = get_zookeeper("localzook01:2181")
+        self.assertIs(get_zookeeper("localzook01:2181"), one)
+        self.assertIs(get_zookeeper(["localzook01:2181"]), get_zookeeper(["localzook01:2181"]))
+        self.assertIsNot(get_zookeeper("localzook02:2181"), one)
+        self.assertIsNot(get_zookeeper("localzook01:2181", 10), one)
+
+    def test_clear(self):
+        one = get_zookeeper("localzook01:2181")
+        with patch.object(one, 'close') as mock_close:
+            zookeeper.clear()
+        mock_close.assert_called_once_with()
+        self.assertIsNot(get_zookeeper("localzook01:2181"), one)
+
+    def test_after_fork(self):
+        one = get_zookeeper("localzook01:2181")
+        with patch.object(one, 'close') as mock_close, \
+                patch('wukong.zookeeper._pid', -1):
+            forked = get_zookeeper("localzook01:2181")
+        self.assertIsNot(forked, one)
+        # The parent's session is left alone
+        self.assertFalse(mock_close.called)
@@ -0,0 +1,471 @@
+import asyncio
+import functools
+import logging
+import time
+
+from wukong import codec, compression
+from wukong.api import SolrAPI, _format_select_response
+from wukong.coalesce import AsyncSingleFlight
+from wukong.errors import SolrError, SolrSchemaUpdateError
+from wukong.request import (
+    SolrRequest, _get_operation, _is_read, _join_url, _status_error,
+    parse_response_content
+)
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSolrRequest(SolrRequest):
+    """
+    Handle requests to SOLR and response from SOLR on an asyncio event loop
+    """
+
+    def __init__(self, *args, **kwargs):
+        if aiohttp is None:
+            raise SolrError('aiohttp is required to use the asyncio client')
+        if kwargs.get('session_per_thread'):
+            raise SolrError(
+                'session_per_thread is not supported by the asyncio client'
+            )
+        # The event loop our aiohttp session was created on
+        self._client_loop = None
+        super(AsyncSolrRequest, self).__init__(*args, **kwargs)
+
+    def _make_client(self):
+        # aiohttp sessions belong to an event loop, so ours is only created
+        # once we are running in one.
+        return None
+
+    def _get_client(self):
+        loop = asyncio.get_event_loop()
+        if (
+            self.client is None or
+            self.client.closed or
+            (self._client_loop is not None and self._client_loop is not loop)
+        ):
+            # A session cannot be used on any other loop than its own, e.g.
+            # once every `asyncio.run` has its own loop
+            self.client = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_maxsize)
+            )
+            self._client_loop = loop
+        return self.client
+
+    async def close(self):
+        """
+        Close the underlying aiohttp session
+        """
+        if self.client is not None:
+            # A session left on a loop that has gone away cannot be closed
+            if self._client_loop in (None, asyncio.get_event_loop()):
+                await self.client.close()
+            self.client = None
+            self._client_loop = None
+
+    def _client_timeout(self, timeout):
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        return aiohttp.ClientTimeout(total=timeout)
+
+    async def _send(self, host, method, path, params, headers, body,
+                    timeout=None, event=None):
+        """
+        Send one request to one SOLR host
+
+        :returns: the response body if the host answered successfully,
+            or None
+        """
+        full_path = _join_url(host, path)
+        event = self._start_event(event, host, path, method, params, body)
+        self.host_selector.start(host)
+        start = time.time()
+        try:
+            logger.debug('Sending request to solr. route="%s"', full_path)
+
+            self._last_request = start
+
+            async with self._get_client().request(
+                method,
+                full_path,
+                params=params,
+                headers=headers,
+                data=body,
+                timeout=self._client_timeout(
+                    self.timeout if timeout is None else timeout
+                )
+            ) as response:
+                content = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            elapsed = time.time() - start
+            self._record_failure(host, elapsed)
+            self._finish_event(event, elapsed, error=e)
+            return None
+        except asyncio.CancelledError as e:
+            # e.g. the caller timed out, or another host won the hedge: the
+            # request is not in flight anymore
+            elapsed = time.time() - start
+            self._record_failure(host, elapsed)
+            self._finish_event(event, elapsed, error=e)
+            raise
+
+        elapsed = time.time() - start
+        logger.debug(
+            'Retrieved response from SOLR. route="%s" status_code="%s"',
+            full_path,
+            response.status
+        )
+
+        self._finish_event(event, elapsed, response.status, content=content)
+        if self._record_response(host, elapsed, response.status,
+                                 _is_read(path, method)):
+            return content
+
+        logger.info(
+            'Unsucessful request to SOLR'
+            'status_code="%s" reason="%s"',
+            response.status,
+            response.reason
+        )
+        if not self.retry_policy.is_retryable(response.status):
+            # The request itself is wrong, every other host would refuse it too
+            raise _status_error(response.status, content, response.reason)
+        return None
+
+    async def _send_hedged(self, send, primary, backup, delay):
+        """
+        Send the request to `primary`, and to `backup` as well if `primary`
+        has not answered within `delay` seconds. The first successful
+        response wins and the other request is cancelled.
+
+        :returns: tuple of the response body or None, and whether or not
+            the request was sent to `backup`
+        """
+        first = asyncio.ensure_future(send(primary))
+        done, pending = await asyncio.wait([first], timeout=delay)
+        if first in done and first.result() is not None:
+            return first.result(), False
+
+        hedged = self._hedge_allowed(backup)
+        if hedged:
+            logger.debug('Hedging request to solr. host="%s"', backup)
+            pending.add(asyncio.ensure_future(send(backup)))
+        while pending:
+            done, pending = await asyncio.wait(
+                pending,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in done:
+                if future.result() is not None:
+                    for loser in pending:
+                        loser.cancel()
+                    return future.result(), hedged
+        return None, hedged
+
+    async def _refresh(self):
+        # Zookeeper is only reachable through blocking calls
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.attempt_zookeeper_refresh)
+
+    async def _try_hosts(self, send, path, method, attempts, expires=None):
+        """
+        Try every host in turn until one answers, as long as the retry
+        policy and the deadline allow it
+
+        :returns: tuple of the response body or None, and the number of
+            attempts made so far
+        """
+        hosts = self._get_hosts(_is_read(path, method))
+        time_allowed = _get_operation(path, None, None) == 'select'
+        response = None
+
+        hedge_delay = self._get_hedge_delay(path, method)
+        if (
+            hedge_delay is not None and
+            len(hosts) > 1 and
+            self.circuit_breakers.record_attempt(hosts[0])
+        ):
+            attempt = self._next_attempt(send, attempts, expires, time_allowed)
+            if attempt is None:
+                return None, attempts
+            attempt_send, delay = attempt
+            if delay:
+                await asyncio.sleep(delay)
+            attempts += 1
+            response, hedged = await self._send_hedged(
+                attempt_send,
+                hosts[0],
+                hosts[1],
+                hedge_delay
+            )
+            hosts = hosts[2 if hedged else 1:]
+
+        hosts = list(hosts)
+        last_resort = set()
+        for index, host in enumerate(hosts):
+            if response is not None:
+                # We've had a successful request. No need to keep trying
+                break
+            if (
+                host not in last_resort and
+                not self.circuit_breakers.record_attempt(host)
+            ):
+                # Quarantined, or its probe is in flight for another request:
+                # only tried once every other host failed
+                last_resort.add(host)
+                hosts.append(host)
+                continue
+            attempt = self._next_attempt(send, attempts, expires, time_allowed)
+            if attempt is None:
+                break
+            attempt_send, delay = attempt
+            if delay:
+                await asyncio.sleep(delay)
+            event = self._new_event(path, method, attempts)
+            attempts += 1
+            response = await attempt_send(host, event=event)
+            if response is None and event is not None and index + 1 < len(hosts):
+                self._emit('on_failover', event)
+
+        return response, attempts
+
+    async def request(self, path, params, method, body=None, headers=None,
+                      is_retry=False, deadline=None):
+        """
+        Prepare data and send request to SOLR servers
+        """
+        expires = self._get_expiry(deadline)
+        request_params, request_headers = self._prepare_request(
+            params,
+            headers,
+            _is_read(path, method)
+        )
+
+        if self._should_refresh(is_retry):
+            await self._refresh()
+
+        send = functools.partial(
+            self._send,
+            method=method,
+            path=path,
+            params=request_params,
+            headers=request_headers,
+            body=body,
+            timeout=self._get_timeout(path, params, body)
+        )
+
+        response, attempts = await self._try_hosts(
+            send, path, method, 0, expires
+        )
+
+        if (
+            response is None and
+            not is_retry and
+            not self.watching and
+            (expires is None or time.time() < expires)
+        ):
+            if await self._refresh():
+                if self.hooks:
+                    self._emit('on_retry', self._new_event(path, method, attempts))
+                response, attempts = await self._try_hosts(
+                    send, path, method, attempts, expires
+                )
+
+        if response is None:
+            raise self._unable_to_fetch(expires, deadline)
+
+        return parse_response_content(response, request_params['wt'])
+
+    async def post_to_host(self, host, path, params=None, body=None,
+                           headers=None, deadline=None):
+        """
+        Updates are not routed to shard leaders by the asyncio client
+        """
+        raise SolrError(
+            'Requests cannot be sent to a given host by the asyncio client'
+        )
+
+    async def post(self, path, params=None, body=None, headers=None,
+                   deadline=None):
+        """
+        Send a POST request to the SOLR servers
+        """
+        return await self.request(path, params, 'POST', body=body,
+                                  headers=headers, deadline=deadline)
+
+    async def get(self, path, params=None, headers=None, deadline=None):
+        """
+        Send a GET request to the SOLR servers
+        """
+        return await self.request(path, params, 'GET', headers=headers,
+                                  deadline=deadline)
+
+
+class AsyncSolrAPI(SolrAPI):
+    """
+    The coroutine counterpart of `SolrAPI`
+    """
+
+    request_class = AsyncSolrRequest
+    single_flight_class = AsyncSingleFlight
+
+    def __init__(self, *args, **kwargs):
+        super(AsyncSolrAPI, self).__init__(*args, **kwargs)
+        if self.route_updates:
+            raise SolrError(
+                'Updates cannot be routed to shard leaders by the asyncio client'
+            )
+
+    async def close(self):
+        """
+        Close the aiohttp session of this client
+        """
+        await self.client.close()
+
+    async def is_alive(self):
+        """
+        Check if current collection is live from zookeeper.
+
+        :return: weather or not if the collection is live
+        :rtype: boolean
+        """
+        params = {'detail': 'true', 'path': '/clusterstate.json'}
+
+        try:
+            response = await self.client.get('zookeeper', params)
+        except SolrError:
+            logger.exception('Failed to check zookeeper')
+            return False
+        return self._is_active(response)
+
+    async def _get_unique_key(self):
+        if self._unique_key is None:
+            schema = await self.get_schema()
+            self._unique_key = schema.get('uniqueKey', 'id')
+        return self._unique_key
+
+    def _compress(self, data):
+        # aiohttp does not stream synchronous iterators, so bodies are
+        # compressed in one go here.
+        if self.compress_threshold is None:
+            return data, None
+        return compression.compress(data, self.compress_threshold)
+
+    async def update(self, docs, commit=False, deadline=None):
+        """
+        Add new docs or updating existing docs.
+
+        :param docs: a list of instances of SolrDoc.
+        :param commit: whether or not we should commit the documents.
+        """
+        if not docs:
+            return
+
+        params = {}
+
+        if commit:
+            params['commit'] = 'true'
+
+        if self.wire_format == 'javabin':
+            data, headers = self._update_body(docs)
+        else:
+            data, headers = self._compress(codec.dumps(docs))
+        extra = {} if deadline is None else {'deadline': deadline}
+        return await self.client.post(
+            self._get_collection_url(self._update_path()),
+            params=params,
+            body=data,
+            headers=headers,
+            **extra
+        )
+
+    async def select(self, query_dict, groups=False, facets=False,
+                     stats=False, deadline=None, **kwargs):
+        """
+        Query documents from SOLR.
+
+        :return: reformatted response from SOLR
+        :rtype: dict
+        """
+        if kwargs:
+            query_dict.update(kwargs)
+
+        body = codec.dumps({'params': query_dict})
+        data, headers = self._compress(body)
+        extra = {} if deadline is None else {'deadline': deadline}
+        if self.wire_format == 'javabin':
+            extra['params'] = {'wt': 'javabin'}
+        post = functools.partial(
+            self.client.post,
+            self._get_collection_url('select'),
+            body=data,
+            headers=headers,
+            **extra
+        )
+        if self._single_flight is None:
+            response = await post()
+        else:
+            response = await self._single_flight.do(
+                self._select_key(body, deadline),
+                post
+            )
+
+        return _format_select_response(response, groups, facets, stats)
+
+    async def delete(self, unique_key, unique_key_value, commit=False):
+        """
+        Deleting a document from SOLR.
+        """
+        params = {}
+
+        if commit:
+            params['commit'] = 'true'
+
+        data = codec.dumps({"delete": {"query": "%s:%s" %
+                                       (unique_key, unique_key_value)}})
+
+        return await self.client.post(
+            self._get_collection_url('update/json'),
+            params=params,
+            body=data
+        )
+
+    async def commit(self):
+        """
+        Hard commit documents to SOLR.
+        """
+        params = {'commit': 'true'}
+
+        return await self.client.post(
+            self._get_collection_url('update/json'), params=params)
+
+    async def get_schema(self):
+        """
+        Get the SOLR schema for the solr collection.
+
+        :return: the schema for the current collection
+        :rtype: dict
+        """
+        response = await self.client.get(self._get_collection_url('schema'))
+
+        return response.get('schema', {})
+
+    async def add_schema_fields(self, fields):
+        """
+        Add new fields to the schema of current collection
+        """
+        if not fields:
+            return
+
+        try:
+            return await self.client.post(
+                self._get_collection_url('schema/fields'),
+                body=codec.dumps(fields)
+            )
+        except SolrError as e:
+            raise SolrSchemaUpdateError(fields, message=e.args[0])
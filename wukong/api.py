@@ -1,12 +1,21 @@
 import logging
-import datetime as dt
 import wukong.errors as solr_errors
+from wukong import codec, compression, javabin
+from wukong.coalesce import SingleFlight
 from wukong.request import SolrRequest
-from wukong.zookeeper import Zookeeper
-import json
+from wukong.streaming import SolrStreamingResult
+from wukong.zookeeper import get_zookeeper
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import time
 
 logger = logging.getLogger(__name__)
 
+# Most shard leaders written to at the same time by one routed update
+ROUTED_UPDATE_WORKERS = 16
+
+WIRE_FORMATS = ('json', 'javabin')
+
 def _add_scheme_if_not_there(url, scheme='http'):
     if not (
         url.startswith('http://')
@@ -25,10 +34,44 @@ def _format_solr_url(url):
 
     return url
 
+def _format_select_response(response, groups=False, facets=False,
+                            stats=False):
+    """
+    Reformat a raw SOLR select response into the dict returned by `select`
+    """
+    data = {}
+    if groups and 'grouped' in response:
+        data['groups'] = response['grouped']
+
+    if facets and 'facet_counts' in response:
+        data['facets'] = response['facet_counts']
+
+    if stats and 'stats' in response:
+        data['stats'] = response['stats']
+
+    if 'response' in response and 'docs' in response['response']:
+        response_data = response['response']
+        data['docs'] = response_data['docs']
+        data['total'] = response_data.get('numFound', len(data['docs']))
+
+    return data
+
+
 class SolrAPI(object):
 
+    request_class = SolrRequest
+    single_flight_class = SingleFlight
+
     def __init__(self, solr_hosts, solr_collection,
-                 zookeeper_hosts=None, timeout=15, zookeeper_timeout=5):
+                 zookeeper_hosts=None, timeout=15, zookeeper_timeout=5,
+                 zookeeper_watch=False, host_selector=None,
+                 circuit_breakers=None, hedge_delay=None,
+                 pool_connections=10, pool_maxsize=10, pool_block=False,
+                 compress_threshold=None, retry_policy=None,
+                 route_updates=False, read_preference=None, timeouts=None,
+                 deadline=None, hooks=None, omit_header=True, metrics=None,
+                 wire_format='json', coalesce_selects=False,
+                 session_per_thread=False):
         """
         Do all the interactions with SOLR server
         (e.g. update, select, get and delete)
@@ -45,14 +88,96 @@ class SolrAPI(object):
         :param timeout: the timeout for request to SOLR.
         :type timeout: int
 
+        :param zookeeper_watch: watch zookeeper in the background for
+            changes to the SOLR hosts instead of polling it.
+        :type zookeeper_watch: boolean
+
+        :param host_selector: the strategy used to pick SOLR hosts.
+        :type host_selector: wukong.balancer.HostSelector
+
+        :param circuit_breakers: the circuit breakers quarantining failing
+            SOLR hosts.
+        :type circuit_breakers: wukong.breaker.CircuitBreakerRegistry
+
+        :param hedge_delay: seconds, or a latency percentile like 'p95',
+            to wait for a select before sending it to a second host.
+        :type hedge_delay: float or str
+
+        :param pool_connections: the number of per-host connection pools.
+        :type pool_connections: int
+
+        :param pool_maxsize: the maximum number of connections per host.
+        :type pool_maxsize: int
+
+        :param pool_block: whether or not to wait for a free connection
+            when the pool of a host is exhausted.
+        :type pool_block: boolean
+
+        :param compress_threshold: the size in bytes above which update and
+            select bodies are sent gzip-compressed. Disabled by default.
+        :type compress_threshold: int
+
+        :param retry_policy: which failures are retried on another host,
+            how many times and with what backoff. 4xx responses are never
+            retried.
+        :type retry_policy: wukong.retry.RetryPolicy
+
+        :param route_updates: whether or not to send updated documents
+            straight to the leader of their shard, from the collection state
+            in zookeeper. Only applies with zookeeper hosts, to collections
+            using the compositeId router.
+        :type route_updates: boolean
+
+        :param read_preference: replicas to send selects to first, e.g.
+            'replica.type:PULL,replica.leader:false' to keep search traffic
+            off the indexing leaders. Requires zookeeper hosts.
+        :type read_preference: str or wukong.preference.ReadPreference
+
+        :param timeouts: timeouts overriding `timeout` per operation, keyed
+            by 'select', 'update', 'commit' or 'schema'. A timeout is a
+            number of seconds or a (connect, read) tuple.
+        :type timeouts: dict
+
+        :param deadline: the seconds a call may take in total, failover
+            included, unless a call sets its own.
+        :type deadline: float
+
+        :param hooks: observers of every request attempt, failover, retry
+            and zookeeper refresh.
+        :type hooks: list of wukong.hooks.RequestHooks
+
+        :param omit_header: whether or not SOLR leaves the response header
+            out. Keep it to report QTime to the hooks.
+        :type omit_header: boolean
+
+        :param metrics: the registry recording the traffic of this client,
+            e.g. `wukong.metrics.registry`.
+        :type metrics: wukong.metrics.MetricsRegistry
+
+        :param wire_format: 'json', or 'javabin' to receive select responses
+            and send update bodies in SOLR's binary format. Streamed selects
+            are always JSON.
+        :type wire_format: str
+
+        :param coalesce_selects: whether or not concurrent identical selects
+            share one request to SOLR, each caller getting its own copy of
+            the response. Streamed selects are never shared.
+        :type coalesce_selects: boolean
+
+        :param session_per_thread: whether or not each thread gets its own
+            requests session over the shared connection pool.
+        :type session_per_thread: boolean
+
         """
+        if wire_format not in WIRE_FORMATS:
+            raise ValueError('Unsupported wire format: %s' % wire_format)
 
         if solr_hosts is None and zookeeper_hosts is not None:
             logger.info(
                 'Getting solr hosts from zookeeper for collection %s',
                 solr_collection
             )
-            zk = Zookeeper(zookeeper_hosts, zookeeper_timeout)
+            zk = get_zookeeper(zookeeper_hosts, zookeeper_timeout)
             solr_hosts = zk.get_active_hosts(collection_name=solr_collection)
 
         if solr_hosts is None or solr_collection is None:
@@ -94,11 +219,35 @@ class SolrAPI(object):
         self.solr_hosts = [_format_solr_url(host) for host in solr_hosts]
 
         self.solr_collection = solr_collection
+        self.compress_threshold = compress_threshold
+        self.route_updates = route_updates
+        self.wire_format = wire_format
+        self._unique_key = None
+        self._single_flight = (
+            self.single_flight_class() if coalesce_selects else None
+        )
 
-        self.client = SolrRequest(
+        self.client = self.request_class(
             solr_hosts=self.solr_hosts,
             zookeeper_hosts=zookeeper_hosts,
-            timeout=timeout
+            timeout=timeout,
+            zookeeper_timeout=zookeeper_timeout,
+            zookeeper_watch=zookeeper_watch,
+            collection=solr_collection,
+            host_selector=host_selector,
+            circuit_breakers=circuit_breakers,
+            hedge_delay=hedge_delay,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            retry_policy=retry_policy,
+            read_preference=read_preference,
+            timeouts=timeouts,
+            deadline=deadline,
+            hooks=hooks,
+            omit_header=omit_header,
+            metrics=metrics,
+            session_per_thread=session_per_thread
         )
 
     def _get_collection_url(self, path):
@@ -119,23 +268,30 @@ class SolrAPI(object):
             logger.exception('Failed to check zookeeper')
             return False
         else:
-            try:
-                data = json.loads(response['znode']['data'])
-            except ValueError:
-                return False
-
-            for name, collection in data.items():
-                shards = collection['shards']
-                for shard, shard_info in shards.items():
-                    replicas = shard_info['replicas']
-                    for replica, info in replicas.items():
-                        state = info['state']
-                        if name == self.solr_collection and state != 'active':
-                            return False
-
-            return True
-
-    def update(self, docs, commit=False):
+            return self._is_active(response)
+
+    def _is_active(self, response):
+        """
+        Whether or not every replica of our collection is active, from the
+        response of SOLR's zookeeper endpoint
+        """
+        try:
+            data = codec.loads(response['znode']['data'])
+        except ValueError:
+            return False
+
+        for name, collection in data.items():
+            shards = collection['shards']
+            for shard, shard_info in shards.items():
+                replicas = shard_info['replicas']
+                for replica, info in replicas.items():
+                    state = info['state']
+                    if name == self.solr_collection and state != 'active':
+                        return False
+
+        return True
+
+    def update(self, docs, commit=False, deadline=None):
         """
         Add new docs or updating existing docs.
 
@@ -145,32 +301,183 @@ class SolrAPI(object):
         :param commit: whether or not we should commit the documents.
         :type server: boolean
 
+        :param deadline: the seconds the update may take in total, failover
+            included.
+        :type deadline: float
+
+        :return: the response from SOLR, or the list of responses from every
+            shard leader when updates are routed
         """
         if not docs:
             return
 
-        data = json.dumps(
-            docs,
-            default=lambda obj: obj.isoformat() if isinstance(
-                obj, dt.datetime) else None
-        )
-
         params = {}
 
         if commit:
             params['commit'] = 'true'
 
+        # Only pass the deadline along when there is one
+        extra = {} if deadline is None else {'deadline': deadline}
+
+        if self.route_updates:
+            router = self.client.get_shard_router()
+            if router is not None:
+                return self._routed_update(router, docs, commit, deadline)
+
+        data, headers = self._update_body(docs)
+        if headers is None:
+            return self.client.post(
+                self._get_collection_url(self._update_path()),
+                params=params,
+                body=data,
+                **extra
+            )
+
         return self.client.post(
-            self._get_collection_url('update/json'),
+            self._get_collection_url(self._update_path()),
             params=params,
-            body=data
+            body=data,
+            headers=headers,
+            **extra
+        )
+
+    def _update_path(self):
+        if self.wire_format == 'javabin':
+            return 'update'
+        return 'update/json'
+
+    def _update_body(self, docs):
+        """
+        Encode documents for an update, compressed when they are large enough
+
+        :returns: tuple of the body and the extra headers, or None
+        """
+        if self.wire_format == 'javabin':
+            data, headers = javabin.dumps_update(docs), {}
+            if self.compress_threshold is not None:
+                data, headers = compression.compress(
+                    data,
+                    self.compress_threshold
+                )
+            headers['content-type'] = javabin.CONTENT_TYPE
+            return data, headers
+
+        if self.compress_threshold is None:
+            return codec.dumps(docs), None
+
+        # Encode and compress the docs while they are being sent
+        return compression.compress_stream(
+            functools.partial(codec.iterencode, docs),
+            self.compress_threshold
+        )
+
+    def _get_unique_key(self):
+        if self._unique_key is None:
+            self._unique_key = self.get_schema().get('uniqueKey', 'id')
+        return self._unique_key
+
+    def _routed_update(self, router, docs, commit, deadline=None):
+        """
+        Split an update per shard and send each part to its shard leader,
+        in parallel
+
+        :param deadline: float - (Optional) the seconds every part may take,
+            failover included
+        :returns list: the response of every part
+        """
+        batches = router.partition(docs, self._get_unique_key())
+        send = functools.partial(
+            self._update_shard,
+            router,
+            expires=self.client._get_expiry(deadline)
         )
 
+        if len(batches) == 1:
+            responses = [send(*batches.popitem())]
+        else:
+            workers = min(len(batches), ROUTED_UPDATE_WORKERS)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                responses = list(executor.map(
+                    lambda batch: send(*batch),
+                    batches.items()
+                ))
+
+        # One commit for the whole collection, not one per shard
+        if commit:
+            self.commit()
+
+        return responses
+
+    def _update_shard(self, router, shard, docs, expires=None):
+        """
+        Send the documents of one shard to its leader. When the leader does
+        not answer, or no longer has the core (e.g. after a shard split or a
+        move), the collection state is read again in case leadership moved,
+        then the documents go through any node instead, which forwards them
+        to the right leader.
+
+        :param expires: float - (Optional) when the deadline of the update
+            is up, as a timestamp
+        """
+        data, headers = self._update_body(docs)
+
+        def extra():
+            # Only pass the deadline along when there is one
+            if expires is None:
+                return {}
+            return {'deadline': max(expires - time.time(), 0)}
+
+        if shard is not None:
+            leader = router.get_leader(shard)
+            if leader is not None:
+                response = self._post_to_leader(
+                    leader, data, headers, **extra()
+                )
+                if response is not None:
+                    return response
+
+                logger.info('Shard leader %s did not answer, reloading leaders', leader)
+                router = self.client.get_shard_router(refresh=True)
+                new_leader = router and router.get_leader(shard)
+                if new_leader is not None and new_leader != leader:
+                    response = self._post_to_leader(
+                        new_leader, data, headers, **extra()
+                    )
+                    if response is not None:
+                        return response
+
+        return self.client.post(
+            self._get_collection_url(self._update_path()),
+            body=data,
+            headers=headers,
+            **extra()
+        )
+
+    def _post_to_leader(self, leader, data, headers, **kwargs):
+        """
+        Send an update to a shard leader's core
+
+        :returns: the response, or None when the leader did not answer or
+            does not have the core anymore
+        """
+        try:
+            return self.client.post_to_host(
+                leader, self._update_path(), body=data, headers=headers,
+                **kwargs
+            )
+        except solr_errors.SolrError as e:
+            if e.status_code != 404:
+                raise
+            logger.info('Shard leader %s does not have the core anymore', leader)
+            return None
+
     def select(self,
                query_dict,
                groups=False,
                facets=False,
                stats=False,
+               stream=False,
+               deadline=None,
                **kwargs
                ):
         """
@@ -182,37 +489,62 @@ class SolrAPI(object):
         :param metadata: whether or not solr metadata should be returned
         :type metadata: boolean
 
+        :param stream: whether or not to read and parse the documents one at
+            a time instead of loading the whole response
+        :type stream: boolean
+
+        :param deadline: the seconds the select may take in total, failover
+            included. Also sent to SOLR as `timeAllowed`.
+        :type deadline: float
+
         :param kwargs: a dict of additional params for SOLR
         :type kwargs: dict
 
-        :return: reformatted response from SOLR
-        :rtype: dict
+        :return: reformatted response from SOLR, or a streaming result
+        :rtype: dict or wukong.streaming.SolrStreamingResult
         """
 
         if kwargs:
             query_dict.update(kwargs)
 
-        response = self.client.post(
+        body = codec.dumps({'params': query_dict})
+        post_kwargs = {'body': body}
+        if self.compress_threshold is not None:
+            post_kwargs['body'], post_kwargs['headers'] = compression.compress(
+                body,
+                self.compress_threshold
+            )
+        if stream:
+            post_kwargs['stream'] = True
+        elif self.wire_format == 'javabin':
+            post_kwargs['params'] = {'wt': 'javabin'}
+        if deadline is not None:
+            post_kwargs['deadline'] = deadline
+
+        post = functools.partial(
+            self.client.post,
             self._get_collection_url('select'),
-            body=json.dumps({'params': query_dict})
+            **post_kwargs
         )
+        if stream or self._single_flight is None:
+            response = post()
+        else:
+            response = self._single_flight.do(
+                self._select_key(body, deadline),
+                post
+            )
 
-        data = {}
-        if groups and 'grouped' in response:
-            data['groups'] = response['grouped']
-
-        if facets and 'facet_counts' in response:
-            data['facets'] = response['facet_counts']
-
-        if stats and 'stats' in response:
-            data['stats'] = response['stats']
+        if stream:
+            return SolrStreamingResult(response)
 
-        if 'response' in response and 'docs' in response['response']:
-            response_data = response['response']
-            data['docs'] = response_data['docs']
-            data['total'] = response_data.get('numFound', len(data['docs']))
+        return _format_select_response(response, groups, facets, stats)
 
-        return data
+    def _select_key(self, body, deadline):
+        """
+        What makes two selects identical, the uncompressed body standing for
+        the query params
+        """
+        return (self.solr_collection, body, self.wire_format, deadline)
 
     def delete(self, unique_key, unique_key_value, commit=False):
         """
@@ -229,8 +561,8 @@ class SolrAPI(object):
         if commit:
             params['commit'] = 'true'
 
-        data = json.dumps({"delete": {"query": "%s:%s" %
-                                      (unique_key, unique_key_value)}})
+        data = codec.dumps({"delete": {"query": "%s:%s" %
+                                       (unique_key, unique_key_value)}})
 
         return self.client.post(
             self._get_collection_url('update/json'),
@@ -269,7 +601,7 @@ class SolrAPI(object):
         if not fields:
             return
 
-        data = json.dumps(fields)
+        data = codec.dumps(fields)
 
         try:
             return self.client.post(
@@ -0,0 +1,153 @@
+import logging
+import random
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class _HostStats(object):
+    """
+    Latency and load observed for one SOLR host
+    """
+    def __init__(self):
+        self.latency = None
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+
+
+class HostSelector(object):
+    """
+    Decide the order in which SOLR hosts are tried for a request, learning
+    from the latency and outcome of real traffic.
+
+    Subclasses implement `order`. The request loop calls `start` before
+    sending a request to a host and `finish` once it has an answer.
+    """
+    def __init__(self, decay=0.3, failure_penalty=5.0):
+        """
+        :param decay: float - Weight of the newest sample in the moving
+            average of the latency. (Default: 0.3)
+        :param failure_penalty: float - Latency in seconds recorded for a
+            failed request, so that a host refusing connections quickly does
+            not look fast. (Default: 5s)
+        """
+        self.decay = decay
+        self.failure_penalty = failure_penalty
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _get_stats(self, host):
+        stats = self._stats.get(host)
+        if stats is None:
+            stats = self._stats.setdefault(host, _HostStats())
+        return stats
+
+    def order(self, hosts):
+        """
+        Return the hosts in the order they should be tried
+
+        :param hosts: list[str] - the candidate hosts
+        :returns: list[str]
+        """
+        raise NotImplementedError
+
+    def start(self, host):
+        """
+        Record that a request to `host` is in flight
+        """
+        with self._lock:
+            self._get_stats(host).in_flight += 1
+
+    def finish(self, host, elapsed, success=True):
+        """
+        Record the outcome of a request to `host`
+
+        :param host: str - the host the request was sent to
+        :param elapsed: float - wall time of the request in seconds
+        :param success: bool - whether or not the host answered usefully
+        """
+        if not success:
+            elapsed = max(elapsed, self.failure_penalty)
+
+        with self._lock:
+            stats = self._get_stats(host)
+            stats.in_flight = max(stats.in_flight - 1, 0)
+            stats.requests += 1
+            if not success:
+                stats.failures += 1
+
+            if stats.latency is None:
+                stats.latency = elapsed
+            else:
+                stats.latency += self.decay * (elapsed - stats.latency)
+
+    def score(self, host):
+        """
+        The expected cost of sending one more request to `host`, lower is
+        better. Hosts without any samples score 0 so they get tried.
+        """
+        stats = self._stats.get(host)
+        if stats is None or stats.latency is None:
+            return 0.0
+        return stats.latency * (stats.in_flight + 1)
+
+    def scores(self):
+        """
+        Per host statistics, for debugging
+
+        :returns: dict[str, dict]
+        """
+        with self._lock:
+            return dict(
+                (host, {
+                    'latency': stats.latency,
+                    'in_flight': stats.in_flight,
+                    'requests': stats.requests,
+                    'failures': stats.failures,
+                    'score': self.score(host),
+                })
+                for host, stats in self._stats.items()
+            )
+
+
+class RandomSelector(HostSelector):
+    """
+    Try the hosts in a random order
+    """
+    def order(self, hosts):
+        return random.sample(hosts, len(hosts))
+
+
+class PowerOfTwoSelector(HostSelector):
+    """
+    Pick two hosts at random and try the one with the lower score first.
+    The remaining hosts follow from best to worst score.
+    """
+    def order(self, hosts):
+        if len(hosts) < 2:
+            return list(hosts)
+
+        first, second = random.sample(hosts, 2)
+        if self.score(second) < self.score(first):
+            first = second
+
+        rest = [host for host in hosts if host != first]
+        random.shuffle(rest)
+        return [first] + sorted(rest, key=self.score)
+
+
+class LeastOutstandingSelector(HostSelector):
+    """
+    Try the host with the fewest requests in flight first, breaking ties
+    on the average latency.
+    """
+    def _key(self, host):
+        stats = self._stats.get(host)
+        if stats is None:
+            return (0, 0.0)
+        return (stats.in_flight, stats.latency or 0.0)
+
+    def order(self, hosts):
+        hosts = random.sample(hosts, len(hosts))
+        return sorted(hosts, key=self._key)
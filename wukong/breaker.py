@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker(object):
+    """
+    Track the health of one SOLR host.
+
+    The breaker opens after `failure_threshold` consecutive failures. Once
+    `recovery_timeout` seconds have passed it goes half-open and lets a
+    single probe request through; a success closes it again, a failure
+    re-opens it for another `recovery_timeout`.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = None
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    def available(self):
+        """
+        Whether or not a request would be let through right now, without
+        claiming the probe of a half-open breaker
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            now = time.time()
+            if self.state == self.OPEN:
+                return now - self._opened_at >= self.recovery_timeout
+            return (
+                self._probe_started is None or
+                now - self._probe_started >= self.recovery_timeout
+            )
+
+    def allow_request(self):
+        """
+        Whether or not a request may be sent to the host right now. Once
+        half-open, a request let through is the probe: call this only when
+        the request is actually sent.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            now = time.time()
+            if self.state == self.OPEN:
+                if now - self._opened_at < self.recovery_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_started = None
+
+            # Half-open: only one probe at a time. A probe that never
+            # reported back does not block the host forever.
+            if (
+                self._probe_started is None or
+                now - self._probe_started >= self.recovery_timeout
+            ):
+                self._probe_started = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._opened_at = None
+            self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if (
+                self.state == self.HALF_OPEN or
+                self.failures >= self.failure_threshold
+            ):
+                self.state = self.OPEN
+                self._opened_at = time.time()
+                self._probe_started = None
+
+
+class CircuitBreakerRegistry(object):
+    """
+    Hold one CircuitBreaker per SOLR host
+    """
+    def __init__(self, failure_threshold=5, recovery_timeout=30):
+        """
+        :param failure_threshold: int - Consecutive failures or timeouts
+            before a host is quarantined. (Default: 5)
+        :param recovery_timeout: int - Seconds a host stays quarantined
+            before a probe request is let through. (Default: 30s)
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, host):
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(
+                    host,
+                    CircuitBreaker(
+                        self.failure_threshold,
+                        self.recovery_timeout
+                    )
+                )
+        return breaker
+
+    def order(self, hosts):
+        """
+        Keep the order of `hosts` but move the quarantined ones to the end,
+        so that they are only tried once no other host is left.
+
+        :param hosts: list[str] - hosts in the order they should be tried
+        :returns: list[str]
+        """
+        available = []
+        quarantined = []
+        for host in hosts:
+            # Sorting must not claim the probe of a host it may never send to
+            if self.get(host).available():
+                available.append(host)
+            else:
+                quarantined.append(host)
+
+        if quarantined:
+            logger.debug('Quarantined SOLR hosts: %s', ','.join(quarantined))
+        return available + quarantined
+
+    def record_attempt(self, host):
+        """
+        Account for a request about to be sent to `host`, it is the probe
+        when its breaker is half-open
+
+        :returns bool: whether or not the breaker lets the request through.
+            When it does not, the host is quarantined or its probe is still
+            in flight.
+        """
+        return self.get(host).allow_request()
+
+    def record_success(self, host):
+        self.get(host).record_success()
+
+    def record_failure(self, host):
+        breaker = self.get(host)
+        was_open = breaker.state == CircuitBreaker.OPEN
+        breaker.record_failure()
+        if not was_open and breaker.state == CircuitBreaker.OPEN:
+            logger.warning('Quarantining SOLR host %s', host)
+
+    def states(self):
+        """
+        The state of every known host, for debugging
+
+        :returns: dict[str, str]
+        """
+        return dict(
+            (host, breaker.state) for host, breaker in self._breakers.items()
+        )
@@ -0,0 +1,107 @@
+import asyncio
+import copy
+import threading
+from functools import partial
+
+
+class _Call(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # Callers waiting on the caller making the call
+        self.waiters = 0
+
+
+class SingleFlight(object):
+    """
+    Make one call at a time per key: callers asking for a key already in
+    flight wait for that call instead of making their own, then get a deep
+    copy of its result or its exception.
+    """
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """
+        :param key: hashable - what makes calls identical
+        :param func: callable - makes the call
+        :returns: the result of `func`, a copy when it was shared
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                shared = call.waiters > 0
+            call.done.set()
+
+        # Nobody else holds the result when it was not shared
+        return copy.deepcopy(call.result) if shared else call.result
+
+
+class _AsyncCall(object):
+
+    def __init__(self, task):
+        self.task = task
+        # Callers waiting on the caller making the call
+        self.waiters = 0
+        # Callers still awaiting the call
+        self.awaiting = 0
+
+
+class AsyncSingleFlight(object):
+    """
+    The coroutine counterpart of `SingleFlight`, for one event loop
+    """
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, func):
+        """
+        :param key: hashable - what makes calls identical
+        :param func: coroutine function - makes the call
+        :returns: the result of `func`, a copy when it was shared
+        """
+        call = self._calls.get(key)
+        if call is None or call.task.done():
+            # The call runs in a task of its own, so that the caller which
+            # made it giving up does not cancel it for the others
+            call = self._calls[key] = _AsyncCall(asyncio.ensure_future(func()))
+            call.task.add_done_callback(partial(self._forget, key, call))
+        else:
+            call.waiters += 1
+
+        call.awaiting += 1
+        try:
+            result = await asyncio.shield(call.task)
+        finally:
+            call.awaiting -= 1
+            if not call.awaiting and not call.task.done():
+                # Every caller gave up, nobody wants the result anymore
+                call.task.cancel()
+
+        return copy.deepcopy(result) if call.waiters else result
+
+    def _forget(self, key, call, task):
+        if self._calls.get(key) is call:
+            del self._calls[key]
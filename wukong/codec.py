@@ -0,0 +1,93 @@
+import datetime as dt
+import decimal
+import json
+import uuid
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+def _default(obj):
+    """
+    Serialize the types SOLR documents commonly hold that JSON does not.
+    Anything else is sent as null.
+    """
+    if isinstance(obj, (dt.datetime, dt.date)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return None
+
+
+# Built once, so every call skips setting up a new encoder
+encoder = json.JSONEncoder(default=_default, separators=(',', ':'))
+
+
+def _stdlib_loads(data):
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    return json.loads(data)
+
+
+def _stdlib_dumps(obj):
+    return encoder.encode(obj).encode('utf-8')
+
+
+if orjson is not None:
+    name = 'orjson'
+    _loads = orjson.loads
+
+    def _dumps(obj):
+        # Like json, keys that are not str (e.g. int facet values) are
+        # converted instead of refused
+        return orjson.dumps(
+            obj,
+            default=_default,
+            option=orjson.OPT_NON_STR_KEYS
+        )
+
+elif ujson is not None:
+    # ujson is only used for decoding, its encoder has no `default` hook
+    # on every supported version.
+    name = 'ujson'
+    _loads = ujson.loads
+    _dumps = _stdlib_dumps
+
+else:
+    name = 'json'
+    _loads = _stdlib_loads
+    _dumps = _stdlib_dumps
+
+
+def loads(data):
+    """
+    Decode a JSON document from bytes or str. Bytes are parsed directly
+    when a fast codec is installed, without decoding them to str first.
+    """
+    return _loads(data)
+
+
+def dumps(obj):
+    """
+    Encode an object to JSON bytes, see `_default` for the extra types
+    handled.
+    """
+    return _dumps(obj)
+
+
+def iterencode(obj):
+    """
+    Encode an object to JSON piece by piece, for streamed bodies
+    """
+    return encoder.iterencode(obj)
@@ -0,0 +1,89 @@
+import gzip
+import zlib
+
+# Size of the pieces handed to the compressor and to the HTTP connection
+CHUNK_SIZE = 64 * 1024
+
+GZIP_HEADERS = {'Content-Encoding': 'gzip'}
+
+
+def _rechunk(chunks, chunk_size=CHUNK_SIZE):
+    """
+    Group the small strings produced by a streaming encoder into pieces of
+    roughly `chunk_size` bytes
+    """
+    buffer = []
+    size = 0
+    for chunk in chunks:
+        if not isinstance(chunk, bytes):
+            chunk = chunk.encode('utf-8')
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= chunk_size:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+
+    if buffer:
+        yield b''.join(buffer)
+
+
+class GzipBody(object):
+    """
+    A request body that gzip-compresses the output of an encoder while it is
+    being sent, so that neither the whole uncompressed nor the whole
+    compressed body is held in memory.
+
+    Every iteration runs the encoder again, which lets the same body be
+    sent to another host when a request fails over.
+    """
+    def __init__(self, chunk_factory):
+        """
+        :param chunk_factory: callable returning a fresh iterator over the
+            uncompressed body
+        """
+        self.chunk_factory = chunk_factory
+
+    def __iter__(self):
+        # wbits=31 writes a gzip header and trailer around the deflate stream
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in _rechunk(self.chunk_factory()):
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+
+def compress_stream(chunk_factory, threshold):
+    """
+    Gzip a streamed body when it is larger than `threshold` bytes.
+
+    Only up to `threshold` bytes are encoded to make that decision, smaller
+    bodies are returned as they are.
+
+    :param chunk_factory: callable returning a fresh iterator over the body
+    :param threshold: int - size in bytes above which the body is compressed
+    :returns: tuple of the body and the extra headers to send with it
+    """
+    buffer = []
+    size = 0
+    for chunk in _rechunk(chunk_factory()):
+        buffer.append(chunk)
+        size += len(chunk)
+        if size > threshold:
+            return GzipBody(chunk_factory), dict(GZIP_HEADERS)
+
+    return b''.join(buffer), {}
+
+
+def compress(body, threshold):
+    """
+    Gzip an already encoded body when it is larger than `threshold` bytes.
+
+    :returns: tuple of the body and the extra headers to send with it
+    """
+    if not isinstance(body, bytes):
+        body = body.encode('utf-8')
+    if len(body) > threshold:
+        return gzip.compress(body), dict(GZIP_HEADERS)
+    return body, {}
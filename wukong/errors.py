@@ -8,6 +8,14 @@ class SolrError(Exception):
         self.status_code = status_code
 
 
+class SolrDeadlineExceededError(SolrError):
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+        message = "No SOLR node answered within the %ss deadline" % deadline
+        super(SolrDeadlineExceededError, self).__init__(message=message)
+
+
 class SolrSchemaUpdateError(SolrError):
 
     def __init__(self, fields, message=None, status_code=None):
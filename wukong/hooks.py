@@ -0,0 +1,123 @@
+import re
+
+# The response header comes first, so QTime is found without parsing the
+# whole body. Only present when the client does not omit the header.
+_QTIME_RE = re.compile(br'"QTime"\s*:\s*(\d+)')
+_QTIME_SEARCH_BYTES = 256
+
+
+def _get_qtime(content):
+    """
+    The QTime SOLR reported in a response body, in milliseconds, or None
+    """
+    if not content:
+        return None
+    match = _QTIME_RE.search(content[:_QTIME_SEARCH_BYTES])
+    return int(match.group(1)) if match else None
+
+
+def _get_size(body):
+    """
+    The size of a request body in bytes, or None when it is streamed
+    """
+    if isinstance(body, (bytes, str)):
+        return len(body)
+    return None
+
+
+class RequestEvent(object):
+    """
+    What is known about one attempt to send a request to one SOLR host.
+    The hooks receive the same event before the request and after the
+    response, filled in as the attempt progresses.
+    """
+    def __init__(self, host, path, method, body_size=None, attempt=0):
+        self.host = host
+        self.path = path
+        self.method = method
+        # 'select', 'update', 'commit', 'schema' or None
+        self.operation = None
+        self.body_size = body_size
+        # Number of attempts made for the request before this one
+        self.attempt = attempt
+        # HTTP status, or None when the host never answered
+        self.status = None
+        self.response_size = None
+        # Wall time of the attempt in seconds, network included
+        self.elapsed = None
+        # Time SOLR reports spending on the request, in milliseconds
+        self.qtime = None
+        # The exception raised when the host never answered
+        self.error = None
+
+    def __repr__(self):
+        return '%s(%s %s%s status=%s elapsed=%s qtime=%s)' % (
+            self.__class__.__name__,
+            self.method,
+            self.host or '',
+            self.path,
+            self.status,
+            self.elapsed,
+            self.qtime
+        )
+
+
+class ZookeeperRefreshEvent(object):
+    """
+    A change of the SOLR hosts a client sends requests to
+    """
+    def __init__(self, hosts, elapsed=None, success=True, watch=False):
+        self.hosts = hosts
+        # Seconds spent reading zookeeper, None for watch notifications
+        self.elapsed = elapsed
+        self.success = success
+        # Whether the change was pushed by a watch rather than polled
+        self.watch = watch
+
+
+class RequestHooks(object):
+    """
+    Base class for observing the requests a client makes. Override any of
+    the methods, they do nothing by default.
+
+    Hooks run on the request path, so they should be quick. Exceptions
+    they raise are logged and otherwise ignored.
+    """
+    def before_request(self, event):
+        """
+        Called before an attempt is sent to a host
+
+        :param event: RequestEvent - without the response fields yet
+        """
+
+    def after_response(self, event):
+        """
+        Called once an attempt has completed, successfully or not. `status`
+        is None when the host never answered, with `error` set instead.
+
+        :param event: RequestEvent
+        """
+
+    def on_failover(self, event):
+        """
+        Called when a host failed an attempt and the request moves on to
+        the next host.
+
+        :param event: RequestEvent - the failed attempt
+        """
+
+    def on_retry(self, event):
+        """
+        Called when every host failed and the request is tried again after
+        reading the hosts from zookeeper.
+
+        :param event: RequestEvent - with no host, `attempt` is the number
+            of attempts made so far
+        """
+
+    def on_zookeeper_refresh(self, event):
+        """
+        Called when the hosts are read from zookeeper, or pushed by a watch
+
+        :param event: ZookeeperRefreshEvent
+        """
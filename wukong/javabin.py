@@ -0,0 +1,531 @@
+"""
+SOLR's native binary wire format, as written by
+`org.apache.solr.common.util.JavaBinCodec` (version 2).
+
+Responses decode to the same structures as the JSON responses read with
+`json.nl=map`: named lists become dicts, document lists become
+`{'numFound': ..., 'start': ..., 'docs': [...]}` and dates become the ISO
+strings the JSON writer produces, so either format can be used
+interchangeably.
+
+The codec is pure Python. It spares SOLR writing JSON and halves the bytes
+on the wire, but decodes slower than the C JSON parsers of `wukong.codec`,
+see benchmarks/bench_javabin.py.
+"""
+import datetime as dt
+import decimal
+import struct
+import uuid
+
+VERSION = 2
+
+CONTENT_TYPE = 'application/javabin'
+
+# Tags of the values, see JavaBinCodec
+NULL = 0
+BOOL_TRUE = 1
+BOOL_FALSE = 2
+BYTE = 3
+SHORT = 4
+DOUBLE = 5
+INT = 6
+LONG = 7
+FLOAT = 8
+DATE = 9
+MAP = 10
+SOLRDOC = 11
+SOLRDOCLST = 12
+BYTEARR = 13
+ITERATOR = 14
+END = 15
+SOLRINPUTDOC = 16
+MAP_ENTRY_ITER = 17
+ENUM_FIELD_VALUE = 18
+MAP_ENTRY = 19
+
+# Tags carrying a size or a small value in their low 5 bits
+STR = 1 << 5
+SINT = 2 << 5
+SLONG = 3 << 5
+ARR = 4 << 5
+ORDERED_MAP = 5 << 5
+NAMED_LST = 6 << 5
+EXTERN_STRING = 7 << 5
+
+# Key the JSON writer uses for child documents
+CHILD_DOCUMENTS = '_childDocuments_'
+
+_BYTE = struct.Struct('>b')
+_SHORT = struct.Struct('>h')
+_INT = struct.Struct('>i')
+_LONG = struct.Struct('>q')
+_FLOAT = struct.Struct('>f')
+_DOUBLE = struct.Struct('>d')
+
+_EPOCH = dt.datetime(1970, 1, 1)
+_MILLISECOND = dt.timedelta(milliseconds=1)
+
+# Marks the end of iterators
+_END = object()
+
+
+def _format_date(millis):
+    """
+    Format a date the way SOLR's JSON writer does
+    """
+    date = _EPOCH + dt.timedelta(milliseconds=millis)
+    text = '%04d-%02d-%02dT%02d:%02d:%02d' % (
+        date.year, date.month, date.day, date.hour, date.minute, date.second
+    )
+    if millis % 1000:
+        text += '.%03d' % (millis % 1000)
+    return text + 'Z'
+
+
+def _shortest_float(raw):
+    """
+    The shortest decimal that reads back as the same 32 bit float, like
+    Java's `Float.toString`, so 1.1f decodes to 1.1 rather than to
+    1.100000023841858
+    """
+    value = _FLOAT.unpack(raw)[0]
+    if value != value or value in (float('inf'), float('-inf')):
+        return value
+    for precision in (6, 7, 8, 9):
+        shortest = float('%.*g' % (precision, value))
+        if _FLOAT.pack(shortest) == raw:
+            return shortest
+    return value
+
+
+class _Decoder(object):
+
+    def __init__(self, data):
+        self.data = bytes(data)
+        self.pos = 0
+        self.strings = []
+
+    def read_byte(self):
+        tag = self.data[self.pos]
+        self.pos += 1
+        return tag
+
+    def read_vint(self):
+        data = self.data
+        pos = self.pos
+        byte = data[pos]
+        pos += 1
+        value = byte & 0x7f
+        shift = 7
+        while byte & 0x80:
+            byte = data[pos]
+            pos += 1
+            value |= (byte & 0x7f) << shift
+            shift += 7
+        self.pos = pos
+        return value
+
+    def read_size(self, tag):
+        size = tag & 0x1f
+        if size == 0x1f:
+            size += self.read_vint()
+        return size
+
+    def read_struct(self, fmt):
+        value = fmt.unpack_from(self.data, self.pos)[0]
+        self.pos += fmt.size
+        return value
+
+    def read_val(self):
+        tag = self.data[self.pos]
+        self.pos += 1
+        handler = _HANDLERS[tag]
+        if handler is None:
+            raise ValueError('Unknown javabin tag %s at %s' % (tag, self.pos - 1))
+        return handler(self, tag)
+
+    def read_pairs(self, size):
+        result = {}
+        for _ in range(size):
+            key = self.read_val()
+            result[key] = self.read_val()
+        return result
+
+    def read_until_end(self):
+        items = []
+        while True:
+            value = self.read_val()
+            if value is _END:
+                return items
+            items.append(value)
+
+    def read_str(self, tag):
+        size = self.read_size(tag)
+        start = self.pos
+        self.pos += size
+        return self.data[start:self.pos].decode('utf-8')
+
+    def read_small_int(self, tag):
+        value = tag & 0x0f
+        if tag & 0x10:
+            value |= self.read_vint() << 4
+        return value
+
+    def read_arr(self, tag):
+        return [self.read_val() for _ in range(self.read_size(tag))]
+
+    def read_named_list(self, tag):
+        return self.read_pairs(self.read_size(tag))
+
+    def read_extern_string(self, tag):
+        index = self.read_size(tag)
+        if index:
+            return self.strings[index - 1]
+        string = self.read_val()
+        self.strings.append(string)
+        return string
+
+    def read_null(self, tag):
+        return None
+
+    def read_true(self, tag):
+        return True
+
+    def read_false(self, tag):
+        return False
+
+    def read_byte_val(self, tag):
+        return self.read_struct(_BYTE)
+
+    def read_short(self, tag):
+        return self.read_struct(_SHORT)
+
+    def read_double(self, tag):
+        return self.read_struct(_DOUBLE)
+
+    def read_int(self, tag):
+        return self.read_struct(_INT)
+
+    def read_long(self, tag):
+        return self.read_struct(_LONG)
+
+    def read_float(self, tag):
+        start = self.pos
+        self.pos += 4
+        return _shortest_float(self.data[start:self.pos])
+
+    def read_date(self, tag):
+        return _format_date(self.read_struct(_LONG))
+
+    def read_map(self, tag):
+        return self.read_pairs(self.read_vint())
+
+    def read_solr_doc(self, tag):
+        # The fields come as an ordered map, children as nested documents
+        size = self.read_size(self.read_byte())
+        doc = {}
+        data = self.data
+        strings = self.strings
+        for _ in range(size):
+            tag = data[self.pos]
+            if tag > EXTERN_STRING and tag < EXTERN_STRING | 0x1f:
+                # A field name seen before, the common case
+                self.pos += 1
+                doc[strings[(tag & 0x1f) - 1]] = self.read_val()
+                continue
+            key = self.read_val()
+            if isinstance(key, dict):
+                doc.setdefault(CHILD_DOCUMENTS, []).append(key)
+                continue
+            doc[key] = self.read_val()
+        return doc
+
+    def read_solr_doc_list(self, tag):
+        header = self.read_val()
+        docs = self.read_val()
+        result = {'numFound': header[0], 'start': header[1]}
+        if header[2] is not None:
+            result['maxScore'] = header[2]
+        if len(header) > 3:
+            result['numFoundExact'] = header[3]
+        result['docs'] = docs
+        return result
+
+    def read_byte_array(self, tag):
+        size = self.read_vint()
+        start = self.pos
+        self.pos += size
+        return self.data[start:self.pos]
+
+    def read_iterator(self, tag):
+        return self.read_until_end()
+
+    def read_end(self, tag):
+        return _END
+
+    def read_solr_input_doc(self, tag):
+        size = self.read_vint()
+        self.read_val()  # document boost, ignored by SOLR
+        doc = {}
+        for _ in range(size):
+            key = self.read_val()
+            if isinstance(key, float):
+                # Field boost, ignored by SOLR as well
+                key = self.read_val()
+            elif isinstance(key, dict):
+                doc.setdefault(CHILD_DOCUMENTS, []).append(key)
+                continue
+            doc[key] = self.read_val()
+        return doc
+
+    def read_map_entry_iter(self, tag):
+        result = {}
+        while True:
+            key = self.read_val()
+            if key is _END:
+                return result
+            result[key] = self.read_val()
+
+    def read_enum(self, tag):
+        self.read_val()  # the ordinal
+        return self.read_val()
+
+    def read_map_entry(self, tag):
+        key = self.read_val()
+        return {key: self.read_val()}
+
+
+_HANDLERS = [None] * 256
+for _tag, _handler in [
+    (NULL, _Decoder.read_null),
+    (BOOL_TRUE, _Decoder.read_true),
+    (BOOL_FALSE, _Decoder.read_false),
+    (BYTE, _Decoder.read_byte_val),
+    (SHORT, _Decoder.read_short),
+    (DOUBLE, _Decoder.read_double),
+    (INT, _Decoder.read_int),
+    (LONG, _Decoder.read_long),
+    (FLOAT, _Decoder.read_float),
+    (DATE, _Decoder.read_date),
+    (MAP, _Decoder.read_map),
+    (SOLRDOC, _Decoder.read_solr_doc),
+    (SOLRDOCLST, _Decoder.read_solr_doc_list),
+    (BYTEARR, _Decoder.read_byte_array),
+    (ITERATOR, _Decoder.read_iterator),
+    (END, _Decoder.read_end),
+    (SOLRINPUTDOC, _Decoder.read_solr_input_doc),
+    (MAP_ENTRY_ITER, _Decoder.read_map_entry_iter),
+    (ENUM_FIELD_VALUE, _Decoder.read_enum),
+    (MAP_ENTRY, _Decoder.read_map_entry),
+]:
+    _HANDLERS[_tag] = _handler
+for _high, _handler in [
+    (STR, _Decoder.read_str),
+    (SINT, _Decoder.read_small_int),
+    (SLONG, _Decoder.read_small_int),
+    (ARR, _Decoder.read_arr),
+    (ORDERED_MAP, _Decoder.read_named_list),
+    (NAMED_LST, _Decoder.read_named_list),
+    (EXTERN_STRING, _Decoder.read_extern_string),
+]:
+    for _tag in range(_high, _high + 32):
+        _HANDLERS[_tag] = _handler
+
+
+class _Encoder(object):
+
+    def __init__(self):
+        self.buffer = bytearray([VERSION])
+        self.strings = {}
+
+    def write_vint(self, value):
+        buffer = self.buffer
+        while value & ~0x7f:
+            buffer.append((value & 0x7f) | 0x80)
+            value >>= 7
+        buffer.append(value)
+
+    def write_tag(self, tag, size):
+        if tag & 0xe0:
+            if size < 0x1f:
+                self.buffer.append(tag | size)
+            else:
+                self.buffer.append(tag | 0x1f)
+                self.write_vint(size - 0x1f)
+        else:
+            self.buffer.append(tag)
+            self.write_vint(size)
+
+    def write_str(self, value):
+        data = value.encode('utf-8')
+        self.write_tag(STR, len(data))
+        self.buffer.extend(data)
+
+    def write_extern_string(self, value):
+        """
+        Write a string repeated across the payload, like field names, only
+        once and refer back to it afterwards
+        """
+        index = self.strings.get(value)
+        if index is not None:
+            self.write_tag(EXTERN_STRING, index)
+            return
+        self.write_tag(EXTERN_STRING, 0)
+        self.strings[value] = len(self.strings) + 1
+        self.write_str(value)
+
+    def write_small(self, tag, value):
+        if value >= 0x0f:
+            self.buffer.append(tag | 0x10 | (value & 0x0f))
+            self.write_vint(value >> 4)
+        else:
+            self.buffer.append(tag | value)
+
+    def write_integer(self, value):
+        if 0 <= value <= 0x7fffffff:
+            self.write_small(SINT, value)
+        elif -0x80000000 <= value < 0:
+            self.buffer.append(INT)
+            self.buffer.extend(_INT.pack(value))
+        elif 0 <= value < 1 << 56:
+            self.write_small(SLONG, value)
+        elif -(1 << 63) <= value < 1 << 63:
+            self.buffer.append(LONG)
+            self.buffer.extend(_LONG.pack(value))
+        else:
+            raise ValueError('%s does not fit in a long' % value)
+
+    def write_double(self, value):
+        self.buffer.append(DOUBLE)
+        self.buffer.extend(_DOUBLE.pack(value))
+
+    def write_date(self, value):
+        if isinstance(value, dt.datetime):
+            if value.tzinfo is not None:
+                value = value.astimezone(dt.timezone.utc).replace(tzinfo=None)
+        else:
+            value = dt.datetime(value.year, value.month, value.day)
+        self.buffer.append(DATE)
+        self.buffer.extend(_LONG.pack((value - _EPOCH) // _MILLISECOND))
+
+    def write_key(self, key):
+        if isinstance(key, str):
+            self.write_extern_string(key)
+        else:
+            self.write_val(key)
+
+    def write_map(self, value):
+        self.write_tag(MAP, len(value))
+        for key, item in value.items():
+            self.write_key(key)
+            self.write_val(item)
+
+    def write_named_list(self, pairs):
+        self.write_tag(NAMED_LST, len(pairs))
+        for key, item in pairs:
+            self.write_key(key)
+            self.write_val(item)
+
+    def write_array(self, value):
+        self.write_tag(ARR, len(value))
+        for item in value:
+            self.write_val(item)
+
+    def write_val(self, value):
+        """
+        Write any value, the types `wukong.codec` serializes included.
+        Anything else is sent as null.
+        """
+        if value is None:
+            self.buffer.append(NULL)
+        elif value is True:
+            self.buffer.append(BOOL_TRUE)
+        elif value is False:
+            self.buffer.append(BOOL_FALSE)
+        elif isinstance(value, str):
+            self.write_str(value)
+        elif isinstance(value, int):
+            self.write_integer(value)
+        elif isinstance(value, float):
+            self.write_double(value)
+        elif isinstance(value, dict):
+            self.write_map(value)
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            self.write_array(value)
+        elif isinstance(value, (dt.datetime, dt.date)):
+            self.write_date(value)
+        elif isinstance(value, (bytes, bytearray)):
+            self.buffer.append(BYTEARR)
+            self.write_vint(len(value))
+            self.buffer.extend(value)
+        elif isinstance(value, decimal.Decimal):
+            self.write_double(float(value))
+        elif isinstance(value, uuid.UUID):
+            self.write_str(str(value))
+        else:
+            self.buffer.append(NULL)
+
+    def write_input_doc(self, doc):
+        children = doc.get(CHILD_DOCUMENTS) or []
+        fields = [
+            (name, value) for name, value in doc.items()
+            if name != CHILD_DOCUMENTS
+        ]
+        self.write_tag(SOLRINPUTDOC, len(fields) + len(children))
+        # The document boost, still expected although SOLR ignores it
+        self.buffer.append(FLOAT)
+        self.buffer.extend(_FLOAT.pack(1.0))
+        for name, value in fields:
+            self.write_extern_string(name)
+            self.write_val(value)
+        for child in children:
+            self.write_input_doc(child)
+
+
+def loads(data):
+    """
+    Decode a javabin payload
+
+    :param data: bytes - the body of a `wt=javabin` response
+    :raises ValueError: on anything that is not javabin
+    """
+    if not data:
+        raise ValueError('Empty javabin payload')
+    decoder = _Decoder(data)
+    version = decoder.read_byte()
+    if version != VERSION:
+        raise ValueError('Unsupported javabin version %s' % version)
+    try:
+        return decoder.read_val()
+    except (IndexError, TypeError, struct.error, UnicodeDecodeError) as e:
+        raise ValueError('Malformed javabin payload: %s' % e)
+
+
+def dumps(obj):
+    """
+    Encode a value to javabin, dicts as maps
+    """
+    encoder = _Encoder()
+    encoder.write_val(obj)
+    return bytes(encoder.buffer)
+
+
+def dumps_update(docs):
+    """
+    Encode documents as the body of a javabin update request, like SolrJ's
+    `JavaBinUpdateRequestCodec`. Child documents are read from
+    `_childDocuments_`, as in JSON updates.
+
+    :param docs: [dict] - the documents to add
+    """
+    encoder = _Encoder()
+    encoder.write_tag(NAMED_LST, 2)
+    # SOLR reads the params before the documents
+    encoder.write_extern_string('params')
+    encoder.write_named_list([])
+    encoder.write_extern_string('docs')
+    encoder.buffer.append(ITERATOR)
+    for doc in docs:
+        encoder.write_input_doc(doc)
+    encoder.buffer.append(END)
+    return bytes(encoder.buffer)
@@ -0,0 +1,352 @@
+import bisect
+import threading
+from collections import OrderedDict
+
+from wukong.hooks import RequestHooks
+
+# Upper bounds in seconds of the latency histogram buckets
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (
+            name,
+            str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        )
+        for name, value in labels
+    )
+
+
+class _Metric(object):
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        unknown = set(labels) - set(self.labelnames)
+        if unknown:
+            raise ValueError('Unknown labels for %s: %s' % (
+                self.name, ', '.join(sorted(unknown))
+            ))
+        return tuple(
+            '' if labels.get(name) is None else str(labels[name])
+            for name in self.labelnames
+        )
+
+    def _labels(self, key):
+        return list(zip(self.labelnames, key))
+
+    def clear(self):
+        with self._lock:
+            self._values = {}
+
+
+class Counter(_Metric):
+    """
+    A value that only goes up, per set of labels
+    """
+    type = 'counter'
+
+    def inc(self, value=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def to_dict(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            {'labels': dict(self._labels(key)), 'value': value}
+            for key, value in values
+        ]
+
+    def to_prometheus(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            '%s%s %s' % (
+                self.name,
+                _format_labels(self._labels(key)),
+                _format_value(value)
+            )
+            for key, value in values
+        ]
+
+
+class Histogram(_Metric):
+    """
+    The distribution of observed values, per set of labels, in cumulative
+    buckets as Prometheus expects them
+    """
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super(Histogram, self).__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total, count = self._values.get(
+                key,
+                ([0] * (len(self.buckets) + 1), 0.0, 0)
+            )
+            counts[index] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def _snapshot(self, counts, total, count):
+        cumulative = 0
+        buckets = OrderedDict()
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            buckets[bound] = cumulative
+        return {'buckets': buckets, 'sum': total, 'count': count}
+
+    def get(self, **labels):
+        with self._lock:
+            value = self._values.get(self._key(labels))
+            if value is None:
+                return None
+            counts, total, count = list(value[0]), value[1], value[2]
+        return self._snapshot(counts, total, count)
+
+    def _items(self):
+        with self._lock:
+            return sorted(
+                (key, (list(counts), total, count))
+                for key, (counts, total, count) in self._values.items()
+            )
+
+    def to_dict(self):
+        samples = []
+        for key, value in self._items():
+            sample = self._snapshot(*value)
+            sample['labels'] = dict(self._labels(key))
+            samples.append(sample)
+        return samples
+
+    def to_prometheus(self):
+        lines = []
+        for key, value in self._items():
+            labels = self._labels(key)
+            snapshot = self._snapshot(*value)
+            for bound, count in snapshot['buckets'].items():
+                lines.append('%s_bucket%s %s' % (
+                    self.name,
+                    _format_labels(labels + [('le', _format_value(bound))]),
+                    count
+                ))
+            lines.append('%s_sum%s %s' % (
+                self.name, _format_labels(labels), _format_value(snapshot['sum'])
+            ))
+            lines.append('%s_count%s %s' % (
+                self.name, _format_labels(labels), snapshot['count']
+            ))
+        return lines
+
+
+class MetricsRegistry(object):
+    """
+    A set of in-process metrics, exported as a dict or in the Prometheus
+    text format
+    """
+    def __init__(self):
+        self._metrics = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, metric_class, name, help, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = metric_class(name, help, labelnames, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, metric_class):
+                raise ValueError('%s is already a %s' % (name, metric.type))
+            return metric
+
+    def counter(self, name, help='', labelnames=()):
+        """
+        Get the counter called `name`, creating it when needed
+        """
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def histogram(self, name, help='', labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Get the histogram called `name`, creating it when needed
+        """
+        return self._get_or_create(
+            Histogram, name, help, labelnames, buckets=buckets
+        )
+
+    def get(self, name):
+        with self._lock:
+            return self._metrics.get(name)
+
+    def clear(self):
+        """
+        Reset every metric to zero
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+    def to_dict(self):
+        """
+        :returns dict: metric name to its type, help and samples
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return OrderedDict(
+            (metric.name, {
+                'type': metric.type,
+                'help': metric.help,
+                'samples': metric.to_dict(),
+            })
+            for metric in metrics
+        )
+
+    def to_prometheus(self):
+        """
+        :returns str: a snapshot in the Prometheus text exposition format
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append('# HELP %s %s' % (metric.name, metric.help))
+            lines.append('# TYPE %s %s' % (metric.name, metric.type))
+            lines.extend(metric.to_prometheus())
+        return '\n'.join(lines) + '\n'
+
+
+# Shared by every client in the process that is given it
+registry = MetricsRegistry()
+
+
+def record_docs_hydrated(metrics, collection, count):
+    metrics.counter(
+        'wukong_docs_hydrated_total',
+        'SOLR documents converted to models',
+        ('collection',)
+    ).inc(count, collection=collection)
+
+
+def record_docs_indexed(metrics, collection, count):
+    metrics.counter(
+        'wukong_docs_indexed_total',
+        'Models sent to SOLR for indexing',
+        ('collection',)
+    ).inc(count, collection=collection)
+
+
+class MetricsHooks(RequestHooks):
+    """
+    Record the traffic of one client in a metrics registry
+    """
+    def __init__(self, metrics, collection=None):
+        """
+        :param metrics: MetricsRegistry - where the metrics are recorded
+        :param collection: str - (Optional) the collection label
+        """
+        self.metrics = metrics
+        self.collection = collection
+        self.requests = metrics.counter(
+            'wukong_requests_total',
+            'Attempts sent to SOLR hosts, by status ("error" when the host never answered)',
+            ('collection', 'host', 'operation', 'status')
+        )
+        self.duration = metrics.histogram(
+            'wukong_request_duration_seconds',
+            'Wall time of the attempts sent to SOLR hosts',
+            ('collection', 'host', 'operation')
+        )
+        self.qtime = metrics.histogram(
+            'wukong_solr_qtime_seconds',
+            'Time SOLR reported spending on requests (QTime)',
+            ('collection', 'operation')
+        )
+        self.bytes_sent = metrics.counter(
+            'wukong_bytes_sent_total',
+            'Request body bytes sent to SOLR hosts',
+            ('collection', 'host', 'operation')
+        )
+        self.bytes_received = metrics.counter(
+            'wukong_bytes_received_total',
+            'Response body bytes received from SOLR hosts',
+            ('collection', 'host', 'operation')
+        )
+        self.failovers = metrics.counter(
+            'wukong_failovers_total',
+            'Requests moved on to another host after a failed attempt',
+            ('collection', 'host')
+        )
+        self.retries = metrics.counter(
+            'wukong_retries_total',
+            'Requests tried again after a zookeeper refresh',
+            ('collection',)
+        )
+        self.zookeeper_refreshes = metrics.counter(
+            'wukong_zookeeper_refreshes_total',
+            'SOLR host lists read from zookeeper',
+            ('collection', 'source', 'result')
+        )
+
+    def after_response(self, event):
+        labels = {
+            'collection': self.collection,
+            'host': event.host,
+            'operation': event.operation,
+        }
+        self.requests.inc(
+            status='error' if event.status is None else event.status,
+            **labels
+        )
+        if event.elapsed is not None:
+            self.duration.observe(event.elapsed, **labels)
+        if event.body_size:
+            self.bytes_sent.inc(event.body_size, **labels)
+        if event.response_size:
+            self.bytes_received.inc(event.response_size, **labels)
+        if event.qtime is not None:
+            self.qtime.observe(
+                event.qtime / 1000.0,
+                collection=self.collection,
+                operation=event.operation
+            )
+
+    def on_failover(self, event):
+        self.failovers.inc(collection=self.collection, host=event.host)
+
+    def on_retry(self, event):
+        self.retries.inc(collection=self.collection)
+
+    def on_zookeeper_refresh(self, event):
+        self.zookeeper_refreshes.inc(
+            collection=self.collection,
+            source='watch' if event.watch else 'poll',
+            result='success' if event.success else 'failure'
+        )
@@ -1,8 +1,13 @@
 from wukong.api import SolrAPI
 from wukong.query import SolrQueryManager
+from wukong.metrics import record_docs_hydrated, record_docs_indexed
 import wukong.errors as solr_errors
 from six import with_metaclass
 import re
+import threading
+
+# Guards creating the api of each model class, shared by every thread
+_solr_lock = threading.Lock()
 
 
 class SolrDocMetaClass(type):
@@ -16,15 +21,86 @@ class SolrDocMetaClass(type):
         Return a instance of SOLR api class.
         """
         if not hasattr(self, '_solr'):
-            self._solr = SolrAPI(
-                solr_hosts=self.solr_hosts,
-                solr_collection=self.collection_name,
-                zookeeper_hosts=self.zookeeper_hosts,
-                timeout=self.request_timeout,
-                zookeeper_timeout=self.zookeeper_timeout
-            )
+            with _solr_lock:
+                if not hasattr(self, '_solr'):
+                    self._solr = self._make_solr_api()
         return self._solr
 
+    def _make_solr_api(self):
+        return SolrAPI(
+            solr_hosts=self.solr_hosts,
+            solr_collection=self.collection_name,
+            zookeeper_hosts=self.zookeeper_hosts,
+            timeout=self.request_timeout,
+            zookeeper_timeout=self.zookeeper_timeout,
+            zookeeper_watch=self.zookeeper_watch,
+            host_selector=self.host_selector,
+            circuit_breakers=self.circuit_breakers,
+            hedge_delay=self.hedge_delay,
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+            compress_threshold=self.compress_threshold,
+            retry_policy=self.retry_policy,
+            route_updates=self.route_updates,
+            read_preference=self.read_preference,
+            timeouts=self.request_timeouts,
+            deadline=self.request_deadline,
+            hooks=self.request_hooks,
+            omit_header=self.omit_header,
+            metrics=self.metrics,
+            wire_format=self.wire_format,
+            coalesce_selects=self.coalesce_selects,
+            session_per_thread=self.session_per_thread
+        )
+
+    @property
+    def async_solr(self):
+        """
+        Return a instance of the asyncio SOLR api class.
+        """
+        if not hasattr(self, '_async_solr'):
+            with _solr_lock:
+                if not hasattr(self, '_async_solr'):
+                    self._async_solr = self._make_async_solr_api()
+        return self._async_solr
+
+    async def aclose(self):
+        """
+        Close the connections of the asyncio SOLR api class, e.g. before the
+        event loop it was used on is closed
+        """
+        if hasattr(self, '_async_solr'):
+            await self._async_solr.close()
+
+    def _make_async_solr_api(self):
+        from wukong.aio import AsyncSolrAPI
+
+        return AsyncSolrAPI(
+            solr_hosts=self.solr_hosts,
+            solr_collection=self.collection_name,
+            zookeeper_hosts=self.zookeeper_hosts,
+            timeout=self.request_timeout,
+            zookeeper_timeout=self.zookeeper_timeout,
+            zookeeper_watch=self.zookeeper_watch,
+            host_selector=self.host_selector,
+            circuit_breakers=self.circuit_breakers,
+            hedge_delay=self.hedge_delay,
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+            compress_threshold=self.compress_threshold,
+            retry_policy=self.retry_policy,
+            read_preference=self.read_preference,
+            timeouts=self.request_timeouts,
+            deadline=self.request_deadline,
+            hooks=self.request_hooks,
+            omit_header=self.omit_header,
+            metrics=self.metrics,
+            wire_format=self.wire_format,
+            coalesce_selects=self.coalesce_selects
+        )
+
     @property
     def documents(self):
         """
@@ -118,6 +194,7 @@ class SolrDocs(object):
             data.append(doc.get_data_for_solr())
 
         self.doc_class.solr.update(data)
+        self.doc_class._record_indexed(len(data))
 
         if commit:
             self.doc_class.solr.commit()
@@ -150,6 +227,25 @@ class SolrDoc(with_metaclass(SolrDocMetaClass, object)):
     collection_name = None
     request_timeout = 15
     zookeeper_timeout = 5
+    zookeeper_watch = False
+    host_selector = None
+    circuit_breakers = None
+    hedge_delay = None
+    pool_connections = 10
+    pool_maxsize = 10
+    pool_block = False
+    compress_threshold = None
+    retry_policy = None
+    route_updates = False
+    read_preference = None
+    request_timeouts = None
+    request_deadline = None
+    request_hooks = None
+    omit_header = True
+    metrics = None
+    wire_format = 'json'
+    coalesce_selects = False
+    session_per_thread = False
 
     @property
     def solr(self):
@@ -240,8 +336,16 @@ class SolrDoc(with_metaclass(SolrDocMetaClass, object)):
         for doc in json_docs:
             docs.append(cls(**doc))
 
+        if docs and cls.metrics is not None:
+            record_docs_hydrated(cls.metrics, cls.collection_name, len(docs))
+
         return docs
 
+    @classmethod
+    def _record_indexed(cls, count):
+        if cls.metrics is not None:
+            record_docs_indexed(cls.metrics, cls.collection_name, count)
+
     def __str__(self):
         return str(self.fields)
 
@@ -446,6 +550,7 @@ class SolrDoc(with_metaclass(SolrDocMetaClass, object)):
         solr_doc = self.get_data_for_solr()
 
         self.solr.update([solr_doc])
+        self._record_indexed(1)
         if commit:
             self.solr.commit()
 
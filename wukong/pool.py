@@ -0,0 +1,129 @@
+import logging
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+_sessions = {}
+_adapters = {}
+_lock = threading.Lock()
+# Sessions of each thread, over the shared adapters
+_local = threading.local()
+# The process the pools were opened in
+_pid = os.getpid()
+
+
+def _after_fork():
+    """
+    Forget the pools inherited from the parent process without closing
+    them, their sockets are still the parent's
+    """
+    global _lock, _local, _pid
+    _lock = threading.Lock()
+    _local = threading.local()
+    _pid = os.getpid()
+    _sessions.clear()
+    _adapters.clear()
+
+
+def _check_fork():
+    # For Pythons without os.register_at_fork
+    if _pid != os.getpid():
+        _after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def _get_key(hosts, pool_connections, pool_maxsize, pool_block):
+    if isinstance(hosts, str):
+        hosts = hosts.split(',')
+    return (frozenset(hosts), pool_connections, pool_maxsize, pool_block)
+
+
+def _make_session(adapter):
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _get_adapter(key):
+    # Called with _lock held
+    adapter = _adapters.get(key)
+    if adapter is None:
+        logger.debug('Creating connection pool for %s', ','.join(key[0]))
+        adapter = HTTPAdapter(
+            pool_connections=key[1],
+            pool_maxsize=key[2],
+            pool_block=key[3]
+        )
+        _adapters[key] = adapter
+    return adapter
+
+
+def get_session(hosts, pool_connections=10, pool_maxsize=10, pool_block=False):
+    """
+    Get the process-wide `requests.Session` for a set of hosts, so that every
+    client talking to the same cluster reuses the same keep-alive connections.
+
+    :param hosts: [(str)] The SOLR (or zookeeper) hosts identifying the cluster.
+    :param pool_connections: int - Number of per-host connection pools to cache. (Default: 10)
+    :param pool_maxsize: int - Maximum number of connections kept per host. (Default: 10)
+    :param pool_block: bool - Whether or not to wait for a free connection when
+        a host's pool is exhausted, instead of opening a throwaway one. (Default: False)
+
+    :returns requests.Session:
+    """
+    key = _get_key(hosts, pool_connections, pool_maxsize, pool_block)
+    _check_fork()
+
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _make_session(_get_adapter(key))
+            _sessions[key] = session
+
+    return session
+
+
+def get_thread_session(hosts, pool_connections=10, pool_maxsize=10,
+                       pool_block=False):
+    """
+    Get the `requests.Session` of the calling thread for a set of hosts. It
+    shares the connection pool of `get_session`, but not the cookies and
+    settings of a session, which requests does not make thread safe.
+
+    :returns requests.Session:
+    """
+    key = _get_key(hosts, pool_connections, pool_maxsize, pool_block)
+    _check_fork()
+    sessions = getattr(_local, 'sessions', None)
+    if sessions is None:
+        sessions = _local.sessions = {}
+
+    session = sessions.get(key)
+    if session is None or session.adapters['http://'] is not _adapters.get(key):
+        # New thread, or the pools were cleared since
+        with _lock:
+            session = _make_session(_get_adapter(key))
+        sessions[key] = session
+
+    return session
+
+
+def clear():
+    """
+    Close and forget every shared session and connection pool
+    """
+    with _lock:
+        adapters = list(_adapters.values())
+        _sessions.clear()
+        _adapters.clear()
+
+    for adapter in adapters:
+        adapter.close()
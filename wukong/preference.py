@@ -0,0 +1,77 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _matches(replica, prop, value):
+    if prop == 'replica.type':
+        return replica.type.upper() == value.upper()
+    if prop == 'replica.leader':
+        return replica.leader == (value.lower() == 'true')
+    return False
+
+
+class ReadPreference(object):
+    """
+    Order the hosts tried for reads by the replicas they hold, in the manner
+    of SOLR's `shards.preference`, e.g. to keep search traffic away from the
+    indexing leaders.
+
+    Rules are applied in order: hosts matching the first rule come first,
+    ties are broken by the next rule, and so on. Hosts matching no rule are
+    still tried last, so reads fall back to them when needed. A host holding
+    several replicas of the collection only matches a rule when all of them
+    do.
+
+    Supported rules are `replica.type:PULL|TLOG|NRT` and
+    `replica.leader:true|false`.
+    """
+    PROPERTIES = ('replica.type', 'replica.leader')
+
+    def __init__(self, *rules):
+        """
+        :param rules: str - rules such as `'replica.type:PULL'`, most
+            preferred first
+        """
+        self.rules = []
+        for rule in rules:
+            prop, _, value = rule.strip().partition(':')
+            if prop not in self.PROPERTIES or not value:
+                raise ValueError('Unsupported read preference: %s' % rule)
+            self.rules.append((prop, value))
+
+    @classmethod
+    def parse(cls, preference):
+        """
+        Build a preference from its `shards.preference` form, e.g.
+        `'replica.type:PULL,replica.type:TLOG'`
+        """
+        return cls(*[rule for rule in preference.split(',') if rule.strip()])
+
+    @property
+    def shards_preference(self):
+        """
+        The preference as a `shards.preference` param, so that SOLR applies
+        it to the sub-requests of distributed queries as well
+        """
+        return ','.join('%s:%s' % rule for rule in self.rules)
+
+    def _rank(self, replicas):
+        if not replicas:
+            # Nothing is known about the host, try it after all others
+            return (1,) * len(self.rules)
+        return tuple(
+            0 if all(_matches(replica, prop, value) for replica in replicas) else 1
+            for prop, value in self.rules
+        )
+
+    def order(self, hosts, replicas):
+        """
+        Sort hosts by preference. The sort is stable, so hosts of equal rank
+        keep the order chosen by the host selector.
+
+        :param hosts: list[str] - the candidate hosts, in order
+        :param replicas: dict - host to the list of replicas it holds
+        :returns: list[str]
+        """
+        return sorted(hosts, key=lambda host: self._rank(replicas.get(host)))
@@ -629,6 +629,23 @@ class SolrQueryManager(object):
 
         return SolrDocs(docs=self.doc_class.from_json_docs(result['docs']))
 
+    def stream(self, **extra):
+        """
+        Retrieve all matched documents from SOLR, reading the response and
+        converting the documents into SolrDocs one at a time. Use it for
+        large exports, memory use does not grow with the number of rows.
+
+        :return: an iterable of SolrDocs, which also exposes `total` and,
+            once every document has been read, `facets` and `stats`
+        :rtype: wukong.streaming.SolrStreamingResult
+        """
+        result = self.doc_class.solr.select(self.query, stream=True, **extra)
+        result.doc_class = self.doc_class
+        result.metrics = self.doc_class.metrics
+        result.collection = self.doc_class.collection_name
+
+        return result
+
     def one(self, **extra):
         """
         Get one document from SOLR and convert it into SolrDoc
@@ -643,4 +660,74 @@ class SolrQueryManager(object):
         if len(result['docs']) == 0:
             return None
 
-        return self.doc_class(**result['docs'][0])
+        return self.doc_class.from_json_docs(result['docs'][:1])[0]
+
+    async def araw(self, **extra):
+        """
+        Retrieve matched documents from SOLR in json format, using the
+        asyncio client
+
+        :return: documents from SOLR
+        :rtype: list of json
+        """
+        return await self.doc_class.async_solr.select(self.query, **extra)
+
+    async def agroups(self, **extra):
+        """
+        Awaitable version of `groups`
+
+        :return: document groups of SOLR documents
+        :rtype: dict
+        """
+        result = await self.araw(groups=True, **extra)
+
+        return result['groups']
+
+    async def afacets(self, **extra):
+        """
+        Awaitable version of `facets`
+
+        :return: facet counts of SOLR documents
+        :rtype: dict
+        """
+        result = await self.araw(facets=True, **extra)
+
+        return result['facets']
+
+    async def aall(self, **extra):
+        """
+        Awaitable version of `all`
+
+        :return: documents from SOLR
+        :rtype: list of SolrDoc
+        """
+        from wukong.models import SolrDocs
+
+        result = await self.araw(**extra)
+
+        return SolrDocs(docs=self.doc_class.from_json_docs(result['docs']))
+
+    async def aone(self, **extra):
+        """
+        Awaitable version of `one`
+
+        :return: one document from SOLR
+        :rtype: SolrDoc
+        """
+        new_query_manager = self.limit(1)
+
+        result = await new_query_manager.araw(**extra)
+
+        if len(result['docs']) == 0:
+            return None
+
+        return self.doc_class.from_json_docs(result['docs'][:1])[0]
+
+    async def aget(self, *args, **kwargs):
+        """
+        Awaitable version of `get`
+
+        :return: document from SOLR
+        :rtype: SolrDoc
+        """
+        return await self.filter(*args, **kwargs).aone()
@@ -1,11 +1,26 @@
 import logging
 
-from wukong.zookeeper import Zookeeper
+from wukong.zookeeper import (
+    get_zookeeper, _flatten_hosts, _flatten_replicas, _is_live, _node_name
+)
 from requests.exceptions import RequestException
-from wukong.errors import SolrError
-import requests
-import random
-import json
+from wukong.errors import SolrError, SolrDeadlineExceededError
+from wukong.balancer import RandomSelector
+from wukong.breaker import CircuitBreakerRegistry
+from wukong.retry import RetryPolicy
+from wukong.routing import ShardRouter
+from wukong.preference import ReadPreference
+from wukong.hooks import (
+    RequestEvent, ZookeeperRefreshEvent, _get_qtime, _get_size
+)
+from wukong.metrics import MetricsHooks
+from wukong import codec, javabin, pool
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import deque, namedtuple
+import functools
+import os
+import re
+import threading
 import time
 
 try:
@@ -15,20 +30,127 @@ except ImportError: # pragma: no cover
 
 logger = logging.getLogger(__name__)
 
+# Latency samples kept to compute the hedging delay percentile
+LATENCY_SAMPLES = 1000
+HEDGE_MIN_SAMPLES = 20
+# Most requests of hedged reads in flight at once per client. Reads coming
+# when they are all busy are sent without hedging rather than queued.
+HEDGE_WORKERS = 32
 
-def process_response(response):
+_PERCENTILE_RE = re.compile(r'^p\d+(\.\d+)?$')
+
+# The hosts requests go to and the replicas each of them holds. Replaced as
+# a whole, so a request never sees the hosts of one refresh with the
+# replicas of another.
+HostSnapshot = namedtuple('HostSnapshot', ['hosts', 'replicas'])
+
+
+def _check_hedge_delay(hedge_delay):
+    """
+    Fail early on a hedging delay that is neither seconds nor a percentile
+    such as 'p95'
+    """
+    if hedge_delay is None:
+        return
+    if isinstance(hedge_delay, str):
+        if (
+            _PERCENTILE_RE.match(hedge_delay) and
+            0 < float(hedge_delay[1:]) <= 100
+        ):
+            return
+    elif hedge_delay >= 0:
+        return
+    raise ValueError('Invalid hedge delay: %s' % hedge_delay)
+
+
+def _is_read(path, method):
+    """
+    Whether or not a request only reads from SOLR and is safe to duplicate
+    """
+    return method == 'GET' or path.rstrip('/').endswith('select')
+
+
+def _get_operation(path, params, body):
+    """
+    The kind of operation a request performs, to pick its timeout profile
+
+    :returns str: one of 'select', 'update', 'commit' or 'schema', or None
+    """
+    segments = path.strip('/').split('/')
+    if segments[-1] == 'select':
+        return 'select'
+    if 'schema' in segments:
+        return 'schema'
+    if 'update' in segments:
+        if body is None and (params or {}).get('commit') == 'true':
+            return 'commit'
+        return 'update'
+    return None
+
+
+def _cap_timeout(timeout, remaining):
+    """
+    Shorten a timeout, or a (connect, read) tuple, to the time remaining
+    """
+    if isinstance(timeout, tuple):
+        return tuple(min(value, remaining) for value in timeout)
+    return min(timeout, remaining)
+
+
+def _join_url(host, path):
+    return '/'.join(s.strip('/') for s in [host, path])
+
+
+def parse_response_content(content, wt='json'):
     try:
-        response_content = json.loads(response.text)
+        if wt == 'javabin':
+            response_content = javabin.loads(content)
+        else:
+            response_content = codec.loads(content)
     except Exception:
         logger.exception('Failed to parse solr text')
-        raise SolrError("Parsing Error: %s" % response.text)
+        if isinstance(content, bytes):
+            content = content.decode('utf-8', 'replace')
+        raise SolrError("Parsing Error: %s" % content)
 
     return response_content
 
 
+def _status_error(status_code, content, reason):
+    """
+    The error raised for a response that is not worth retrying, with the
+    message SOLR gave when there is one
+    """
+    message = reason
+    try:
+        message = codec.loads(content)['error']['msg']
+    except Exception:
+        pass
+    return SolrError(
+        'SOLR returned status %s: %s' % (status_code, message),
+        status_code=status_code
+    )
+
+
+def process_response(response, wt='json'):
+    # Parse the raw bytes, so requests never has to guess the charset and
+    # decode the whole body to str
+    return parse_response_content(response.content, wt)
+
+
 class SolrRequest(object):
     """
     Handle requests to SOLR and response from SOLR
+
+    An instance can be shared between threads. The hosts are swapped as one
+    immutable snapshot, and threads needing a zookeeper refresh at the same
+    time wait for a single refresh. Connection pools are shared and thread
+    safe. Use `session_per_thread` to also give each thread its own
+    `requests.Session`, whose cookies and settings are not thread safe.
+
+    An instance created before the process forks, e.g. by a pre-fork server
+    preloading the application, opens its own connections and zookeeper
+    session in the child. The hosts it knows are kept.
     """
 
     def __init__(
@@ -37,60 +159,422 @@ class SolrRequest(object):
         zookeeper_hosts=None,
         timeout=15,
         refresh_frequency=2,
-        zookeeper_timeout=5
+        zookeeper_timeout=5,
+        zookeeper_watch=False,
+        collection=None,
+        host_selector=None,
+        circuit_breakers=None,
+        hedge_delay=None,
+        pool_connections=10,
+        pool_maxsize=10,
+        pool_block=False,
+        retry_policy=None,
+        read_preference=None,
+        timeouts=None,
+        deadline=None,
+        hooks=None,
+        omit_header=True,
+        metrics=None,
+        session_per_thread=False
     ):
         """
         Initialize our Request interface instance.
             :param solr_hosts: [(str)] List of SOLR hostnames.
             :param zookeeper_hosts: [(str)] (Optional) List of zookeeper hostnames.
-            :param timeout: int - Timeout in seconds for requests to SOLR. (Default: 15s) 
+            :param timeout: int|tuple - Timeout in seconds for requests to SOLR, or a (connect, read)
+                tuple. (Default: 15s)
             :param refresh_frequency: int - Frequency in minutes to refresh the SOLR hostnames from zookeeper 
                 (time since the last refresh, but synchronous with a request).(Default: 2m)
             :param zookeeper_timeout: int - Timeout in seconds for requests to SOLR (Default: 5s)
+            :param zookeeper_watch: bool - Keep a zookeeper session open and watch the cluster state
+                in the background instead of refreshing on the request path. (Default: False)
+            :param collection: str - (Optional) Name of the SOLR collection or alias served by this instance.
+                When set, only nodes holding an active replica of it are used.
+            :param host_selector: HostSelector - (Optional) Strategy deciding the order in which hosts are
+                tried, see `wukong.balancer`. (Default: RandomSelector)
+            :param circuit_breakers: CircuitBreakerRegistry - (Optional) Per host circuit breakers used to
+                quarantine failing hosts, see `wukong.breaker`. (Default: open after 5 failures for 30s)
+            :param hedge_delay: float|str - (Optional) Seconds to wait for a read before sending a duplicate
+                request to a second host, or a percentile of the observed latency such as 'p95'.
+                Duplicates are paid from the retry budget. Writes are never hedged. (Default: no hedging)
+            :param pool_connections: int - Number of per-host connection pools to cache. (Default: 10)
+            :param pool_maxsize: int - Maximum number of connections kept per host. (Default: 10)
+            :param pool_block: bool - Wait for a free connection when a host's pool is exhausted. (Default: False)
+                Clients of the same cluster with the same pool settings share one connection pool.
+            :param retry_policy: RetryPolicy - (Optional) Which failures are retried on another host, how
+                many times and with what backoff, see `wukong.retry`. A 4xx response is never retried.
+                (Default: 5xx and connection errors, within the process-wide retry budget)
+            :param read_preference: ReadPreference|str - (Optional) Replicas to send reads to first, such as
+                'replica.type:PULL,replica.leader:false', see `wukong.preference`. Also forwarded to SOLR
+                as `shards.preference`. Requires zookeeper hosts. (Default: no preference)
+            :param timeouts: dict - (Optional) Timeouts overriding `timeout` per operation, keyed by
+                'select', 'update', 'commit' or 'schema', e.g. {'select': (1, 3), 'update': (3, 120)}.
+            :param deadline: float - (Optional) Seconds a call may take in total, failover included.
+                Can be overridden per call, and is forwarded to SOLR as `timeAllowed` for selects.
+                (Default: no deadline)
+            :param hooks: [RequestHooks] - (Optional) Observers of every attempt, failover, retry and
+                zookeeper refresh, see `wukong.hooks`.
+            :param omit_header: bool - Ask SOLR to leave the response header out. The header holds the
+                QTime reported to the hooks. (Default: True)
+            :param metrics: MetricsRegistry - (Optional) Registry recording the traffic of this client,
+                such as `wukong.metrics.registry`. (Default: no metrics)
+            :param session_per_thread: bool - Give each thread its own `requests.Session` over the shared
+                connection pool. (Default: False, one session shared by every thread)
         """
-        self.client = requests.Session()
-        self.master_hosts = solr_hosts
+        # The process the connections and the zookeeper session belong to
+        self._pid = os.getpid()
+        self._hosts = HostSnapshot(tuple(solr_hosts), {})
+        self._make_locks()
+        self._refresh_count = 0
+        self._refresh_success = False
+        # Set when a node joined the cluster, see `_on_live_nodes_change`
+        self._refresh_due = False
+        self._live_nodes = None
+        self._watching_live_nodes = False
         self.zookeeper_hosts = zookeeper_hosts
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.session_per_thread = session_per_thread
+        self._pool_hosts = zookeeper_hosts or solr_hosts
+        self.client = self._make_client()
         self.refresh_frequency = refresh_frequency  # minutes
         self.servers = []
         self.timeout = timeout
+        self.timeouts = dict(timeouts or {})
+        self.deadline = deadline
+        self.hooks = list(hooks or [])
+        self.omit_header = omit_header
+        self.metrics = metrics
         self._zookeeper = None
         self._last_request = None
         self.zookeeper_timeout = zookeeper_timeout
-        self.attempt_zookeeper_refresh()
+        self.collection = collection
+        if metrics is not None:
+            self.hooks.append(MetricsHooks(metrics, collection))
+        self.host_selector = host_selector or RandomSelector()
+        self.circuit_breakers = circuit_breakers or CircuitBreakerRegistry()
+        _check_hedge_delay(hedge_delay)
+        self.hedge_delay = hedge_delay
+        self._hedge_executor = None
+        self.retry_policy = retry_policy or RetryPolicy()
+        if isinstance(read_preference, str):
+            read_preference = ReadPreference.parse(read_preference)
+        self.read_preference = read_preference
+        # Latency of successful reads, for the hedging delay percentile
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._shard_router = None
+        self.watching = False
+        if zookeeper_watch and self.zookeeper:
+            self.watching = self.zookeeper.watch(self._on_hosts_change)
+        if not self.watching:
+            self.attempt_zookeeper_refresh()
+
+    def _make_locks(self):
+        # Guards creating the zookeeper client
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._router_lock = threading.Lock()
+        # Threads of the hedging pool free to take a request
+        self._hedge_slots = threading.BoundedSemaphore(HEDGE_WORKERS)
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            self._after_fork()
+
+    def _after_fork(self):
+        """
+        Drop what a forked process must not share with its parent: the
+        connections, the zookeeper session and the threads, along with locks
+        they may have held. The hosts, replicas and shard router are kept.
+        """
+        logger.debug('Process forked, opening new SOLR connections')
+        self._pid = os.getpid()
+        self._make_locks()
+        # Stopping it would close the parent's zookeeper session
+        self._zookeeper = None
+        self._watching_live_nodes = False
+        self._hedge_executor = None
+        self.client = self._make_client()
+        if self.watching:
+            self.watching = self.zookeeper.watch(self._on_hosts_change)
+
+    def _make_client(self):
+        return pool.get_session(
+            self._pool_hosts,
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block
+        )
+
+    @property
+    def client(self):
+        self._check_fork()
+        if self.session_per_thread:
+            return pool.get_thread_session(
+                self._pool_hosts,
+                pool_connections=self.pool_connections,
+                pool_maxsize=self.pool_maxsize,
+                pool_block=self.pool_block
+            )
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
 
     @property
     def zookeeper(self):
+        self._check_fork()
         if self._zookeeper is None and self.zookeeper_hosts:
-            self._zookeeper = Zookeeper(
-                self.zookeeper_hosts,
-                self.zookeeper_timeout
-            )
+            with self._lock:
+                if self._zookeeper is None:
+                    self._zookeeper = get_zookeeper(
+                        self.zookeeper_hosts,
+                        self.zookeeper_timeout
+                    )
         return self._zookeeper
 
+    @property
+    def master_hosts(self):
+        return list(self._hosts.hosts)
+
+    @master_hosts.setter
+    def master_hosts(self, hosts):
+        self._hosts = HostSnapshot(tuple(hosts), self._hosts.replicas)
+
+    @property
+    def replicas(self):
+        """
+        The replicas held by each host, only tracked for the read preference
+        """
+        return self._hosts.replicas
+
     @property
     def current_hosts(self):
         return self.master_hosts
 
-    def attempt_zookeeper_refresh(self):
-        if self.zookeeper:
-            logger.debug('Fetching solr hosts from zookeeper')
-            try:
+    def _on_hosts_change(self, host_table):
+        hosts = _flatten_hosts(host_table, self.collection)
+        if hosts:
+            logger.info('Zookeeper watch updated solr nodes: %s', ','.join(hosts))
+        else:
+            logger.error('Zookeeper watch reporting all SOLR nodes as down')
+        if self.read_preference is not None:
+            self._set_replicas(_flatten_replicas(
+                self.zookeeper.replica_table,
+                self.collection
+            ))
+        else:
+            self.master_hosts = hosts
+        # Leaders may have moved along with the hosts
+        self._shard_router = None
+        if self.hooks:
+            self._emit('on_zookeeper_refresh', ZookeeperRefreshEvent(
+                list(self.master_hosts),
+                success=bool(self.master_hosts),
+                watch=True
+            ))
+
+    def _on_live_nodes_change(self, live_nodes):
+        """
+        Drop the hosts whose node left the cluster right away, instead of
+        waiting for the next refresh, and refresh on the next request when
+        a node joined it
+        """
+        if self._live_nodes is not None and live_nodes - self._live_nodes:
+            self._refresh_due = True
+        self._live_nodes = live_nodes
+
+        snapshot = self._hosts
+        hosts = []
+        for host in snapshot.hosts:
+            replicas = snapshot.replicas.get(host)
+            if replicas:
+                live = _is_live(replicas[0], live_nodes)
+            else:
+                live = _node_name(host) in live_nodes
+            if live:
+                hosts.append(host)
+
+        if len(hosts) == len(snapshot.hosts):
+            return
+
+        logger.info(
+            'Zookeeper reporting solr nodes down: %s',
+            ','.join(set(snapshot.hosts) - set(hosts))
+        )
+        self._hosts = HostSnapshot(tuple(hosts), dict(
+            (host, snapshot.replicas[host])
+            for host in hosts
+            if host in snapshot.replicas
+        ))
+        # Leaders may have moved along with the hosts
+        self._shard_router = None
+        if self.hooks:
+            self._emit('on_zookeeper_refresh', ZookeeperRefreshEvent(
+                list(hosts),
+                success=bool(hosts),
+                watch=True
+            ))
+
+    def attempt_zookeeper_refresh(self, since=None):
+        """
+        Read the SOLR hosts from zookeeper. Threads asking while a refresh
+        is running wait for it and share its outcome instead of reading
+        zookeeper again.
+
+        :param since: int - (Optional) the refresh count the caller last saw.
+            When another thread refreshed since, its outcome is returned
+            instead of refreshing again.
+        :returns: whether or not any host was found
+        """
+        if not self.zookeeper:
+            return False
+
+        if since is None:
+            since = self._refresh_count
+        with self._refresh_lock:
+            if self._refresh_count != since:
+                return self._refresh_success
+            success = self._refresh_hosts()
+            self._refresh_success = success
+            # Not due again until the refresh frequency has passed. Set
+            # before counting the refresh, for threads checking both.
+            self._last_request = time.time()
+            self._refresh_count += 1
+            return success
+
+    def _refresh_hosts(self):
+        logger.debug('Fetching solr hosts from zookeeper')
+        self._shard_router = None
+        self._refresh_due = False
+        start = time.time()
+        try:
+            if self.read_preference is not None:
+                if self.collection is not None:
+                    self._set_replicas(self.zookeeper.get_active_replicas(
+                        collection_name=self.collection
+                    ))
+                else:
+                    self._set_replicas(self.zookeeper.get_active_replicas())
+            elif self.collection is not None:
+                self.master_hosts = self.zookeeper.get_active_hosts(
+                    collection_name=self.collection
+                )
+            else:
                 self.master_hosts = self.zookeeper.get_active_hosts()
-                logger.info(
-                    'Got solr nodes from zookeeper: %s',
-                    ','.join(self.master_hosts)
+            logger.info(
+                'Got solr nodes from zookeeper: %s',
+                ','.join(self.master_hosts)
+            )
+            if not self.master_hosts:
+                logger.error('Unable to find any solr nodes to make requests to. Zookeeper reporting all SOLR nodes as down')
+            success = bool(self.master_hosts)
+            if success and not self._watching_live_nodes:
+                # Hear about nodes leaving between refreshes
+                self._watching_live_nodes = self.zookeeper.watch_live_nodes(
+                    self._on_live_nodes_change
                 )
-                if not self.master_hosts:
-                    logger.error('Unable to find any solr nodes to make requests to. Zookeeper reporting all SOLR nodes as down')
-                return bool(self.master_hosts)
+        except Exception:
+            logger.exception('Failing to retrieve new SOLR hosts from zookeeper')
+            success = False
+
+        if self.hooks:
+            self._emit('on_zookeeper_refresh', ZookeeperRefreshEvent(
+                list(self.master_hosts),
+                elapsed=time.time() - start,
+                success=success
+            ))
+        return success
+
+    def _emit(self, name, event):
+        """
+        Call the `name` method of every hook with `event`
+        """
+        for hook in self.hooks:
+            try:
+                getattr(hook, name)(event)
             except Exception:
-                logger.exception('Failing to retrieve new SOLR hosts from zookeeper')
-        return False
+                logger.exception('SOLR request hook %s failed', name)
 
-    def request(self, path, params, method, body=None, headers=None, is_retry=False):
+    def _start_event(self, event, host, path, method, params, body):
         """
-        Prepare data and send request to SOLR servers
+        The event of an attempt about to be sent, or None without hooks
+        """
+        if not self.hooks:
+            return None
+        if event is None:
+            event = RequestEvent(host, path, method)
+        event.host = host
+        event.operation = _get_operation(path, params, body)
+        event.body_size = _get_size(body)
+        self._emit('before_request', event)
+        return event
+
+    def _finish_event(self, event, elapsed, status=None, content=None,
+                      size=None, error=None):
+        """
+        Fill in the outcome of an attempt and hand it to the hooks
+        """
+        if event is None:
+            return
+        event.elapsed = elapsed
+        event.status = status
+        event.error = error
+        if content is not None:
+            event.response_size = len(content)
+            event.qtime = _get_qtime(content)
+        else:
+            event.response_size = size
+        self._emit('after_response', event)
+
+    def _set_replicas(self, replicas):
+        """
+        Use the hosts of the given replicas, and remember which replicas
+        each host holds
+        """
+        by_host = {}
+        for replica in replicas:
+            by_host.setdefault(replica.base_url, []).append(replica)
+        self._hosts = HostSnapshot(tuple(by_host), by_host)
+
+    def get_shard_router(self, refresh=False):
+        """
+        The router mapping documents of our collection to their shard
+        leaders, built from the collection state in zookeeper and kept until
+        the hosts are refreshed.
+
+        :param refresh: bool - read the collection state again, e.g. after a
+            leader stopped answering
+        :returns ShardRouter: or None when updates cannot be routed
+        """
+        if not self.zookeeper or self.collection is None:
+            return None
+
+        router = self._shard_router
+        if router is not None and not refresh:
+            return router
+
+        with self._router_lock:
+            if self._shard_router is not None and self._shard_router is not router:
+                # Rebuilt by another thread while we waited
+                return self._shard_router
+            try:
+                state = self.zookeeper.get_collection_state(self.collection)
+            except Exception:
+                logger.exception('Failing to retrieve the collection state from zookeeper')
+                state = None
+            self._shard_router = ShardRouter.from_state(state)
+            return self._shard_router
+
+    def _prepare_request(self, params, headers, read=False):
+        """
+        Merge the caller's params and headers over our defaults
+
+        :param read: bool - whether or not the request only reads
+
+        :returns: tuple(dict, dict) of the params and the headers
         """
         request_headers = {
             'content-type': 'application/json',
@@ -100,82 +584,498 @@ class SolrRequest(object):
 
         request_params = {
             'wt': 'json',
-            'omitHeader': 'true',
+            'omitHeader': 'true' if self.omit_header else 'false',
             'json.nl': 'map'
         }
+        if read and self.read_preference is not None:
+            request_params['shards.preference'] = (
+                self.read_preference.shards_preference
+            )
         if params:
             request_params.update(params)
 
-        # Refresh our list of hosts
-        should_refresh = (
+        return request_params, request_headers
+
+    def _should_refresh(self, is_retry):
+        """
+        Whether or not our list of hosts is due a refresh from zookeeper
+        """
+        return bool(
             self.zookeeper and
+            not self.watching and
             not is_retry and
             self._last_request and
-            ((time.time() - self._last_request) / 60) > self.refresh_frequency
+            (
+                self._refresh_due or
+                ((time.time() - self._last_request) / 60) > self.refresh_frequency
+            )
         )
-        if should_refresh:
-            self.attempt_zookeeper_refresh()
 
-        response = None
-        for host in random.sample(self.master_hosts, len(self.master_hosts)):
-            full_path = '/'.join(s.strip('/') for s in [host, path])
-            try:
-                logger.debug('Sending request to solr. route="%s"', full_path)
+    def _get_hosts(self, read=False):
+        """
+        The hosts to try for one request, in order
 
-                self._last_request = time.time()
+        :param read: bool - whether or not the request only reads, reads
+            follow the read preference
+        """
+        # One snapshot for the whole request, the hosts may be swapped meanwhile
+        snapshot = self._hosts
+        hosts = self.host_selector.order(list(snapshot.hosts))
+        if read and self.read_preference is not None:
+            hosts = self.read_preference.order(hosts, snapshot.replicas)
+        return self.circuit_breakers.order(hosts)
+
+    def _record_failure(self, host, elapsed):
+        """
+        Account for a request to `host` that never got a response
+        """
+        self.host_selector.finish(host, elapsed, False)
+        self.circuit_breakers.record_failure(host)
+        logger.info(
+            'Failed to connect to SOLR',
+            exc_info=True
+        )
 
-                response = self.client.request(
-                    method,
-                    full_path,
-                    params=request_params,
-                    headers=request_headers,
-                    data=body,
-                    timeout=self.timeout
+    def _record_response(self, host, elapsed, status_code, read=False):
+        """
+        Account for a response from `host`
+
+        :param read: bool - whether or not the request only read. Only the
+            latency of reads counts towards the hedging delay, slow updates
+            would keep reads from ever being hedged.
+        :returns: whether or not the response was successful
+        """
+        self.host_selector.finish(host, elapsed, status_code == 200)
+        if status_code >= 500:
+            self.circuit_breakers.record_failure(host)
+        else:
+            self.circuit_breakers.record_success(host)
+
+        if status_code != 200:
+            return False
+
+        if read:
+            self._latencies.append(elapsed)
+        return True
+
+    def _get_timeout(self, path, params, body):
+        """
+        The timeout of a request, from the profile of its operation
+        """
+        return self.timeouts.get(
+            _get_operation(path, params, body),
+            self.timeout
+        )
+
+    def _send(self, host, method, path, params, headers, body, stream=False,
+              timeout=None, event=None):
+        """
+        Send one request to one SOLR host
+
+        :param event: RequestEvent - (Optional) the event of this attempt,
+            filled in for the hooks
+        :returns: the response if the host answered successfully, or None
+        """
+        full_path = _join_url(host, path)
+        # Only ask for a streamed body when we need one
+        extra = {'stream': True} if stream else {}
+        event = self._start_event(event, host, path, method, params, body)
+        self.host_selector.start(host)
+        start = time.time()
+        try:
+            logger.debug('Sending request to solr. route="%s"', full_path)
+
+            self._last_request = start
+
+            response = self.client.request(
+                method,
+                full_path,
+                params=params,
+                headers=headers,
+                data=body,
+                timeout=self.timeout if timeout is None else timeout,
+                **extra
+            )
+        except RequestException as e:
+            elapsed = time.time() - start
+            self._record_failure(host, elapsed)
+            self._finish_event(event, elapsed, error=e)
+            return None
+
+        elapsed = time.time() - start
+        logger.debug(
+            'Retrieved response from SOLR. route="%s" status_code="%s"',
+            full_path,
+            response.status_code
+        )
+
+        if event is not None:
+            if stream:
+                # The body is not read yet
+                length = response.headers.get('Content-Length')
+                self._finish_event(
+                    event,
+                    elapsed,
+                    response.status_code,
+                    size=int(length) if length else None
                 )
+            else:
+                self._finish_event(
+                    event,
+                    elapsed,
+                    response.status_code,
+                    content=response.content
+                )
+
+        if self._record_response(host, elapsed, response.status_code,
+                                 _is_read(path, method)):
+            return response
 
-                logger.debug(
-                    'Retrieved response from SOLR. route="%s" status_code="%s"',
-                    full_path,
-                    response.status_code
+        logger.info(
+            'Unsucessful request to SOLR'
+            'status_code="%s" reason="%s"',
+            response.status_code,
+            response.reason
+        )
+        try:
+            if not self.retry_policy.is_retryable(response.status_code):
+                # The request itself is wrong, every other host would refuse it too
+                raise _status_error(
+                    response.status_code,
+                    response.content,
+                    response.reason
                 )
+        finally:
+            if stream:
+                # Nobody reads this response, give its connection back to the pool
+                response.close()
+        return None
 
-                if response.status_code == 200:
-                    # We've had a successful request. No need to keep trying
-                    break
-                else:
-                    logger.info(
-                        'Unsucessful request to SOLR'
-                        'status_code="%s" reason="%s"',
-                        response.status_code,
-                        response.reason
+    def _get_hedge_delay(self, path, method):
+        """
+        How long to wait for the first host before hedging, or None when the
+        request must not be hedged. Only reads are ever hedged.
+        """
+        if self.hedge_delay is None or not _is_read(path, method):
+            return None
+
+        if not isinstance(self.hedge_delay, str):
+            return self.hedge_delay
+
+        # A percentile of the observed latency, e.g. 'p95'
+        latencies = sorted(self._latencies)
+        if len(latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        percentile = float(self.hedge_delay[1:]) / 100
+        return latencies[min(int(len(latencies) * percentile), len(latencies) - 1)]
+
+    @property
+    def hedge_executor(self):
+        if self._hedge_executor is None:
+            with self._lock:
+                if self._hedge_executor is None:
+                    self._hedge_executor = ThreadPoolExecutor(
+                        max_workers=HEDGE_WORKERS
                     )
-                    response = None
+        return self._hedge_executor
+
+    def _submit_hedged(self, send, host):
+        """
+        Send a request to `host` on the hedging pool, unless every thread
+        of the pool is busy
+
+        :returns Future: the outcome of the request, or None
+        """
+        slots = self._hedge_slots
+        if not slots.acquire(False):
+            return None
+        future = self.hedge_executor.submit(send, host)
+        future.add_done_callback(lambda _: slots.release())
+        return future
+
+    def _hedge_allowed(self, backup):
+        """
+        Whether or not a duplicate request may be sent to `backup`. Hedges
+        are paid from the retry budget, so that they cannot multiply the
+        load on a slow cluster.
+        """
+        if not self.retry_policy.budget.withdraw():
+            logger.warning('SOLR retry budget exhausted, not hedging. host="%s"', backup)
+            return False
+        return self.circuit_breakers.record_attempt(backup)
+
+    def _send_hedged(self, send, primary, backup, delay):
+        """
+        Send the request to `primary`, and to `backup` as well if `primary`
+        has not answered within `delay` seconds. The first successful
+        response wins, the other one is ignored.
+
+        :returns: tuple of the response or None, and whether or not the
+            request was sent to `backup`
+        """
+        first = self._submit_hedged(send, primary)
+        if first is None:
+            logger.debug('SOLR hedging pool busy, not hedging request')
+            return send(primary), False
+
+        pending = set([first])
+        done, pending = wait(pending, timeout=delay)
+        for future in done:
+            if future.result() is not None:
+                return future.result(), False
+
+        second = None
+        if self._hedge_allowed(backup):
+            logger.debug('Hedging request to solr. host="%s"', backup)
+            second = self._submit_hedged(send, backup)
+        if second is not None:
+            pending.add(second)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.result() is not None:
+                    return future.result(), second is not None
+        return None, second is not None
+
+    def _next_attempt(self, send, attempts, expires, time_allowed=False):
+        """
+        Account for an attempt about to be made, and fit it in the deadline
+
+        :param send: the partial sending the request to a host
+        :param attempts: int - attempts already made for this request
+        :param expires: float - (Optional) when the deadline of the request
+            is up, as a timestamp
+        :param time_allowed: bool - forward the time remaining to SOLR as
+            `timeAllowed`
+        :returns: None if the attempt must not be made, or a tuple of the
+            partial to call and the seconds to wait before calling it
+        """
+        if expires is not None and time.time() >= expires:
+            return None
+
+        delay = self.retry_policy.retry_delay(attempts)
+        if delay is None:
+            return None
+        if expires is None:
+            return send, delay
+
+        remaining = expires - time.time() - delay
+        if remaining <= 0:
+            logger.info('SOLR request deadline reached after %s attempts', attempts)
+            return None
+
+        extra = {'timeout': _cap_timeout(send.keywords['timeout'], remaining)}
+        if time_allowed and 'timeAllowed' not in send.keywords['params']:
+            extra['params'] = dict(
+                send.keywords['params'],
+                timeAllowed=int(remaining * 1000)
+            )
+        return functools.partial(send, **extra), delay
 
-            except RequestException:
-                response = None
-                logger.info(
-                    'Failed to connect to SOLR',
-                    exc_info=True
+    def _try_hosts(self, send, path, method, stream, attempts, expires=None):
+        """
+        Try every host in turn until one answers, as long as the retry
+        policy and the deadline allow it
+
+        :param attempts: int - attempts already made for this request
+        :param expires: float - (Optional) when the deadline is up
+        :returns: tuple of the response or None, and the number of attempts
+            made so far
+        """
+        hosts = self._get_hosts(_is_read(path, method))
+        time_allowed = _get_operation(path, None, None) == 'select'
+        response = None
+
+        # A streamed loser would hold on to its connection, never hedge those
+        hedge_delay = None if stream else self._get_hedge_delay(path, method)
+        if (
+            hedge_delay is not None and
+            len(hosts) > 1 and
+            self.circuit_breakers.record_attempt(hosts[0])
+        ):
+            attempt = self._next_attempt(send, attempts, expires, time_allowed)
+            if attempt is None:
+                return None, attempts
+            attempt_send, delay = attempt
+            if delay:
+                time.sleep(delay)
+            attempts += 1
+            response, hedged = self._send_hedged(
+                attempt_send,
+                hosts[0],
+                hosts[1],
+                hedge_delay
+            )
+            hosts = hosts[2 if hedged else 1:]
+
+        hosts = list(hosts)
+        last_resort = set()
+        for index, host in enumerate(hosts):
+            if response is not None:
+                # We've had a successful request. No need to keep trying
+                break
+            if (
+                host not in last_resort and
+                not self.circuit_breakers.record_attempt(host)
+            ):
+                # Quarantined, or its probe is in flight for another request:
+                # only tried once every other host failed
+                last_resort.add(host)
+                hosts.append(host)
+                continue
+            attempt = self._next_attempt(send, attempts, expires, time_allowed)
+            if attempt is None:
+                break
+            attempt_send, delay = attempt
+            if delay:
+                time.sleep(delay)
+            event = self._new_event(path, method, attempts)
+            attempts += 1
+            response = attempt_send(host, event=event)
+            if response is None and event is not None and index + 1 < len(hosts):
+                self._emit('on_failover', event)
+
+        return response, attempts
+
+    def _new_event(self, path, method, attempts):
+        if not self.hooks:
+            return None
+        return RequestEvent(None, path, method, attempt=attempts)
+
+    def _get_expiry(self, deadline):
+        """
+        :returns float: when the deadline of a call starting now is up, or
+            None when it has none
+        """
+        if deadline is None:
+            deadline = self.deadline
+        if deadline is None:
+            return None
+        return time.time() + deadline
+
+    def _unable_to_fetch(self, expires, deadline):
+        if expires is not None and time.time() >= expires:
+            return SolrDeadlineExceededError(
+                deadline if deadline is not None else self.deadline
+            )
+        return SolrError('Unable to fetch from any SOLR nodes')
+
+    def request(self, path, params, method, body=None, headers=None, is_retry=False,
+                stream=False, deadline=None):
+        """
+        Prepare data and send request to SOLR servers
+
+        With `stream`, the `requests.Response` is returned unread instead of
+        the parsed body, see `wukong.streaming`.
+
+        `deadline` caps the seconds spent on the call, every attempt
+        included, over the client's default.
+        """
+        expires = self._get_expiry(deadline)
+        request_params, request_headers = self._prepare_request(
+            params,
+            headers,
+            _is_read(path, method)
+        )
+
+        refresh_count = self._refresh_count
+        if self._should_refresh(is_retry):
+            self.attempt_zookeeper_refresh(since=refresh_count)
+        refresh_count = self._refresh_count
+
+        send = functools.partial(
+            self._send,
+            method=method,
+            path=path,
+            params=request_params,
+            headers=request_headers,
+            body=body,
+            stream=stream,
+            timeout=self._get_timeout(path, params, body)
+        )
+
+        response, attempts = self._try_hosts(
+            send, path, method, stream, 0, expires
+        )
+
+        if (
+            response is None and
+            not is_retry and
+            not self.watching and
+            (expires is None or time.time() < expires)
+        ):
+            if self.attempt_zookeeper_refresh(since=refresh_count):
+                if self.hooks:
+                    self._emit('on_retry', self._new_event(path, method, attempts))
+                response, attempts = self._try_hosts(
+                    send, path, method, stream, attempts, expires
                 )
 
-        if not response:
-            if not is_retry:
-                refreshed = self.attempt_zookeeper_refresh()
-                if refreshed:
-                    return self.request(path, params, method, body=body,
-                                        headers=headers, is_retry=True)
-            raise SolrError('Unable to fetch from any SOLR nodes')
+        if response is None:
+            raise self._unable_to_fetch(expires, deadline)
+
+        if stream:
+            return response
+
+        return process_response(response, request_params['wt'])
 
-        return process_response(response)
+    def post_to_host(self, host, path, params=None, body=None, headers=None,
+                     deadline=None):
+        """
+        Send a POST request to one given SOLR host or core, without failing
+        over to any other
+
+        :param deadline: float - (Optional) Seconds the request may take,
+            the timeout is capped to it.
+        :returns: the parsed response, or None if the host did not answer
+            successfully, or not within the deadline
+        """
+        timeout = self._get_timeout(path, params, body)
+        expires = self._get_expiry(deadline)
+        if expires is not None:
+            remaining = expires - time.time()
+            if remaining <= 0:
+                return None
+            timeout = _cap_timeout(timeout, remaining)
+
+        request_params, request_headers = self._prepare_request(
+            params,
+            headers
+        )
+        # No other host to go to, the request is sent either way
+        self.circuit_breakers.record_attempt(host)
+        response = self._send(
+            host,
+            'POST',
+            path,
+            request_params,
+            request_headers,
+            body,
+            timeout=timeout
+        )
+        if response is None:
+            return None
+        return process_response(response, request_params['wt'])
 
-    def post(self, path, params=None, body=None, headers=None):
+    def post(self, path, params=None, body=None, headers=None, stream=False,
+             deadline=None):
         """
         Send a POST request to the SOLR servers
         """
-        return self.request(path, params, 'POST', body=body, headers=headers)
+        # Only pass along the options in use
+        extra = {}
+        if stream:
+            extra['stream'] = True
+        if deadline is not None:
+            extra['deadline'] = deadline
+        return self.request(path, params, 'POST', body=body, headers=headers,
+                            **extra)
 
-    def get(self, path, params=None, headers=None):
+    def get(self, path, params=None, headers=None, deadline=None):
         """
         Send a GET request to the SOLR servers
         """
+        if deadline is not None:
+            return self.request(path, params, 'GET', headers=headers,
+                                deadline=deadline)
         return self.request(path, params, 'GET', headers=headers)
@@ -0,0 +1,136 @@
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Statuses meaning the request itself is wrong: every other host would
+# refuse it too, so it fails right away. Any other unsuccessful status,
+# e.g. a 5xx from an overloaded or broken host, is tried on another host.
+CLIENT_ERRORS = range(400, 500)
+
+
+class RetryBudget(object):
+    """
+    Limit retries to a fraction of the traffic, so that retries cannot
+    multiply the load on SOLR during an incident.
+
+    Every request deposits `ratio` of a token and every retry withdraws a
+    whole one. `min_retries_per_second` tokens are added over time as well,
+    so that a quiet process can still fail over.
+    """
+    def __init__(self, ratio=0.2, min_retries_per_second=10, max_tokens=100):
+        """
+        :param ratio: float - Retries allowed per request. (Default: 0.2)
+        :param min_retries_per_second: float - Retries always allowed per
+            second, whatever the traffic. (Default: 10)
+        :param max_tokens: int - Most retries that can be saved up. (Default: 100)
+        """
+        self.ratio = ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.max_tokens = max_tokens
+        self._tokens = float(max_tokens)
+        self._last_refill = time.time()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.time()
+        self._tokens = min(
+            self.max_tokens,
+            self._tokens + (now - self._last_refill) * self.min_retries_per_second
+        )
+        self._last_refill = now
+
+    def deposit(self):
+        """
+        Record a new request
+        """
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self):
+        """
+        Ask for a retry
+
+        :returns bool: whether or not the retry is within budget
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def tokens(self):
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+# Shared by every client in the process, unless one is given its own
+default_budget = RetryBudget()
+
+
+class RetryPolicy(object):
+    """
+    Decide which failures are retried on another host, how many times, and
+    how long to wait in between.
+    """
+    def __init__(self, max_attempts=None, backoff_base=0.05, backoff_max=1.0,
+                 retryable_statuses=None, budget=None):
+        """
+        :param max_attempts: int - (Optional) Most attempts per request,
+            including the first one. (Default: every host once, and every
+            host again after a zookeeper refresh)
+        :param backoff_base: float - Seconds of the first backoff, doubled
+            for every further retry. (Default: 0.05s)
+        :param backoff_max: float - Cap of the backoff in seconds. (Default: 1s)
+        :param retryable_statuses: set[int] - (Optional) HTTP statuses
+            retried on another host. Connection errors and timeouts are
+            always retried. (Default: every status but 4xx)
+        :param budget: RetryBudget - (Optional) The budget retries are taken
+            from. (Default: the process-wide `default_budget`)
+        """
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retryable_statuses = retryable_statuses
+        self.budget = budget or default_budget
+
+    def is_retryable(self, status_code):
+        if self.retryable_statuses is None:
+            return status_code not in CLIENT_ERRORS
+        return status_code in self.retryable_statuses
+
+    def backoff(self, attempt):
+        """
+        Seconds to wait before the given retry, with full jitter
+        """
+        return random.uniform(
+            0,
+            min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        )
+
+    def retry_delay(self, attempt):
+        """
+        Account for an attempt about to be made
+
+        :param attempt: int - number of attempts already made for the request
+        :returns: None if the attempt must not be made, or the seconds to
+            wait before making it
+        """
+        if attempt == 0:
+            self.budget.deposit()
+            return 0
+
+        if self.max_attempts is not None and attempt >= self.max_attempts:
+            logger.info('Giving up on SOLR request after %s attempts', attempt)
+            return None
+
+        if not self.budget.withdraw():
+            logger.warning('SOLR retry budget exhausted, not retrying')
+            return None
+
+        return self.backoff(attempt)
@@ -0,0 +1,239 @@
+import struct
+
+SEPARATOR = '!'
+
+
+def _to_int32(value):
+    value &= 0xffffffff
+    return value - 0x100000000 if value & 0x80000000 else value
+
+
+def _rotl32(value, bits):
+    return ((value << bits) | (value >> (32 - bits))) & 0xffffffff
+
+
+def murmurhash3_32(data, seed=0):
+    """
+    MurmurHash3 x86 32 bits, as used by SOLR to hash document ids
+
+    :param data: str or bytes - str is hashed as its UTF-8 encoding
+    :returns int: the signed 32 bits hash
+    """
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+
+    c1 = 0xcc9e2d51
+    c2 = 0x1b873593
+    h = seed & 0xffffffff
+    rounded = len(data) & ~3
+
+    for (k,) in struct.iter_unpack('<I', data[:rounded]):
+        k = _rotl32((k * c1) & 0xffffffff, 15)
+        h ^= (k * c2) & 0xffffffff
+        h = (_rotl32(h, 13) * 5 + 0xe6546b64) & 0xffffffff
+
+    tail = data[rounded:]
+    k = 0
+    for i, byte in enumerate(tail):
+        k |= byte << (8 * i)
+    if tail:
+        k = _rotl32((k * c1) & 0xffffffff, 15)
+        h ^= (k * c2) & 0xffffffff
+
+    h ^= len(data)
+    h ^= h >> 16
+    h = (h * 0x85ebca6b) & 0xffffffff
+    h ^= h >> 13
+    h = (h * 0xc2b2ae35) & 0xffffffff
+    h ^= h >> 16
+    return _to_int32(h)
+
+
+def _mask(bits):
+    """
+    The top `bits` bits set, shifted the way Java shifts an int
+    """
+    if bits == 0:
+        return 0
+    return (0xffffffff << ((32 - bits) & 31)) & 0xffffffff
+
+
+def _num_bits(part, index, maximum):
+    """
+    The bits given after the `/` at `index` of a shard key, e.g. `tenant/4`
+
+    :returns int: the bits, at most `maximum`, or -1 when they are not a
+        number
+    """
+    bits = 0
+    for char in part[index + 1:]:
+        if not '0' <= char <= '9':
+            return -1
+        bits = _to_int32(bits * 10 + ord(char) - ord('0'))
+    return min(bits, maximum)
+
+
+def _split_id(doc_id):
+    """
+    Split a document id into at most three parts, like SOLR does
+    """
+    first = doc_id.find(SEPARATOR)
+    parts = [doc_id[:first]]
+    last = len(doc_id) - 1
+    # No more parts when the first separator is the last character
+    if first < last:
+        second = doc_id.find(SEPARATOR, first + 1)
+        if second == -1:
+            parts.append(doc_id[first + 1:])
+        elif second == last:
+            # `a!b!` is split as `a` and `b`, `a!!` as `a` only
+            if first < second - 1:
+                parts.append(doc_id[first + 1:second])
+        else:
+            # Any further separator belongs to the last part
+            parts.append(doc_id[first + 1:second])
+            parts.append(doc_id[second + 1:])
+    return parts
+
+
+def composite_id_hash(doc_id):
+    """
+    The hash of a document id under SOLR's compositeId router, a port of its
+    `CompositeIdRouter.KeyParser`.
+
+    A plain id is hashed as a whole. `shard_key!id` takes the top 16 bits
+    from the shard key and the rest from the id, and `a!b!id` takes 8 bits
+    from each of `a` and `b`. A `/bits` suffix on a shard key changes how
+    many bits it contributes, up to 16, or 8 in a three part id. An id
+    ending with a separator has an empty last part: `a!b!` is a three part
+    id.
+
+    :returns int: the signed 32 bits hash
+    """
+    doc_id = str(doc_id)
+    if SEPARATOR not in doc_id:
+        return murmurhash3_32(doc_id)
+
+    parts = _split_id(doc_id)
+    pieces = len(parts)
+    if doc_id.endswith(SEPARATOR) and pieces < 3:
+        pieces += 1
+        parts.append('')
+
+    tri_level = pieces == 3
+    num_bits = [8, 8] if tri_level else [16]
+    for i in range(pieces - 1):
+        index = parts[i].find('/')
+        if index > 0:
+            num_bits[i] = _num_bits(parts[i], index, 8 if tri_level else 16)
+            parts[i] = parts[i][:index]
+
+    first_mask = _mask(num_bits[0])
+    if tri_level:
+        second_mask = first_mask ^ _mask(num_bits[0] + num_bits[1])
+        masks = [
+            first_mask,
+            second_mask,
+            ~first_mask & ~second_mask & 0xffffffff
+        ]
+    else:
+        masks = [first_mask, ~first_mask & 0xffffffff]
+
+    doc_hash = 0
+    for part, mask in zip(parts, masks):
+        doc_hash |= murmurhash3_32(part) & mask
+    return _to_int32(doc_hash)
+
+
+def _parse_range(hash_range):
+    """
+    Parse a shard range such as `80000000-ffffffff` to signed bounds
+    """
+    low, high = hash_range.split('-')
+    return _to_int32(int(low, 16)), _to_int32(int(high, 16))
+
+
+class ShardRouter(object):
+    """
+    Map documents to the leader of the shard they belong to, from the state
+    of a collection using the compositeId router.
+
+    Only active shards are considered: while a shard is being split, its
+    sub-shards are under construction and the parent's leader still takes
+    the writes.
+    """
+    def __init__(self, state):
+        """
+        :param state: dict - the state of one collection, as found in its
+            state.json in zookeeper
+        """
+        router = state.get('router') or {}
+        self.field = router.get('field')
+        self.ranges = []
+        self.leaders = {}
+
+        for shard, shard_data in state.get('shards', {}).items():
+            if shard_data.get('state', 'active') != 'active':
+                continue
+            if not shard_data.get('range'):
+                continue
+
+            self.ranges.append((_parse_range(shard_data['range']), shard))
+            for replica_data in shard_data.get('replicas', {}).values():
+                if (
+                    replica_data.get('leader') == 'true' and
+                    replica_data.get('state') == 'active'
+                ):
+                    self.leaders[shard] = '%s/%s' % (
+                        replica_data['base_url'].rstrip('/'),
+                        replica_data['core']
+                    )
+
+        self.ranges.sort()
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        :returns: a router for the collection, or None when its documents
+            are not routed by hash
+        """
+        if not state:
+            return None
+        router = state.get('router') or {}
+        if router.get('name', 'compositeId') != 'compositeId':
+            return None
+        return cls(state)
+
+    def get_shard(self, doc_id):
+        """
+        :returns str: the name of the active shard holding `doc_id`, or None
+        """
+        doc_hash = composite_id_hash(doc_id)
+        for (low, high), shard in self.ranges:
+            if low <= doc_hash <= high:
+                return shard
+        return None
+
+    def get_leader(self, shard):
+        """
+        :returns str: the core URL of the leader of `shard`, or None
+        """
+        return self.leaders.get(shard)
+
+    def partition(self, docs, unique_key):
+        """
+        Group documents by the shard they belong to
+
+        :param docs: list[dict] - documents as sent to SOLR
+        :param unique_key: str - the field routed on, unless the collection
+            routes on a field of its own
+        :returns dict: shard name to documents. Documents that cannot be
+            routed are grouped under None.
+        """
+        field = self.field or unique_key
+        batches = {}
+        for doc in docs:
+            doc_id = doc.get(field)
+            shard = None if doc_id is None else self.get_shard(doc_id)
+            batches.setdefault(shard, []).append(doc)
+        return batches
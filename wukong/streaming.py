@@ -0,0 +1,228 @@
+import codecs
+import json
+import re
+
+from wukong.errors import SolrError
+from wukong.metrics import record_docs_hydrated
+
+CHUNK_SIZE = 64 * 1024
+
+_RESPONSE_RE = re.compile(r'"response"\s*:\s*\{')
+_DOCS_RE = re.compile(r'"docs"\s*:\s*\[')
+_WHITESPACE_RE = re.compile(r'[\s,]*')
+
+_decoder = json.JSONDecoder()
+
+
+class SolrStreamingResult(object):
+    """
+    The result of a streamed select. The response body is read in chunks and
+    the documents are parsed and yielded one at a time, so that memory use
+    does not grow with the number of rows.
+
+    `total`, `start` and `max_score` are available as soon as iteration
+    starts. `facets`, `stats` and the rest of the response come after the
+    documents in the body, so they are only available once every document
+    has been read.
+
+    The connection is released once every document has been read, or when
+    iteration stops early. Use the result as a context manager to also
+    release it when iteration never starts.
+    """
+    def __init__(self, response, doc_class=None, chunk_size=CHUNK_SIZE):
+        """
+        :param response: a `requests.Response` opened with `stream=True`
+        :param doc_class: SolrDoc - (Optional) class the documents are
+            converted to, they are yielded as dicts otherwise
+        :param chunk_size: int - number of bytes read at a time
+        """
+        self.response = response
+        self.doc_class = doc_class
+        # Where converted documents are counted, see `wukong.metrics`
+        self.metrics = None
+        self.collection = None
+        self._chunks = response.iter_content(chunk_size=chunk_size)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._position = 0
+        self._prefix = None
+        self._metadata = None
+        self._header = None
+        self._has_docs = False
+        self._consumed = False
+
+    def _read(self):
+        """
+        Append the next chunk to the buffer
+
+        :returns bool: False once the body has been read entirely
+        """
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._buffer += self._decoder.decode(b'', final=True)
+            return False
+
+        # Drop what has been parsed already, so the buffer stays small
+        self._buffer = self._buffer[self._position:] + self._decoder.decode(chunk)
+        self._position = 0
+        return True
+
+    def _read_header(self):
+        """
+        Read up to the start of the docs list, and parse what precedes it
+        """
+        if self._header is not None:
+            return
+
+        while True:
+            response_match = _RESPONSE_RE.search(self._buffer)
+            docs_match = response_match and _DOCS_RE.search(
+                self._buffer,
+                response_match.end()
+            )
+            if docs_match:
+                break
+            if not self._read():
+                # Not a plain document list (e.g. grouped), nothing to stream
+                self._prefix = self._buffer
+                self._position = len(self._buffer)
+                self._header = {}
+                return
+
+        self._has_docs = True
+        self._prefix = self._buffer[:docs_match.end() - 1]
+        self._position = docs_match.end()
+        header = self._buffer[response_match.end():docs_match.start()]
+        self._header = dict(
+            (key, json.loads(value))
+            for key, value in re.findall(
+                r'"(numFound|start|maxScore)"\s*:\s*([-+\w.]+)',
+                header
+            )
+        )
+
+    def _iter_docs(self):
+        self._read_header()
+        if not self._has_docs:
+            return
+
+        while True:
+            match = _WHITESPACE_RE.match(self._buffer, self._position)
+            self._position = match.end()
+            if self._position >= len(self._buffer):
+                if not self._read():
+                    raise SolrError('Truncated SOLR response')
+                continue
+
+            if self._buffer[self._position] == ']':
+                self._position += 1
+                return
+
+            try:
+                doc, end = _decoder.raw_decode(self._buffer, self._position)
+            except ValueError:
+                # The document is split over several chunks
+                if not self._read():
+                    raise SolrError('Truncated SOLR response')
+                continue
+
+            self._position = end
+            yield doc
+
+    def __iter__(self):
+        if self._consumed:
+            return
+
+        hydrated = 0
+        finished = False
+        try:
+            for doc in self._iter_docs():
+                if self.doc_class is not None:
+                    doc = self.doc_class(**doc)
+                    hydrated += 1
+                yield doc
+            finished = True
+        finally:
+            # Also counted when iteration stops early
+            if hydrated and self.metrics is not None:
+                record_docs_hydrated(self.metrics, self.collection, hydrated)
+            if not finished:
+                # Stopped by a break, an error or garbage collection, the
+                # rest of the body is never read
+                self.close()
+
+        self._consumed = True
+        self._read_metadata()
+
+    def _read_metadata(self):
+        while self._read():
+            pass
+
+        # Everything but the documents, which are already gone
+        rest = self._buffer[self._position:]
+        self._buffer = ''
+        self._position = 0
+        try:
+            self._metadata = json.loads(
+                self._prefix + ('[]' if self._has_docs else '') + rest
+            )
+        except ValueError:
+            raise SolrError('Parsing Error: truncated streaming response')
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Release the connection, also when iteration was stopped early
+        """
+        self.response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return False
+
+    @property
+    def docs(self):
+        return iter(self)
+
+    @property
+    def total(self):
+        self._read_header()
+        return self._header.get('numFound')
+
+    @property
+    def start(self):
+        self._read_header()
+        return self._header.get('start')
+
+    @property
+    def max_score(self):
+        self._read_header()
+        return self._header.get('maxScore')
+
+    @property
+    def metadata(self):
+        """
+        The whole response, without the documents
+        """
+        if self._metadata is None:
+            raise SolrError(
+                'The response metadata is only available once all '
+                'documents have been read'
+            )
+        return self._metadata
+
+    @property
+    def facets(self):
+        return self.metadata.get('facet_counts')
+
+    @property
+    def stats(self):
+        return self.metadata.get('stats')
+
+    @property
+    def groups(self):
+        return self.metadata.get('grouped')
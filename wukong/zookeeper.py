@@ -1,114 +1,509 @@
 import kazoo.client
-from kazoo.exceptions import NoNodeError
-import json
-from collections import defaultdict
+from kazoo.exceptions import ConnectionLoss, NoNodeError, SessionExpiredError
+from wukong import codec
+from collections import defaultdict, namedtuple
+from functools import partial
+import atexit
 import itertools
+import os
+import threading
+import types
+import weakref
+
+try:
+    from urllib.parse import quote, urlparse
+except ImportError:  # pragma: no cover
+    from urllib import quote
+    from urlparse import urlparse
 
 import logging
 logger = logging.getLogger(__name__)
 
 
-def _get_hosts_from_state(state):
+# One active replica of a collection, as found in its state.json
+Replica = namedtuple(
+    'Replica',
+    ['base_url', 'core', 'shard', 'type', 'leader', 'node_name']
+)
+
+
+def _node_name(base_url):
     """
-    Given a SOLR state json blob, extract the active hosts
+    The name SOLR lists the node serving `base_url` under in /live_nodes,
+    e.g. 127.0.0.1:8983_solr for http://127.0.0.1:8983/solr
+    """
+    url = urlparse(base_url)
+    return '{}_{}'.format(url.netloc, quote(url.path.strip('/'), safe=''))
+
+
+def _is_live(replica, live_nodes):
+    """
+    Whether or not the node holding `replica` is live. Every node is when
+    the live nodes are unknown.
+    """
+    if live_nodes is None:
+        return True
+    return (replica.node_name or _node_name(replica.base_url)) in live_nodes
+
+
+# A znode as last read, with the version it had then
+_CachedZnode = namedtuple('_CachedZnode', ['version', 'value'])
+
+# Most reads sent to zookeeper at once, see `Zookeeper._get_many`
+MAX_PENDING_READS = 1000
+
+
+def _get_replicas_from_state(state, live_nodes=None):
+    """
+    Given a SOLR state json blob, extract the active replicas
 
     :param state dict: SOLR state blob
-    :returns: list[str]
+    :param live_nodes set: (Optional) the names of the live nodes. A
+        replica's state stays active for a while after its node died, so
+        replicas on other nodes are left out.
+    :returns: set[Replica]
     """
-    active_nodes = set()
+    active_replicas = set()
     for shard, shard_data in state.get('shards', {}).items():
         replicas = shard_data['replicas']
         for replica, replica_data in replicas.items():
             if replica_data['state'] == 'active':
-                active_nodes.add(replica_data['base_url'])
+                active_replica = Replica(
+                    base_url=replica_data['base_url'],
+                    core=replica_data.get('core'),
+                    shard=shard,
+                    # Replicas created before SOLR 7 have no type
+                    type=replica_data.get('type', 'NRT'),
+                    leader=replica_data.get('leader') == 'true',
+                    node_name=replica_data.get('node_name'),
+                )
+                if _is_live(active_replica, live_nodes):
+                    active_replicas.add(active_replica)
+
+    return active_replicas
+
+
+def _get_hosts_from_state(state, live_nodes=None):
+    """
+    Given a SOLR state json blob, extract the active hosts
+
+    :param state dict: SOLR state blob
+    :param live_nodes set: (Optional) the names of the live nodes
+    :returns: set[str]
+    """
+    return set(
+        replica.base_url
+        for replica in _get_replicas_from_state(state, live_nodes)
+    )
 
-    return active_nodes
+
+def _state_path(collection):
+    """
+    The path of the SOLR 6+ state.json of a collection
+    """
+    return '/collections/{}/state.json'.format(collection)
 
 
 def _zk_data_to_dict(data):
     """json load data retreived with zk_client.get()"""
-    if not isinstance(data, str):
-        data = data.decode('utf-8')
-    return json.loads(data)
+    return codec.loads(data)
+
+
+def _build_active_replicas(states, aliases, live_nodes=None, replicas=None):
+    """
+    Build the table of active replicas per collection and alias
+
+    :param states dict: SOLR state blobs keyed by collection name
+    :param aliases dict: the parsed content of /aliases.json
+    :param live_nodes set: (Optional) the names of the live nodes
+    :param replicas dict: (Optional) the active replicas already extracted
+        from some of the states, keyed by collection name
+    :returns: dict[str, set[Replica]]
+    """
+    replicas = replicas or {}
+    active_replicas = defaultdict(set)
+    for collection_name, state in states.items():
+        found = replicas.get(collection_name)
+        if found is None:
+            found = _get_replicas_from_state(state)
+        active_replicas[collection_name] |= set(
+            replica for replica in found if _is_live(replica, live_nodes)
+        )
+
+    logger.debug('Got aliases: %s', aliases)
+    for alias_name, member_string in aliases.get('collection', {}).items():
+        # Any node holding a replica of one of the members can serve the
+        # alias without forwarding the request.
+        replicas = set()
+        for member in member_string.split(','):
+            replicas |= active_replicas.get(member.strip(), set())
+
+        active_replicas[alias_name] = replicas
+
+    return active_replicas
+
+
+def _build_active_hosts(states, aliases):
+    """
+    Build the table of active hosts per collection and alias
+
+    :param states dict: SOLR state blobs keyed by collection name
+    :param aliases dict: the parsed content of /aliases.json
+    :returns: dict[str, set[str]]
+    """
+    return _hosts_from_replicas(_build_active_replicas(states, aliases))
+
+
+def _hosts_from_replicas(active_replicas):
+    """
+    Reduce a table of active replicas to the table of their hosts
+    """
+    active_hosts = defaultdict(set)
+    for name, replicas in active_replicas.items():
+        active_hosts[name] = set(replica.base_url for replica in replicas)
+    return active_hosts
+
+
+def _flatten_hosts(active_hosts, collection_name=None):
+    """
+    Reduce a table of active hosts to the hosts for one collection, or to
+    every known host when no collection is given.
+
+    :returns: list[str]
+    """
+    if collection_name is not None:
+        return list(active_hosts.get(collection_name, []))
+    return list(set(itertools.chain.from_iterable(active_hosts.values())))
+
+
+def _flatten_replicas(active_replicas, collection_name=None):
+    """
+    Reduce a table of active replicas to the replicas of one collection,
+    or of every collection when no collection is given.
+
+    :returns: list[Replica]
+    """
+    return _flatten_hosts(active_replicas, collection_name)
+
+
+def _ref(listener):
+    """
+    A weak reference to a bound method, so that its instance can be garbage
+    collected, or a strong one to any other callable
+    """
+    if isinstance(listener, types.MethodType):
+        return weakref.WeakMethod(listener)
+    return lambda: listener
 
 
 class Zookeeper(object):
     """
     Retrieve the status of SOLR servers from Zookeeper
+
+    One session is opened on first use and kept open, kazoo reconnects it
+    on its own. Use `get_zookeeper` to share it between clients, and
+    `close` to end it.
     """
     def __init__(self, hosts, connection_timeout=5):
         self.hosts = hosts
         self.connection_timeout = connection_timeout
+        self._client = None
+        self._client_lock = threading.Lock()
+        # Parsed znodes and children lists keyed by path, see `_get_data`
+        self._data_cache = {}
+        self._children_cache = {}
+        # The active replicas extracted from each state, see `_get_replicas`
+        self._replicas_cache = {}
 
-    def _get_active_hosts(self):
-        active_hosts = defaultdict(set)
+        # State for the background watcher, see `watch`
+        self._watch_lock = threading.RLock()
+        self._watch_client = None
+        self._listeners = []
+        # Set while many watches are added, so the table is published once
+        self._publish_paused = False
+        self._states = {}
+        # The SOLR <6 style clusterstate.json, only watched once a
+        # collection turns out not to have a state.json of its own
+        self._legacy_states = {}
+        self._watching_legacy = False
+        self._aliases = {}
+        self._collections = set()
+        # The names of the live nodes, None until they are known
+        self.live_nodes = None
+        self._live_nodes_client = None
+        self._live_nodes_listeners = []
+        self.host_table = {}
+        self.replica_table = {}
 
-        try:
-            zk_client = kazoo.client.KazooClient(
-                hosts=self.hosts,
-                read_only=True
-            )
-            zk_client.start(timeout=self.connection_timeout)
-        except Exception:
-            return active_hosts
+    @property
+    def watching(self):
+        return self._watch_client is not None
+
+    def _get_client(self):
+        """
+        The session with Zookeeper, started on first use
+
+        :returns KazooClient: or None when Zookeeper cannot be reached
+        """
+        with self._client_lock:
+            if self._client is None:
+                zk_client = kazoo.client.KazooClient(
+                    hosts=self.hosts,
+                    read_only=True
+                )
+                try:
+                    # Cleans up after itself when it times out
+                    zk_client.start(timeout=self.connection_timeout)
+                except Exception:
+                    logger.exception('Unable to connect to zookeeper')
+                    return None
+                self._client = zk_client
+            return self._client
+
+    def close(self):
+        """
+        Stop watching and end the session
+        """
+        self.stop_watching()
+        with self._client_lock:
+            zk_client, self._client = self._client, None
+        if zk_client is not None:
+            try:
+                zk_client.stop()
+            finally:
+                zk_client.close()
+
+    def _get_data(self, zk_client, path):
+        """
+        The parsed content of the znode at `path`. It is only downloaded
+        and parsed again once its version moved, so reading a znode that
+        did not change costs a single `exists` call.
+
+        :raises NoNodeError: when there is no such znode
+        """
+        stat = zk_client.exists(path)
+        if stat is None:
+            self._data_cache.pop(path, None)
+            raise NoNodeError(path)
+
+        cached = self._data_cache.get(path)
+        if cached is not None and cached.version == stat.version:
+            return cached.value
+
+        # Cached under the version seen by `exists`: should the znode change
+        # in between, the next read sees a newer version and reads it again.
+        value = _zk_data_to_dict(zk_client.get(path)[0])
+        self._data_cache[path] = _CachedZnode(stat.version, value)
+        return value
+
+    def _get_many(self, zk_client, paths):
+        """
+        The parsed content of several znodes, like `_get_data`. The reads
+        are sent all at once with kazoo's asynchronous API rather than one
+        after the other, so reading them costs about two round trips to
+        zookeeper, one to check the versions and one for the znodes which
+        changed, however many there are.
+
+        :returns: dict of path to parsed content, leaving out the paths
+            without a znode
+        """
+        values = {}
+        for start in range(0, len(paths), MAX_PENDING_READS):
+            batch = paths[start:start + MAX_PENDING_READS]
+
+            stats = [(path, zk_client.exists_async(path)) for path in batch]
+            changed = []
+            for path, result in stats:
+                stat = result.get()
+                if stat is None:
+                    self._data_cache.pop(path, None)
+                    continue
+                cached = self._data_cache.get(path)
+                if cached is not None and cached.version == stat.version:
+                    values[path] = cached.value
+                else:
+                    changed.append((path, stat.version))
+
+            reads = [
+                (path, version, zk_client.get_async(path))
+                for path, version in changed
+            ]
+            for path, version, result in reads:
+                try:
+                    data = result.get()[0]
+                except NoNodeError:
+                    # Deleted since its version was checked
+                    self._data_cache.pop(path, None)
+                    continue
+                value = _zk_data_to_dict(data)
+                self._data_cache[path] = _CachedZnode(version, value)
+                values[path] = value
+        return values
+
+    def _get_children(self, zk_client, path):
+        """
+        The children of the znode at `path`, only listed again once its
+        child version moved
+
+        :raises NoNodeError: when there is no such znode
+        """
+        stat = zk_client.exists(path)
+        if stat is None:
+            self._children_cache.pop(path, None)
+            raise NoNodeError(path)
+
+        cached = self._children_cache.get(path)
+        if cached is not None and cached.version == stat.cversion:
+            return cached.value
+
+        children = zk_client.get_children(path)
+        self._children_cache[path] = _CachedZnode(stat.cversion, children)
+        return children
+
+    def _get_cluster_state(self, collection_name=None):
+        """
+        Read the state of the collections and the aliases from Zookeeper
+
+        :param collection_name: If provided, only the state of this
+            collection, or of the members of this alias, is read.
+        :returns: tuple of the states keyed by collection name and the
+            parsed aliases, or None when Zookeeper cannot be reached
+        """
+        zk_client = self._get_client()
+        if zk_client is None:
+            return None
 
         try:
-            collections = zk_client.get_children('/collections')
-        except NoNodeError:
-            # No collections have been created on the zookeeper host yet.
-            logger.debug('No collections found')
-            collections = []
+            return self._read_cluster_state(zk_client, collection_name)
+        except (ConnectionLoss, SessionExpiredError):
+            # Kazoo is reconnecting, the next read may succeed
+            logger.warning('Lost the connection to zookeeper while reading the cluster state')
+            return None
 
+    def _read_cluster_state(self, zk_client, collection_name=None):
         # Fetch any potential collection aliases from solr
         aliases = {}
         try:
-            aliases = _zk_data_to_dict(zk_client.get('/aliases.json')[0])
+            aliases = self._get_data(zk_client, '/aliases.json')
             if aliases is None:  # If there are no aliases, we'll get None
                 aliases = {}
         except Exception:
             logger.debug('No /aliases.json file found')
 
-        # Handle SOLR 6+ style state.json paths
-        for collection in collections:
+        if collection_name is None:
             try:
-                state_path = '/collections/{}/state.json'.format(collection)
-                state_json = zk_client.get(state_path)[0]
+                collections = self._get_children(zk_client, '/collections')
             except NoNodeError:
+                # No collections have been created on the zookeeper host yet.
+                logger.debug('No collections found')
+                collections = []
+            self._forget_deleted(collections)
+        else:
+            members = aliases.get('collection', {}).get(collection_name)
+            if members:
+                collections = [member.strip() for member in members.split(',')]
+            else:
+                collections = [collection_name]
+
+        states = {}
+        # Collections without a state.json of their own
+        legacy = set()
+
+        # Handle SOLR 6+ style state.json paths
+        found = self._get_many(
+            zk_client,
+            [_state_path(collection) for collection in collections]
+        )
+        for collection in collections:
+            state = found.get(_state_path(collection))
+            if state is None:
                 logger.debug(
                     'No SOLR 6 state found for collection [%s]',
                     collection
                 )
+                legacy.add(collection)
             else:
-                state = _zk_data_to_dict(state_json)
-                active_hosts[collection] |= _get_hosts_from_state(
-                    state.get(collection, {})
-                )
+                states[collection] = state.get(collection, {})
 
-        # Handle SOLR <6 style clusterstate.json
-        try:
-            cluster_state_str = zk_client.get('/clusterstate.json')[0]
-        except Exception:
-            cluster_state_str = '{}'
+        # Handle SOLR <6 style clusterstate.json, only read when a collection
+        # is kept there since it can be large.
+        if legacy:
+            try:
+                cluster_state = self._get_data(zk_client, '/clusterstate.json')
+            except Exception:
+                cluster_state = {}
 
-        cluster_state = _zk_data_to_dict(cluster_state_str)
+            for name, state in (cluster_state or {}).items():
+                if name in legacy or (collection_name is None and name not in states):
+                    states[name] = state
 
-        for collection_name, state in cluster_state.items():
-            hosts = _get_hosts_from_state(state)
-            active_hosts[collection_name] |= hosts
+        return states, aliases
 
-        logger.debug('Got aliases: %s', aliases)
-        for alias_name, member_string in aliases.get('collection', {}).items():
-            members = member_string.split(',')
+    def _forget_deleted(self, collections):
+        """
+        Drop the cached state of the collections not listed anymore
+        """
+        paths = set(_state_path(collection) for collection in collections)
+        for path in list(self._data_cache):
+            if path.endswith('/state.json') and path not in paths:
+                self._data_cache.pop(path, None)
+        for collection in set(self._replicas_cache) - set(collections):
+            self._replicas_cache.pop(collection, None)
 
-            # Only support single member aliases for now, because we need to
-            # be able to fetch schemas.
-            member = members[0]
+    def _get_replicas(self, states):
+        """
+        The active replicas in each state, only extracted again from the
+        states which were read again
 
-            active_hosts[alias_name] = active_hosts[member].copy()
+        :returns: dict[str, set[Replica]] keyed by collection name
+        """
+        replicas = {}
+        for collection, state in states.items():
+            cached_state, cached_replicas = self._replicas_cache.get(
+                collection,
+                (None, None)
+            )
+            # A state that was not read again is the very same object
+            if cached_state is not state:
+                cached_replicas = _get_replicas_from_state(state)
+                self._replicas_cache[collection] = (state, cached_replicas)
+            replicas[collection] = cached_replicas
+        return replicas
+
+    def _get_live_nodes(self):
+        """
+        The names of the live nodes, or None when they are unknown
+        """
+        if self._live_nodes_client is not None:
+            # Kept current by the watch
+            return self.live_nodes
+
+        # Only ever read on the session the cluster state was just read on
+        zk_client = self._client
+        if zk_client is None:
+            return None
+        try:
+            return set(self._get_children(zk_client, '/live_nodes'))
+        except NoNodeError:
+            logger.debug('No /live_nodes found')
+        except (ConnectionLoss, SessionExpiredError):
+            logger.warning('Lost the connection to zookeeper while reading the live nodes')
+        return None
 
-        zk_client.stop()
+    def _get_active_replicas(self, collection_name=None):
+        cluster_state = self._get_cluster_state(collection_name)
+        if cluster_state is None:
+            return defaultdict(set)
+        states, aliases = cluster_state
+        return _build_active_replicas(
+            states,
+            aliases,
+            self._get_live_nodes(),
+            self._get_replicas(states)
+        )
 
-        return active_hosts
+    def _get_active_hosts(self, collection_name=None):
+        return _hosts_from_replicas(self._get_active_replicas(collection_name))
 
     def get_active_hosts(self, collection_name=None):
         """
@@ -122,11 +517,323 @@ class Zookeeper(object):
         :returns list[str]: A list of solr nodes in the form `http://hostname`
         """
         logger.debug('Getting active hosts for collection %s', collection_name)
-        active_hosts = self._get_active_hosts()
+        if self.watching:
+            active_hosts = self.host_table
+        else:
+            active_hosts = self._get_active_hosts(collection_name)
+
+        return _flatten_hosts(active_hosts, collection_name)
+
+    def get_active_replicas(self, collection_name=None):
+        """
+        Get the current active SOLR replicas from Zookeeper, with their
+        type and whether or not they lead their shard
+
+        :param collection_name: If provided, the name of a SOLR collection to
+                                get the replicas of. If not provided, the
+                                replicas of every collection are returned.
+                                Optional.
 
-        if collection_name is not None:
-            return list(active_hosts.get(collection_name, []))
+        :returns list[Replica]:
+        """
+        if self.watching:
+            active_replicas = self.replica_table
         else:
-            return list(set(itertools.chain.from_iterable(
-                active_hosts.values()
-            )))
+            active_replicas = self._get_active_replicas(collection_name)
+
+        return _flatten_replicas(active_replicas, collection_name)
+
+    def get_collection_state(self, collection_name):
+        """
+        Get the state of one SOLR collection from Zookeeper. An alias
+        resolves to the collection it writes to, its first member.
+
+        :returns dict: the collection's state (shards, replicas, router),
+            or None when it is unknown
+        """
+        if self.watching:
+            with self._watch_lock:
+                states, aliases = dict(self._states), self._aliases
+        else:
+            cluster_state = self._get_cluster_state(collection_name)
+            if cluster_state is None:
+                return None
+            states, aliases = cluster_state
+
+        members = aliases.get('collection', {}).get(collection_name)
+        if members:
+            collection_name = members.split(',')[0].strip()
+
+        return states.get(collection_name)
+
+    def watch(self, listener):
+        """
+        Watch the SOLR cluster state on the Zookeeper session and call
+        `listener` with a fresh table of active hosts whenever it changes.
+        The watches fire on kazoo's background thread, so callers never
+        block on Zookeeper once the watch is established.
+
+        :param listener: callable taking a dict of collection name to the
+                         set of active hosts for that collection. Only a
+                         weak reference is kept to bound methods, so that
+                         their instance can be garbage collected.
+
+        :returns bool: Whether or not the watch could be established
+        """
+        with self._watch_lock:
+            if self._watch_client is not None:
+                self._listeners.append(_ref(listener))
+                listener(self.host_table)
+                return True
+
+            zk_client = self._get_client()
+            if zk_client is None:
+                logger.error('Unable to start watching zookeeper')
+                return False
+
+            self._listeners.append(_ref(listener))
+            self._watch_client = zk_client
+            # Kazoo calls every watch as it is added, publish once they all are
+            self._publish_paused = True
+            try:
+                zk_client.DataWatch('/aliases.json', self._on_aliases_change)
+                self._watch_live_nodes(zk_client)
+                zk_client.ChildrenWatch(
+                    '/collections',
+                    self._on_collections_change
+                )
+            finally:
+                self._publish_paused = False
+            self._publish()
+            return True
+
+    def watch_live_nodes(self, listener):
+        """
+        Call `listener` with the set of live node names whenever a node
+        joins or leaves the cluster. Only the session that is already open
+        is used, the watch is not worth connecting for.
+
+        :param listener: callable taking the set of live node names. Only a
+                         weak reference is kept to bound methods, so that
+                         their instance can be garbage collected.
+
+        :returns bool: Whether or not the watch could be established
+        """
+        with self._watch_lock:
+            zk_client = self._watch_client or self._client
+            if zk_client is None:
+                return False
+
+            self._live_nodes_listeners.append(_ref(listener))
+            self._watch_live_nodes(zk_client)
+            return True
+
+    def _watch_live_nodes(self, zk_client):
+        if self._live_nodes_client is None:
+            self._live_nodes_client = zk_client
+            zk_client.ChildrenWatch('/live_nodes', self._on_live_nodes_change)
+
+    def stop_watching(self):
+        """
+        Forget all listeners and drop the watches, the session stays open
+        """
+        with self._watch_lock:
+            # The watches remove themselves the next time they fire
+            self._watch_client = None
+            self._live_nodes_client = None
+            self._listeners = []
+            self._live_nodes_listeners = []
+            self._collections = set()
+            self._states = {}
+            self._legacy_states = {}
+            self._watching_legacy = False
+            self.live_nodes = None
+
+    def _on_collections_change(self, collections):
+        with self._watch_lock:
+            if self._watch_client is None:
+                return False
+
+            collections = set(collections)
+            added = collections - self._collections
+            self._collections = collections
+            for collection in set(self._states) - collections:
+                del self._states[collection]
+                self._replicas_cache.pop(collection, None)
+
+            paused, self._publish_paused = self._publish_paused, True
+            try:
+                for collection in added:
+                    self._watch_client.DataWatch(
+                        _state_path(collection),
+                        partial(self._on_state_change, collection)
+                    )
+            finally:
+                self._publish_paused = paused
+            self._publish()
+
+    def _on_state_change(self, collection, data, stat):
+        with self._watch_lock:
+            if collection not in self._collections:
+                # The collection was deleted, drop the watch
+                return False
+
+            if data:
+                state = _zk_data_to_dict(data)
+                self._states[collection] = state.get(collection, {})
+            else:
+                self._states.pop(collection, None)
+                if not self._watching_legacy:
+                    # The collection may be kept in clusterstate.json, as
+                    # polling finds it
+                    logger.debug(
+                        'No SOLR 6 state found for collection [%s]',
+                        collection
+                    )
+                    self._watching_legacy = True
+                    self._watch_client.DataWatch(
+                        '/clusterstate.json',
+                        self._on_legacy_state_change
+                    )
+
+            self._publish()
+
+    def _on_legacy_state_change(self, data, stat):
+        with self._watch_lock:
+            if self._watch_client is None or not self._watching_legacy:
+                return False
+
+            legacy_states = _zk_data_to_dict(data) if data else {}
+            for collection in set(self._legacy_states) - set(legacy_states):
+                if collection not in self._states:
+                    self._replicas_cache.pop(collection, None)
+            self._legacy_states = legacy_states
+            self._publish()
+
+    def _on_aliases_change(self, data, stat):
+        with self._watch_lock:
+            if self._watch_client is None:
+                return False
+
+            self._aliases = _zk_data_to_dict(data) if data else {}
+            self._publish()
+
+    def _on_live_nodes_change(self, live_nodes):
+        with self._watch_lock:
+            if self._live_nodes_client is None:
+                return False
+
+            self.live_nodes = live_nodes = set(live_nodes)
+            if self._watch_client is not None:
+                self._publish()
+
+            listeners = []
+            for ref in self._live_nodes_listeners:
+                listener = ref()
+                if listener is not None:
+                    listeners.append(listener)
+            # Forget the listeners which were garbage collected
+            self._live_nodes_listeners = [
+                ref for ref in self._live_nodes_listeners if ref() is not None
+            ]
+
+        for listener in listeners:
+            try:
+                listener(live_nodes)
+            except Exception:
+                logger.exception('Zookeeper live nodes listener failed')
+
+    def _publish(self):
+        if self._publish_paused:
+            return
+
+        states = self._states
+        if self._legacy_states:
+            # A state.json wins over clusterstate.json, as when polling
+            states = dict(self._legacy_states)
+            states.update(self._states)
+
+        # Swap in the new table as a whole so readers never see a partial
+        # one. Only the states which changed are parsed again.
+        self.replica_table = _build_active_replicas(
+            states,
+            self._aliases,
+            self.live_nodes,
+            self._get_replicas(states)
+        )
+        self.host_table = _hosts_from_replicas(self.replica_table)
+        logger.debug('Zookeeper watch published hosts: %s', self.host_table)
+
+        listeners = [ref() for ref in self._listeners]
+        # Forget the listeners which were garbage collected
+        self._listeners = [
+            ref for ref, listener in zip(self._listeners, listeners)
+            if listener is not None
+        ]
+        for listener in listeners:
+            if listener is None:
+                continue
+            try:
+                listener(self.host_table)
+            except Exception:
+                logger.exception('Zookeeper watch listener failed')
+
+
+_zookeepers = {}
+_lock = threading.Lock()
+# The process the sessions were opened in
+_pid = os.getpid()
+
+
+def get_zookeeper(hosts, connection_timeout=5):
+    """
+    Get the process-wide `Zookeeper` for a set of hosts, so that every
+    client of the same cluster shares one session.
+
+    :param hosts: str|[(str)] The zookeeper hosts.
+    :param connection_timeout: int - Timeout in seconds to connect. (Default: 5s)
+
+    :returns Zookeeper:
+    """
+    if _pid != os.getpid():
+        # For Pythons without os.register_at_fork
+        _after_fork()
+
+    key = (hosts if isinstance(hosts, str) else tuple(hosts), connection_timeout)
+    with _lock:
+        zookeeper = _zookeepers.get(key)
+        if zookeeper is None:
+            zookeeper = Zookeeper(hosts, connection_timeout)
+            _zookeepers[key] = zookeeper
+    return zookeeper
+
+
+def clear():
+    """
+    End every shared session
+    """
+    with _lock:
+        zookeepers = list(_zookeepers.values())
+        _zookeepers.clear()
+
+    for zookeeper in zookeepers:
+        try:
+            zookeeper.close()
+        except Exception:
+            logger.exception('Failed to close the zookeeper session')
+
+
+def _after_fork():
+    """
+    Forget the sessions inherited from the parent process without closing
+    them, they are still the parent's
+    """
+    global _lock, _pid
+    _lock = threading.Lock()
+    _pid = os.getpid()
+    _zookeepers.clear()
+
+
+atexit.register(clear)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)